@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк декодирования страниц поиска hh.ru
+
+Синтетические страницы по 100 вакансий (benchmarks/fake_hh.py)
+декодируются каждым установленным бэкендом scripts/decoding.py, а также
+полным разбором в словари (как response.json()). Результат - время на
+страницу, страниц в секунду и МБ/с.
+
+Запуск (из каталога vacancy_parser):
+    python benchmarks/decode.py --pages 200 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_hh import FakeHH  # noqa: E402
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vacancy_parser.settings')
+    import django
+    django.setup()
+
+
+def generate_pages(count, seed):
+    fake = FakeHH(found=2000, pool=count * 100, seed=seed)
+    queries = ['Специалист по охране труда', 'Инженер по охране труда', 'Охрана труда']
+    return [
+        json.dumps(fake.page(queries[number % len(queries)], number % 20, 100), ensure_ascii=False).encode('utf-8')
+        for number in range(count)
+    ]
+
+
+def measure(decode, pages, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for page in pages:
+            decode(page)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Время декодирования страниц поиска hh.ru')
+    parser.add_argument('--pages', type=int, default=200, help='Страниц по 100 вакансий')
+    parser.add_argument('--repeat', type=int, default=5, help='Повторов (берется медиана)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    from scripts.decoding import BACKENDS, DEFAULT_BACKEND, decode_page
+
+    pages = generate_pages(args.pages, args.seed)
+    total_mb = sum(len(page) for page in pages) / 2 ** 20
+
+    decoders = {'json (dict)': json.loads}
+    for backend in BACKENDS:
+        decoders[f'{backend} (ApiPage)'] = lambda page, backend=backend: decode_page(page, backend)
+
+    results = []
+    for name, decode in decoders.items():
+        seconds = measure(decode, pages, args.repeat)
+        results.append({
+            'decoder': name,
+            'ms_per_page': round(seconds * 1000 / len(pages), 3),
+            'pages_per_s': int(len(pages) / seconds),
+            'mb_per_s': round(total_mb / seconds, 1),
+        })
+
+    summary = {
+        'pages': args.pages,
+        'page_kb': round(total_mb * 1024 / len(pages), 1),
+        'default_backend': DEFAULT_BACKEND,
+        'results': results,
+    }
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(f"Страниц: {summary['pages']}, в среднем {summary['page_kb']} КБ, бэкенд по умолчанию: {DEFAULT_BACKEND}")
+    columns = ['decoder', 'ms_per_page', 'pages_per_s', 'mb_per_s']
+    print(' | '.join(f'{column:>18}' for column in columns))
+    for row in results:
+        print(' | '.join(f'{str(row[column]):>18}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
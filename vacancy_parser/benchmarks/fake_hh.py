@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка API поиска вакансий hh.ru (GET /vacancies)
+
+Отдает синтетические страницы того же формата и примерно того же размера,
+что и api.hh.ru: вложенные employer, area, salary, snippet, address и т.д.
+Результат детерминирован (зависит от --seed, текста запроса и номера страницы),
+поэтому повторные запуски парсера находят те же вакансии. Вакансии разных
+запросов частично пересекаются - как у похожих запросов на hh.ru.
+
+Параметры имитации: задержка ответа, доля ошибок 503, количество найденных
+вакансий (found) и доля вакансий, проходящих фильтр "Охрана труда".
+Как и настоящий API, отдает не больше 2000 результатов на запрос.
+Ответы содержат ETag; на запрос с совпадающим If-None-Match отдается 304.
+
+Запуск (из каталога vacancy_parser):
+    python benchmarks/fake_hh.py --port 8765 --latency-ms 50 --error-rate 0.01
+    HH_API_URL=http://127.0.0.1:8765/vacancies HH_REQUEST_DELAY=0 python manage.py runserver
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# Как и api.hh.ru: глубина выдачи ограничена 2000 вакансий
+MAX_RESULTS = 2000
+
+MATCHING_TITLES = [
+    'Специалист по охране труда',
+    'Инженер по охране труда',
+    'Руководитель службы охраны труда',
+    'Ведущий специалист по охране труда и промышленной безопасности',
+]
+OTHER_TITLES = [
+    'Инженер-эколог',
+    'Специалист по промышленной безопасности',
+    'Инженер ПТО',
+    'Специалист по пожарной безопасности',
+    'Менеджер по персоналу',
+]
+AREAS = [('1', 'Москва'), ('2019', 'Московская область'), ('2', 'Санкт-Петербург'), ('3', 'Екатеринбург')]
+SCHEDULES = [('fullDay', 'Полный день'), ('shift', 'Сменный график'), ('remote', 'Удаленная работа')]
+EXPERIENCE = [('between1And3', 'От 1 года до 3 лет'), ('between3And6', 'От 3 до 6 лет'), ('noExperience', 'Нет опыта')]
+REQUIREMENTS = (
+    'Высшее техническое образование. Опыт работы в области <highlighttext>охраны труда</highlighttext> '
+    'от 2 лет. Знание нормативной базы, действующих СНиП и ГОСТ.'
+)
+RESPONSIBILITIES = (
+    'Организация и контроль работы по охране труда на объектах компании. Проведение инструктажей, '
+    'расследование несчастных случаев, подготовка отчетности.'
+)
+
+
+class FakeHH:
+    """Генератор синтетической выдачи"""
+
+    def __init__(self, found=1500, pool=20000, match_ratio=0.7, latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, seed=1):
+        self.found = found
+        self.pool = pool
+        self.match_ratio = match_ratio
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'not_modified': 0, 'items': 0, 'bytes': 0}
+        self._published_base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def _query_offset(self, text):
+        digest = hashlib.sha1(f'{self.seed}:{text}'.encode('utf-8')).digest()
+        # Запросы начинаются с разных мест общего пула, но на одной "полосе" - так
+        # выдачи разных запросов частично пересекаются
+        return int.from_bytes(digest[:4], 'big') % max(self.pool // 4, 1)
+
+    def _vacancy(self, number):
+        rnd = random.Random(self.seed * 1000003 + number)
+        vacancy_id = str(80000000 + number)
+        matching = rnd.random() < self.match_ratio
+        title = rnd.choice(MATCHING_TITLES if matching else OTHER_TITLES)
+        area_id, area_name = rnd.choice(AREAS)
+        employer_id = str(1000 + rnd.randrange(3000))
+        salary = None
+        if rnd.random() < 0.6:
+            salary_from = rnd.randrange(50, 150) * 1000
+            salary = {
+                'from': salary_from,
+                'to': salary_from + rnd.randrange(0, 80) * 1000 or None,
+                'currency': 'RUR',
+                'gross': rnd.random() < 0.5,
+            }
+        published = self._published_base + timedelta(minutes=number % 100000)
+        schedule_id, schedule_name = rnd.choice(SCHEDULES)
+        experience_id, experience_name = rnd.choice(EXPERIENCE)
+        return {
+            'id': vacancy_id,
+            'premium': False,
+            'name': title,
+            'department': None,
+            'has_test': False,
+            'response_letter_required': False,
+            'area': {'id': area_id, 'name': area_name, 'url': f'https://api.hh.ru/areas/{area_id}'},
+            'salary': salary,
+            'type': {'id': 'open', 'name': 'Открытая'},
+            'address': {
+                'city': area_name,
+                'street': 'улица Ленина',
+                'building': str(rnd.randrange(1, 200)),
+                'lat': 55.75 + rnd.random(),
+                'lng': 37.61 + rnd.random(),
+                'raw': f'{area_name}, улица Ленина',
+                'metro': None,
+                'metro_stations': [],
+            },
+            'response_url': None,
+            'sort_point_distance': None,
+            'published_at': published.strftime('%Y-%m-%dT%H:%M:%S+0300'),
+            'created_at': published.strftime('%Y-%m-%dT%H:%M:%S+0300'),
+            'archived': False,
+            'apply_alternate_url': f'https://hh.ru/applicant/vacancy_response?vacancyId={vacancy_id}',
+            'show_logo_in_search': True,
+            'insider_interview': None,
+            'url': f'https://api.hh.ru/vacancies/{vacancy_id}?host=hh.ru',
+            'alternate_url': f'https://hh.ru/vacancy/{vacancy_id}',
+            'relations': [],
+            'employer': {
+                'id': employer_id,
+                'name': f'ООО "Компания {employer_id}"',
+                'url': f'https://api.hh.ru/employers/{employer_id}',
+                'alternate_url': f'https://hh.ru/employer/{employer_id}',
+                'logo_urls': {
+                    '90': f'https://img.hhcdn.ru/employer-logo/{employer_id}_90.png',
+                    '240': f'https://img.hhcdn.ru/employer-logo/{employer_id}_240.png',
+                    'original': f'https://img.hhcdn.ru/employer-logo-original/{employer_id}.png',
+                },
+                'vacancies_url': f'https://api.hh.ru/vacancies?employer_id={employer_id}',
+                'accredited_it_employer': False,
+                'trusted': True,
+            },
+            'snippet': {'requirement': REQUIREMENTS, 'responsibility': RESPONSIBILITIES},
+            'contacts': None,
+            'schedule': {'id': schedule_id, 'name': schedule_name},
+            'working_days': [],
+            'working_time_intervals': [],
+            'working_time_modes': [],
+            'accept_temporary': False,
+            'professional_roles': [{'id': '139', 'name': 'Специалист по охране труда'}],
+            'accept_incomplete_resumes': False,
+            'experience': {'id': experience_id, 'name': experience_name},
+            'employment': {'id': 'full', 'name': 'Полная занятость'},
+            'adv_response_url': None,
+            'is_adv_vacancy': False,
+            'adv_context': None,
+        }
+
+    def page(self, text, page, per_page):
+        """Тело ответа для страницы выдачи"""
+        available = min(self.found, MAX_RESULTS)
+        pages = (available + per_page - 1) // per_page
+        start = page * per_page
+        count = max(min(per_page, available - start), 0)
+        offset = self._query_offset(text)
+        items = [self._vacancy((offset + start + index) % self.pool) for index in range(count)]
+        return {
+            'items': items,
+            'found': self.found,
+            'pages': pages,
+            'page': page,
+            'per_page': per_page,
+            'clusters': None,
+            'arguments': None,
+            'fixes': None,
+            'suggests': None,
+            'alternate_url': f'https://hh.ru/search/vacancy?text={text}',
+        }
+
+    def delay(self):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+            failed = self.error_rate and self._random.random() < self.error_rate
+        seconds = max(self.latency_ms + jitter, 0) / 1000
+        if seconds:
+            time.sleep(seconds)
+        return failed
+
+    def record(self, error, items=0, size=0, not_modified=False):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['errors'] += int(bool(error))
+            self.stats['not_modified'] += int(not_modified)
+            self.stats['items'] += items
+            self.stats['bytes'] += size
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'FakeHH/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        self._write(status, json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+    def _write(self, status, payload, tag='', not_modified=False):
+        if not_modified:
+            self.send_response(304)
+            self.send_header('ETag', tag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        if tag:
+            self.send_header('ETag', tag)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/vacancies':
+            self._send(404, {'errors': [{'type': 'not_found'}]})
+            return
+
+        failed = fake.delay()
+        if failed:
+            fake.record(error=True)
+            self._send(503, {'errors': [{'type': 'service_unavailable'}]})
+            return
+
+        params = parse_qs(url.query)
+        text = params.get('text', [''])[0]
+        page = int(params.get('page', ['0'])[0])
+        per_page = min(int(params.get('per_page', ['20'])[0]), 100)
+        if (page + 1) * per_page > MAX_RESULTS:
+            fake.record(error=True)
+            self._send(400, {'errors': [{'type': 'bad_argument', 'value': 'page'}]})
+            return
+
+        body = fake.page(text, page, per_page)
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        tag = f'"{hashlib.sha1(payload).hexdigest()[:20]}"'
+        not_modified = self.headers.get('If-None-Match') == tag
+        # Статистика записывается до ответа: получив его, клиент (и тест) видит итоговые счетчики
+        if not_modified:
+            fake.record(error=False, not_modified=True)
+        else:
+            fake.record(error=False, items=len(body['items']), size=len(payload))
+        self._write(200, payload, tag, not_modified)
+
+
+class FakeHHServer:
+    """Сервер-заглушка в фоновом потоке
+
+        with FakeHHServer(FakeHH(found=500)) as server:
+            requests.get(server.url, params={...})
+    """
+
+    def __init__(self, fake=None, host='127.0.0.1', port=0):
+        self.fake = fake or FakeHH()
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self.fake
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/vacancies'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-hh', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_fake_arguments(parser):
+    """Общие параметры заглушки для командной строки"""
+    parser.add_argument('--found', type=int, default=1500, help='Значение found для каждого запроса')
+    parser.add_argument('--pool', type=int, default=20000, help='Размер общего пула вакансий')
+    parser.add_argument('--match-ratio', type=float, default=0.7,
+                        help='Доля вакансий, проходящих фильтр "Охрана труда"')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Задержка ответа, мс')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Разброс задержки, мс')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def fake_from_args(args):
+    return FakeHH(
+        found=args.found,
+        pool=args.pool,
+        match_ratio=args.match_ratio,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальная заглушка API hh.ru')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeHHServer(fake_from_args(args), host=args.host, port=args.port)
+    print(f'Заглушка API: {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.fake.stats, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
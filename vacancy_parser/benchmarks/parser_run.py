@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк парсера без обращения к api.hh.ru
+
+Поднимает заглушку API (benchmarks/fake_hh.py) и одноразовую базу SQLite во
+временном каталоге, применяет миграции и выполняет HHVacancyParserDjango.run
+целиком --runs раз подряд для одного скрипта. Первый запуск сохраняет новые
+вакансии, последующие - обновляют найденные повторно.
+
+Результат: запуски/с, страницы/с, вакансии/с, SQL-запросы (по хронологии
+запусков) и пиковый RSS процесса. С --json вывод можно сохранять и сравнивать
+между коммитами.
+
+Запуск (из каталога vacancy_parser):
+    python benchmarks/parser_run.py --runs 3 --queries 3 --found 2000 --json
+    python benchmarks/parser_run.py --engine async --concurrency 8 --latency-ms 100
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_hh import FakeHHServer, add_fake_arguments, fake_from_args  # noqa: E402
+
+
+QUERIES = [
+    'Специалист по охране труда',
+    'Инженер по охране труда',
+    'Охрана труда',
+    'Руководитель службы охраны труда',
+    'Специалист по ОТ',
+    'Инженер по ОТ и ПБ',
+]
+
+
+def peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux - в КБ, macOS - в байтах
+    return round(usage / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup_django(directory, api_url, args):
+    os.environ['SQLITE_PATH'] = os.path.join(directory, 'bench.sqlite3')
+    os.environ['METRICS_DIR'] = os.path.join(directory, 'metrics')
+    os.environ['HH_API_URL'] = api_url
+    os.environ['HH_REQUEST_DELAY'] = str(args.request_delay)
+    os.environ['HH_RATE_LIMIT'] = str(args.rate_limit)
+    os.environ['HH_FETCH_ENGINE'] = args.engine
+    os.environ['HH_FETCH_CONCURRENCY'] = str(args.concurrency)
+    os.environ['HH_RESPONSE_CACHE_PATH'] = os.path.join(directory, 'hh_cache.sqlite3')
+    os.environ['HH_RESPONSE_CACHE_TTL'] = str(args.cache_ttl)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vacancy_parser.settings')
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def create_script(queries, max_pages):
+    from django.contrib.auth.models import User
+    from scripts.models import Script
+
+    user = User.objects.create_user(username='benchmark', password='benchmark')
+    return Script.objects.create(
+        name='Бенчмарк парсера',
+        description='Синтетический скрипт для benchmarks/parser_run.py',
+        created_by=user,
+        search_queries=queries,
+        max_pages=max_pages,
+    )
+
+
+def run_once(script):
+    from scripts.models import ScriptRun
+    from scripts.parser import HHVacancyParserDjango
+
+    script_run = ScriptRun.objects.create(script=script, started_by=script.created_by, status='running')
+    parser = HHVacancyParserDjango(script_run)
+    started = time.perf_counter()
+    # Парсер пишет каждую строку лога в stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser.run()
+    elapsed = time.perf_counter() - started
+    script_run.refresh_from_db()
+    stats = script_run.queries_stats.values()
+    return {
+        'seconds': round(elapsed, 3),
+        'status': script_run.status,
+        'pages': sum(item.get('pages_fetched', 0) for item in stats),
+        'vacancies': script_run.total_found,
+        'new_vacancies': script_run.new_vacancies,
+        'existing_vacancies': script_run.existing_vacancies,
+        'db_queries': script_run.timeline.get('db_queries', 0),
+        'is_truncated': script_run.is_truncated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк парсера на заглушке API hh.ru')
+    parser.add_argument('--runs', type=int, default=3, help='Количество запусков подряд')
+    parser.add_argument('--queries', type=int, default=3, help=f'Поисковых запросов в скрипте (до {len(QUERIES)})')
+    parser.add_argument('--max-pages', type=int, default=20, help='Максимум страниц на запрос')
+    parser.add_argument('--request-delay', type=float, default=0.0,
+                        help='Пауза парсера между страницами, с (HH_REQUEST_DELAY)')
+    parser.add_argument('--engine', choices=['sync', 'async'], default='sync',
+                        help='Загрузка страниц (HH_FETCH_ENGINE)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Одновременных запросов страниц при --engine async (HH_FETCH_CONCURRENCY)')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='Лимит запросов в секунду, 0 - без лимита (HH_RATE_LIMIT)')
+    parser.add_argument('--cache-ttl', type=int, default=0,
+                        help='Срок жизни кэша ответов API, с; 0 - без кэша (HH_RESPONSE_CACHE_TTL)')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, FakeHHServer(fake_from_args(args)) as server:
+        setup_django(directory, server.url, args)
+        script = create_script(QUERIES[:max(args.queries, 1)], args.max_pages)
+
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        runs = [run_once(script) for _ in range(args.runs)]
+        elapsed = time.perf_counter() - started
+
+        pages = sum(run['pages'] for run in runs)
+        vacancies = sum(run['vacancies'] for run in runs)
+        db_queries = sum(run['db_queries'] for run in runs)
+        result = {
+            'revision': git_revision(),
+            'params': {
+                'runs': args.runs,
+                'queries': args.queries,
+                'max_pages': args.max_pages,
+                'request_delay': args.request_delay,
+                'engine': args.engine,
+                'concurrency': args.concurrency,
+                'rate_limit': args.rate_limit,
+                'cache_ttl': args.cache_ttl,
+                'found': args.found,
+                'latency_ms': args.latency_ms,
+                'error_rate': args.error_rate,
+                'seed': args.seed,
+            },
+            'seconds': round(elapsed, 3),
+            'runs_per_s': round(len(runs) / elapsed, 3),
+            'pages_per_s': round(pages / elapsed, 1),
+            'vacancies_per_s': round(vacancies / elapsed, 1),
+            'db_queries': db_queries,
+            'db_queries_per_run': round(db_queries / len(runs), 1) if runs else 0,
+            'peak_rss_mb': peak_rss_mb(),
+            'rss_before_runs_mb': rss_before,
+            'server': dict(server.fake.stats),
+            'runs': runs,
+        }
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    for key in ('seconds', 'runs_per_s', 'pages_per_s', 'vacancies_per_s', 'db_queries',
+                'db_queries_per_run', 'peak_rss_mb'):
+        print(f'{key:>20}: {result[key]}')
+    columns = ['seconds', 'status', 'pages', 'vacancies', 'new_vacancies', 'existing_vacancies', 'db_queries']
+    print()
+    print(' | '.join(f'{column:>18}' for column in columns))
+    for run in runs:
+        print(' | '.join(f'{str(run[column]):>18}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк представления вакансий во время запуска
+
+Синтетические страницы в формате hh.ru (benchmarks/fake_hh.py) декодируются
+из JSON и обрабатываются тремя способами:
+
+- raw - исходные словари API (до потоковой обработки): к вакансии
+  добавляется found_by_query, поля извлекаются при сохранении;
+- dict - извлеченные поля в обычном словаре;
+- record - VacancyRecord (scripts/records.py): __slots__ и интернированные строки.
+
+Для каждого способа измеряются время обработки (дедупликация и подготовка
+значений для сохранения, без декодирования JSON) и память, занятая
+накопленными вакансиями (tracemalloc, отдельным проходом).
+
+Запуск (из каталога vacancy_parser):
+    python benchmarks/records.py --records 100000 --json
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_hh import FakeHH  # noqa: E402
+
+
+PER_PAGE = 100
+QUERY = 'Специалист по охране труда'
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vacancy_parser.settings')
+    import django
+    django.setup()
+
+
+def generate_pages(count, pool, seed):
+    """Страницы ответа API в JSON; вакансии повторяются через pool номеров"""
+    fake = FakeHH(pool=pool, seed=seed)
+    pages = []
+    for start in range(0, count, PER_PAGE):
+        items = [fake._vacancy(number % pool) for number in range(start, min(start + PER_PAGE, count))]
+        pages.append(json.dumps({'items': items}, ensure_ascii=False).encode('utf-8'))
+    return pages
+
+
+def collect_raw(items, kept, seen):
+    for vacancy in items:
+        vacancy_id = str(vacancy.get('id', ''))
+        if vacancy_id in seen:
+            continue
+        seen.add(vacancy_id)
+        vacancy['found_by_query'] = QUERY
+        kept.append(vacancy)
+
+
+def prepare_raw(kept):
+    from scripts.decoding import ApiVacancy
+    from scripts.records import VacancyRecord
+    for vacancy in kept:
+        fields = VacancyRecord.from_api(ApiVacancy.from_dict(vacancy), vacancy['found_by_query']).to_dict()
+        yield fields['external_id'], fields
+
+
+def collect_dict(items, kept, seen):
+    from scripts.decoding import ApiVacancy
+    from scripts.records import VacancyRecord
+    for vacancy in items:
+        fields = VacancyRecord.from_api(ApiVacancy.from_dict(vacancy), QUERY).to_dict()
+        if fields['external_id'] in seen:
+            continue
+        seen.add(fields['external_id'])
+        kept.append(fields)
+
+
+def prepare_dict(kept):
+    return ((fields['external_id'], fields) for fields in kept)
+
+
+def collect_record(items, kept, seen):
+    from scripts.records import VacancyRecord
+    for vacancy in items:
+        record = VacancyRecord.from_api(vacancy, QUERY)
+        if record.external_id in seen:
+            continue
+        seen.add(record.external_id)
+        kept.append(record)
+
+
+def prepare_record(kept):
+    return ((record.external_id, record) for record in kept)
+
+
+def values_dict(fields, names):
+    return {name: fields[name] for name in names}
+
+
+def values_record(record, names):
+    return {name: getattr(record, name) for name in names}
+
+
+def decode_dicts(page):
+    return json.loads(page)['items']
+
+
+def decode_api_page(page):
+    from scripts.decoding import decode_page
+    return decode_page(page, backend='json').items
+
+
+# Декодирование во всех вариантах - стандартным json (сравнение бэкендов - benchmarks/decode.py)
+VARIANTS = {
+    'raw': (decode_dicts, collect_raw, prepare_raw, values_dict),
+    'dict': (decode_dicts, collect_dict, prepare_dict, values_dict),
+    'record': (decode_api_page, collect_record, prepare_record, values_record),
+}
+
+
+def run_variant(name, pages, measure_memory):
+    from scripts.models import Vacancy
+    from scripts.records import SALARY_FIELDS
+
+    decode, collect, prepare, values = VARIANTS[name]
+    kept = []
+    seen = set()
+    gc.collect()
+    if measure_memory:
+        tracemalloc.start()
+    elapsed = 0.0
+    for page in pages:
+        items = decode(page)
+        started = time.perf_counter()
+        collect(items, kept, seen)
+        elapsed += time.perf_counter() - started
+        del items
+
+    result = {'variant': name, 'records': len(kept)}
+    if measure_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result.update({
+            'retained_mb': round(current / 2 ** 20, 1),
+            'peak_mb': round(peak / 2 ** 20, 1),
+            'bytes_per_record': int(current / max(len(kept), 1)),
+        })
+        return result
+
+    # Подготовка значений для сохранения, как в _persist_batch
+    started = time.perf_counter()
+    for external_id, item in prepare(kept):
+        values(item, Vacancy.TRACKED_FIELDS)
+        values(item, SALARY_FIELDS)
+    elapsed += time.perf_counter() - started
+    result.update({
+        'seconds': round(elapsed, 3),
+        'records_per_s': int(len(kept) / elapsed) if elapsed else 0,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Память и время обработки вакансий запуска')
+    parser.add_argument('--records', type=int, default=100000, help='Вакансий в выдаче')
+    parser.add_argument('--pool', type=int, default=200000, help='Различных вакансий (меньше --records - есть дубликаты)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--variants', nargs='*', default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    pages = generate_pages(args.records, args.pool, args.seed)
+    results = []
+    for name in args.variants:
+        timing = run_variant(name, pages, measure_memory=False)
+        memory = run_variant(name, pages, measure_memory=True)
+        results.append({**timing, **memory})
+
+    if args.json:
+        print(json.dumps({'records': args.records, 'pool': args.pool, 'results': results},
+                         ensure_ascii=False, indent=2))
+        return
+
+    columns = ['variant', 'records', 'seconds', 'records_per_s', 'retained_mb', 'peak_mb', 'bytes_per_record']
+    print(' | '.join(f'{column:>16}' for column in columns))
+    for row in results:
+        print(' | '.join(f'{str(row[column]):>16}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
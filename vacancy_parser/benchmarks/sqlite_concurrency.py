@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк одновременной записи и чтения SQLite
+
+Моделирует работу парсера (поток записи: строка лога и вакансия, каждая
+запись - отдельная транзакция) и веб-интерфейса (N потоков читают страницы
+вакансий). Сравнивает настройки SQLite по умолчанию и профиль SQLITE_PRAGMAS
+из settings.py.
+
+Запуск (из каталога vacancy_parser):
+    python benchmarks/sqlite_concurrency.py --readers 8 --duration 10
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vacancy_parser.settings import SQLITE_PRAGMAS  # noqa: E402
+
+
+SCRIPTS_COUNT = 20
+PAGE_SIZE = 50
+
+
+def connect(path, pragmas):
+    # Как и Django, не задаем timeout явно: у sqlite3 он по умолчанию 5 секунд
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name}={value}')
+    return conn
+
+
+def create_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE run (id INTEGER PRIMARY KEY, log TEXT NOT NULL DEFAULT '');
+        CREATE TABLE vacancy (
+            id INTEGER PRIMARY KEY,
+            script_id INTEGER NOT NULL,
+            external_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            company TEXT NOT NULL,
+            found_at REAL NOT NULL
+        );
+        CREATE INDEX vacancy_script_found_idx ON vacancy (script_id, found_at, id);
+        INSERT INTO run (id) VALUES (1);
+    """)
+    now = time.time()
+    conn.executemany(
+        'INSERT INTO vacancy (script_id, external_id, title, company, found_at) VALUES (?, ?, ?, ?, ?)',
+        (
+            (index % SCRIPTS_COUNT, str(index), f'Специалист по охране труда {index}', f'Компания {index % 500}',
+             now - index)
+            for index in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def writer(path, pragmas, stop, result):
+    conn = connect(path, pragmas)
+    index = 10 ** 9
+    while not stop.is_set():
+        try:
+            # Строка лога запуска
+            conn.execute("UPDATE run SET log = substr(log || ?, -20000) WHERE id = 1", (f'Обработка {index}\n',))
+            conn.commit()
+            # Сохранение вакансии
+            conn.execute(
+                'INSERT INTO vacancy (script_id, external_id, title, company, found_at) VALUES (?, ?, ?, ?, ?)',
+                (index % SCRIPTS_COUNT, str(index), 'Инженер по охране труда', 'Компания', time.time())
+            )
+            conn.commit()
+            result['writes'] += 2
+        except sqlite3.OperationalError:
+            result['write_errors'] += 1
+            conn.rollback()
+        index += 1
+    conn.close()
+
+
+def reader(path, pragmas, stop, result, lock):
+    conn = connect(path, pragmas)
+    reads = errors = 0
+    latencies = []
+    while not stop.is_set():
+        script_id = random.randrange(SCRIPTS_COUNT)
+        started = time.perf_counter()
+        try:
+            conn.execute(
+                'SELECT id, title, company, found_at FROM vacancy WHERE script_id = ? '
+                'ORDER BY found_at DESC, id DESC LIMIT ?',
+                (script_id, PAGE_SIZE)
+            ).fetchall()
+            conn.execute('SELECT log FROM run WHERE id = 1').fetchone()
+            reads += 1
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    with lock:
+        result['reads'] += reads
+        result['read_errors'] += errors
+        result['latencies'].extend(latencies)
+
+
+def run_profile(name, pragmas, readers, duration, rows):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        create_database(path, rows)
+
+        result = {'writes': 0, 'write_errors': 0, 'reads': 0, 'read_errors': 0, 'latencies': []}
+        stop = threading.Event()
+        lock = threading.Lock()
+        threads = [threading.Thread(target=writer, args=(path, pragmas, stop, result))]
+        threads += [
+            threading.Thread(target=reader, args=(path, pragmas, stop, result, lock))
+            for _ in range(readers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    latencies = sorted(result.pop('latencies'))
+
+    def percentile(value):
+        if not latencies:
+            return None
+        return round(latencies[min(int(len(latencies) * value), len(latencies) - 1)] * 1000, 3)
+
+    return {
+        'profile': name,
+        'readers': readers,
+        'duration_s': duration,
+        'writes_per_s': round(result['writes'] / duration, 1),
+        'reads_per_s': round(result['reads'] / duration, 1),
+        'write_errors': result['write_errors'],
+        'read_errors': result['read_errors'],
+        'read_p50_ms': percentile(0.5),
+        'read_p99_ms': percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк одновременной записи и чтения SQLite')
+    parser.add_argument('--readers', type=int, default=4, help='Количество потоков чтения')
+    parser.add_argument('--duration', type=float, default=5, help='Длительность каждого профиля, с')
+    parser.add_argument('--rows', type=int, default=20000, help='Начальное количество вакансий')
+    parser.add_argument('--profile', choices=['default', 'tuned', 'both'], default='both')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    profiles = []
+    if args.profile in ('default', 'both'):
+        profiles.append(('default', {}))
+    if args.profile in ('tuned', 'both'):
+        profiles.append(('tuned', SQLITE_PRAGMAS))
+
+    results = [run_profile(name, pragmas, args.readers, args.duration, args.rows) for name, pragmas in profiles]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    columns = ['profile', 'writes_per_s', 'reads_per_s', 'write_errors', 'read_errors', 'read_p50_ms', 'read_p99_ms']
+    print(' | '.join(f'{column:>13}' for column in columns))
+    for row in results:
+        print(' | '.join(f'{str(row[column]):>13}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Проверка доступа пользователей к скриптам
+
+Множество id доступных пользователю скриптов кэшируется (Django cache).
+Ключ кэша содержит версию: общую (меняется при сохранении/удалении любого
+скрипта) и персональную (меняется при изменении allowed_users с участием
+пользователя). Сигналы в signals.py меняют версии, старые записи просто
+перестают читаться.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Script
+
+
+ACCESS_CACHE_TIMEOUT = 60 * 60
+
+GLOBAL_VERSION_KEY = 'script_access:version'
+
+
+def _user_version_key(user_id):
+    return f'script_access:version:{user_id}'
+
+
+def get_cache_versions(keys):
+    """Текущие версии по ключам кэша (создает отсутствующие)"""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Случайная версия: после вытеснения ключа не вернутся старые данные
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_access_version(user) -> str:
+    """Версия прав доступа пользователя (для ключей зависимых кэшей)"""
+    global_version, user_version = get_cache_versions([GLOBAL_VERSION_KEY, _user_version_key(user.pk)])
+    return f'{global_version}:{user_version}'
+
+
+def bump_global_version():
+    cache.set(GLOBAL_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def bump_user_versions(user_ids):
+    cache.set_many({_user_version_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+
+
+def _load_access(user):
+    """Возвращает (все доступные id, id активных скриптов), используя кэш"""
+    version = get_access_version(user)
+    memo = getattr(user, '_script_access_memo', None)
+    if memo and memo[0] == version:
+        return memo[1]
+
+    key = f'script_access:{user.pk}:{version}'
+    access = cache.get(key)
+    if access is None:
+        rows = Script.objects.filter(
+            Q(created_by=user) | Q(allowed_users=user)
+        ).order_by().values_list('id', 'is_active').distinct()
+        rows = list(rows)
+        access = (
+            frozenset(script_id for script_id, _ in rows),
+            frozenset(script_id for script_id, is_active in rows if is_active),
+        )
+        cache.set(key, access, ACCESS_CACHE_TIMEOUT)
+
+    # Повторные проверки в рамках запроса не обращаются к кэшу
+    user._script_access_memo = (version, access)
+    return access
+
+
+def get_accessible_script_ids(user, is_active=True):
+    """Множество id скриптов, доступных пользователю
+
+    Args:
+        user: Пользователь (не суперпользователь)
+        is_active: True/False - только активные/неактивные, None - все
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    all_ids, active_ids = _load_access(user)
+    if is_active is None:
+        return all_ids
+    return active_ids if is_active else all_ids - active_ids
+
+
+def get_accessible_scripts_for_user(user, is_active=True):
+    """
+    Возвращает queryset скриптов, к которым у пользователя есть доступ
+    """
+    if not user.is_authenticated:
+        return Script.objects.none()
+
+    if user.is_superuser:
+        # Суперпользователь видит все скрипты
+        if is_active is None:
+            return Script.objects.all()
+        return Script.objects.filter(is_active=is_active)
+
+    # Обычный пользователь видит созданные им скрипты и скрипты,
+    # в которых он указан в allowed_users
+    script_ids = get_accessible_script_ids(user, is_active=is_active)
+    if not script_ids:
+        return Script.objects.none()
+    return Script.objects.filter(id__in=script_ids)
@@ -1,10 +1,16 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils.html import format_html
-from django.urls import reverse
+from django.template.loader import render_to_string
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 import json
-from .models import Script, ScriptRun, Vacancy, VacancyRun
+from . import search
+from .models import ProfileCapture, RunQueryStat, Script, ScriptRun, Vacancy, VacancyRevision, VacancyRun
 
 
 @admin.register(Script)
@@ -20,7 +26,7 @@ class ScriptAdmin(admin.ModelAdmin):
         'created_at'
     ]
     list_filter = ['script_type', 'region', 'is_active', 'created_at']
-    search_fields = ['name', 'search_query', 'search_queries', 'description']
+    search_fields = ['name', 'search_query', 'description']
     readonly_fields = ['created_at', 'updated_at', 'search_summary_preview']
     filter_horizontal = ['allowed_users']  # Удобный интерфейс для управления M2M связями
     
@@ -105,6 +111,17 @@ class ScriptAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Предзагружаем связанные данные для оптимизации"""
         return super().get_queryset(request).select_related('created_by').prefetch_related('allowed_users')
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск также по поисковым запросам (JSONField)"""
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            # В SQLite JSON хранится с экранированием не-ASCII символов (\uXXXX)
+            escaped_term = json.dumps(search_term)[1:-1]
+            results |= queryset.filter(
+                Q(search_queries__icontains=search_term) | Q(search_queries__icontains=escaped_term)
+            )
+        return results, may_have_duplicates
 
 
 @admin.register(ScriptRun)
@@ -115,7 +132,7 @@ class ScriptRunAdmin(admin.ModelAdmin):
     ]
     list_filter = ['status', 'started_at', 'script']
     search_fields = ['script__name', 'started_by__username']
-    readonly_fields = ['started_at', 'completed_at', 'queries_stats_display']
+    readonly_fields = ['started_at', 'completed_at', 'queries_stats_display', 'timeline_display']
     raw_id_fields = ['script', 'started_by']
     date_hierarchy = 'started_at'
     
@@ -127,12 +144,16 @@ class ScriptRunAdmin(admin.ModelAdmin):
             'fields': ('started_at', 'completed_at')
         }),
         ('Статистика', {
-            'fields': ('total_found', 'new_vacancies', 'existing_vacancies')
+            'fields': ('total_found', 'new_vacancies', 'existing_vacancies', 'is_truncated')
         }),
         ('Детальная статистика по запросам', {
             'fields': ('queries_stats_display',),
             'classes': ('collapse',)
         }),
+        ('Хронология выполнения', {
+            'fields': ('timeline_display',),
+            'classes': ('collapse',)
+        }),
         ('Дополнительно', {
             'fields': ('error_message', 'log_data'),
             'classes': ('collapse',)
@@ -142,6 +163,7 @@ class ScriptRunAdmin(admin.ModelAdmin):
     def status_display(self, obj):
         """Цветное отображение статуса"""
         colors = {
+            'queued': '#17a2b8',  # Голубой
             'running': '#ffc107',  # Желтый
             'completed': '#28a745',  # Зеленый
             'failed': '#dc3545'  # Красный
@@ -170,6 +192,8 @@ class ScriptRunAdmin(admin.ModelAdmin):
                 return f"{seconds}с"
         elif obj.status == 'running':
             return "Выполняется..."
+        elif obj.status == 'queued':
+            return "В очереди"
         return "Не завершен"
     duration.short_description = 'Длительность'
     
@@ -210,6 +234,29 @@ class ScriptRunAdmin(admin.ModelAdmin):
         except Exception as e:
             return f"Ошибка отображения статистики: {e}"
     queries_stats_display.short_description = 'Статистика по запросам'
+    
+    def timeline_display(self, obj):
+        """Хронология фаз запуска"""
+        if not obj.timeline:
+            return "Хронология недоступна (запуск выполнен до ее появления)"
+        return render_to_string('scripts/includes/timeline.html', {
+            'script_run': obj,
+            'timeline_rows': obj.get_timeline_rows(max_depth=3),
+            'timeline_totals': obj.get_timeline_totals(),
+        })
+    timeline_display.short_description = 'Хронология'
+
+
+class VacancyRevisionInline(admin.TabularInline):
+    """История изменений вакансии (только просмотр)"""
+    model = VacancyRevision
+    fields = ['script_run_id', 'changes', 'content_hash', 'created_at']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Vacancy)
@@ -218,16 +265,20 @@ class VacancyAdmin(admin.ModelAdmin):
         'title_short', 'company', 'area_name', 'found_by_query', 
         'script', 'is_active', 'times_found', 'first_seen_at', 'last_seen_at'
     ]
-    list_filter = ['is_active', 'script', 'area_name', 'found_by_query', 'first_seen_at', 'company']
+    list_filter = ['is_active', 'script', 'area_name', 'found_by_query', 'currency', 'first_seen_at', 'company']
     search_fields = ['title', 'company', 'external_id', 'area_name', 'found_by_query']
-    readonly_fields = ['first_seen_at', 'last_seen_at', 'times_found']
+    readonly_fields = ['first_seen_at', 'last_seen_at', 'times_found', 'missed_runs']
     raw_id_fields = ['script']
     date_hierarchy = 'first_seen_at'
+    inlines = [VacancyRevisionInline]
     
     fieldsets = (
         ('Информация о вакансии', {
             'fields': ('title', 'company', 'salary', 'url', 'published_at')
         }),
+        ('Зарплата', {
+            'fields': (('salary_from', 'salary_to', 'currency', 'gross'),)
+        }),
         ('Расширенная информация', {
             'fields': ('area_name', 'found_by_query')
         }),
@@ -235,7 +286,7 @@ class VacancyAdmin(admin.ModelAdmin):
             'fields': ('script', 'external_id', 'is_active')
         }),
         ('Статистика отслеживания', {
-            'fields': ('first_seen_at', 'last_seen_at', 'times_found'),
+            'fields': ('first_seen_at', 'last_seen_at', 'times_found', 'missed_runs'),
             'classes': ('collapse',)
         })
     )
@@ -251,6 +302,27 @@ class VacancyAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('script')
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск через полнотекстовый индекс вместо LIKE по всем полям"""
+        matching_ids = search.matching_ids_sql(search_term)
+        if matching_ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(id__in=matching_ids), False
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        search.index_vacancies([obj])
+    
+    def delete_model(self, request, obj):
+        vacancy_id = obj.pk
+        super().delete_model(request, obj)
+        search.remove_vacancies([vacancy_id])
+    
+    def delete_queryset(self, request, queryset):
+        vacancy_ids = list(queryset.values_list('id', flat=True))
+        super().delete_queryset(request, queryset)
+        search.remove_vacancies(vacancy_ids)
 
 
 @admin.register(VacancyRun)
@@ -287,6 +359,96 @@ class VacancyRunAdmin(admin.ModelAdmin):
         )
 
 
+@admin.register(RunQueryStat)
+class RunQueryStatAdmin(admin.ModelAdmin):
+    list_display = [
+        'query', 'script', 'script_run_id', 'run_started_at', 'found_in_api', 'collected',
+        'new_vacancies', 'existing_vacancies', 'pages_fetched', 'fetch_ms'
+    ]
+    list_filter = ['script', 'run_started_at']
+    search_fields = ['query']
+    raw_id_fields = ['script_run']
+    list_select_related = ['script']
+    date_hierarchy = 'run_started_at'
+
+
+
+@admin.register(ProfileCapture)
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    """Снимки профилирования запросов (только просмотр и скачивание профиля)"""
+    list_display = [
+        'created_at', 'method', 'path', 'status_code', 'duration_ms',
+        'db_queries', 'db_time_ms', 'duplicate_queries', 'user'
+    ]
+    list_filter = ['method', 'status_code', 'created_at']
+    search_fields = ['path']
+    list_select_related = ['user']
+    date_hierarchy = 'created_at'
+    fields = [
+        'created_at', 'user', 'method', 'path', 'status_code', 'duration_ms',
+        'db_queries', 'db_time_ms', 'duplicate_queries', 'download_link',
+        'duplicates_display', 'queries_display', 'profile_text_display'
+    ]
+    readonly_fields = fields
+    
+    def get_queryset(self, request):
+        # Бинарный профиль и SQL нужны только на странице снимка
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('changelist'):
+            queryset = queryset.defer('queries', 'duplicates', 'profile_text', 'profile_data')
+        return queryset
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        urls = [
+            path(
+                '<int:capture_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='scripts_profilecapture_download'
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def download_view(self, request, capture_id):
+        """Профиль в формате pstats (python -m pstats, snakeviz)"""
+        capture = get_object_or_404(ProfileCapture, pk=capture_id)
+        if not self.has_view_permission(request, capture):
+            raise PermissionDenied
+        response = HttpResponse(bytes(capture.profile_data), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile_{capture.pk}.prof"'
+        return response
+    
+    def download_link(self, obj):
+        if not obj.profile_data:
+            return 'Профиль cProfile не снят'
+        url = reverse('admin:scripts_profilecapture_download', args=[obj.pk])
+        return format_html('<a href="{}">Скачать profile_{}.prof</a>', url, obj.pk)
+    download_link.short_description = 'Профиль'
+    
+    def duplicates_display(self, obj):
+        return render_to_string('scripts/includes/profile_queries.html', {
+            'queries': obj.duplicates,
+            'show_count': True,
+        })
+    duplicates_display.short_description = 'Повторяющиеся запросы'
+    
+    def queries_display(self, obj):
+        return render_to_string('scripts/includes/profile_queries.html', {
+            'queries': obj.queries,
+            'show_duration': True,
+        })
+    queries_display.short_description = 'SQL-запросы'
+    
+    def profile_text_display(self, obj):
+        return format_html('<pre style="font-size: 0.8rem; white-space: pre;">{}</pre>', obj.profile_text)
+    profile_text_display.short_description = 'Профиль cProfile'
+
+
 # Дополнительная кастомизация для User модели в админке (опционально)
 try:
     from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
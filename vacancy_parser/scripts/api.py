@@ -0,0 +1,238 @@
+"""
+Read-only REST API (v1)
+
+Списки отдаются с курсорной пагинацией, поддерживают выбор полей через
+?fields= и условные GET-запросы, поэтому опрашивающий клиент получает 304
+без сериализации данных, а данные выполняющегося запуска - по мере
+сохранения пачек вакансий. ETag вакансий одного запуска вычисляется
+агрегатами по его связям; ETag остальных списков, которые могут охватывать
+всю таблицу, - по версиям прав доступа и данных (page_cache.py) без запросов.
+"""
+
+import hashlib
+
+from django.db.models import Count, Max, Q
+from rest_framework import status, viewsets
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from .models import Script, ScriptRun, Vacancy, VacancyRun
+from .serializers import (
+    ScriptRunSerializer, ScriptSerializer, VacancyRunSerializer, VacancySerializer,
+    get_requested_fields,
+)
+from .access import get_access_version, get_accessible_scripts_for_user
+from .page_cache import get_data_version
+
+
+API_VERSION = 'v1'
+
+
+class StartedAtCursorPagination(CursorPagination):
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    ordering = ('-started_at', '-id')
+
+
+class FoundAtCursorPagination(StartedAtCursorPagination):
+    ordering = ('-found_at', '-id')
+
+
+class LastSeenCursorPagination(StartedAtCursorPagination):
+    ordering = ('-last_seen_at', '-id')
+
+
+class CreatedAtCursorPagination(StartedAtCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ReadOnlyAPIViewSet(viewsets.ReadOnlyModelViewSet):
+    """Базовый viewset: ограничение выборки полями ответа и ETag для списков"""
+
+    # Поле ответа -> поля модели, которые нужно загрузить для него
+    field_sources = {}
+
+    def accessible_scripts(self):
+        return get_accessible_scripts_for_user(self.request.user, is_active=None)
+
+    def base_queryset(self):
+        raise NotImplementedError
+
+    def get_queryset(self):
+        queryset = self.base_queryset()
+        requested = get_requested_fields(self.request) or set(self.field_sources)
+        only_fields = {'id'}
+        for field in requested & set(self.field_sources):
+            only_fields.update(self.field_sources[field])
+        # Поля сортировки курсорной пагинации должны быть загружены
+        only_fields.update(field.lstrip('-') for field in self.pagination_class.ordering)
+        return queryset.only(*only_fields)
+
+    def get_etag_source(self):
+        """Строка, меняющаяся при изменении данных списка"""
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        source = f'{API_VERSION}:{request.user.pk}:{request.get_full_path()}:{self.get_etag_source()}'
+        etag = '"%s"' % hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+
+def data_etag_source(user):
+    """Версия любых запусков и вакансий, доступных пользователю"""
+    return f'{get_access_version(user)}:{get_data_version()}'
+
+
+def runs_etag_source(runs):
+    """Версия набора запусков: новый или удаленный запуск, смена статуса, завершение"""
+    status_counts = {
+        f'status_{status}': Count('id', filter=Q(status=status))
+        for status, _ in ScriptRun.STATUS_CHOICES
+    }
+    state = runs.order_by().aggregate(
+        last_id=Max('id'), count=Count('id'), last_completed=Max('completed_at'), **status_counts
+    )
+    return ':'.join(str(state[key]) for key in sorted(state))
+
+
+def vacancies_etag_source(vacancies):
+    """Версия набора вакансий: добавление, удаление и любое изменение (updated_at)
+
+    Парсер обновляет updated_at каждой сохраняемой вакансии, поэтому версия
+    меняется с каждой пачкой выполняющегося запуска.
+    """
+    state = vacancies.order_by().aggregate(count=Count('id'), last_updated=Max('updated_at'))
+    return f"{state['count']}:{state['last_updated']}"
+
+
+class ScriptViewSet(ReadOnlyAPIViewSet):
+    serializer_class = ScriptSerializer
+    pagination_class = CreatedAtCursorPagination
+    field_sources = {
+        'id': ['id'],
+        'name': ['name'],
+        'description': ['description'],
+        'script_type': ['script_type'],
+        'search_queries': ['search_queries', 'search_query'],
+        'region': ['region'],
+        'region_name': ['region'],
+        'max_pages': ['max_pages'],
+        'is_active': ['is_active'],
+        'created_by': ['created_by__username'],
+        'created_at': ['created_at'],
+        'updated_at': ['updated_at'],
+    }
+
+    def base_queryset(self):
+        return self.accessible_scripts().select_related('created_by')
+
+    def get_etag_source(self):
+        state = self.accessible_scripts().order_by().aggregate(
+            count=Count('id'), last_updated=Max('updated_at')
+        )
+        return f"{state['count']}:{state['last_updated']}"
+
+
+class ScriptRunViewSet(ReadOnlyAPIViewSet):
+    """Запуски; фильтр ?script=<id>"""
+    serializer_class = ScriptRunSerializer
+    pagination_class = StartedAtCursorPagination
+    field_sources = {
+        'id': ['id'],
+        'script': ['script'],
+        'status': ['status'],
+        'started_at': ['started_at'],
+        'completed_at': ['completed_at'],
+        'total_found': ['total_found'],
+        'new_vacancies': ['new_vacancies'],
+        'existing_vacancies': ['existing_vacancies'],
+        'is_truncated': ['is_truncated'],
+        'error_message': ['error_message'],
+        'queries_stats': ['queries_stats'],
+    }
+
+    def base_queryset(self):
+        runs = ScriptRun.objects.filter(script__in=self.accessible_scripts())
+        script_id = self.request.query_params.get('script')
+        if script_id and script_id.isdigit():
+            runs = runs.filter(script_id=script_id)
+        return runs
+
+    def get_etag_source(self):
+        return data_etag_source(self.request.user)
+
+
+class VacancyRunViewSet(ReadOnlyAPIViewSet):
+    """Вакансии запуска; фильтры ?run=<id> и ?filter=new|existing"""
+    serializer_class = VacancyRunSerializer
+    pagination_class = FoundAtCursorPagination
+    field_sources = {
+        'id': ['id'],
+        'script_run': ['script_run'],
+        'vacancy': ['vacancy__' + field for field in (
+            'id', 'external_id', 'title', 'company', 'salary', 'salary_from', 'salary_to',
+            'currency', 'url', 'published_at', 'area_name', 'is_active', 'times_found'
+        )],
+        'is_new_in_run': ['is_new_in_run'],
+        'found_at': ['found_at'],
+        'found_by_query': ['found_by_query'],
+    }
+
+    def base_queryset(self):
+        vacancy_runs = VacancyRun.objects.filter(
+            script_run__script__in=self.accessible_scripts()
+        ).select_related('vacancy')
+        run_id = self.request.query_params.get('run')
+        if run_id and run_id.isdigit():
+            vacancy_runs = vacancy_runs.filter(script_run_id=run_id)
+        vacancy_filter = self.request.query_params.get('filter')
+        if vacancy_filter == 'new':
+            vacancy_runs = vacancy_runs.filter(is_new_in_run=True)
+        elif vacancy_filter == 'existing':
+            vacancy_runs = vacancy_runs.filter(is_new_in_run=False)
+        return vacancy_runs
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        requested = get_requested_fields(self.request)
+        if requested is not None and 'vacancy' not in requested:
+            # Связанная вакансия не нужна - не делаем JOIN
+            queryset = queryset.select_related(None)
+        return queryset
+
+    def get_etag_source(self):
+        run_id = self.request.query_params.get('run')
+        if not (run_id and run_id.isdigit()):
+            return data_etag_source(self.request.user)
+
+        runs = ScriptRun.objects.filter(script__in=self.accessible_scripts(), id=run_id)
+        vacancies = Vacancy.objects.filter(runs__script_run_id=run_id)
+        # Связи запуска пишутся вместе с вакансиями пачки, в ответе - поля вакансий
+        return f'{runs_etag_source(runs)}:{vacancies_etag_source(vacancies)}'
+
+
+class VacancyViewSet(ReadOnlyAPIViewSet):
+    """Вакансии скриптов; фильтры ?script=<id> и ?is_active=true|false"""
+    serializer_class = VacancySerializer
+    pagination_class = LastSeenCursorPagination
+    field_sources = {field: [field] for field in VacancySerializer.Meta.fields}
+
+    def base_queryset(self):
+        vacancies = Vacancy.objects.filter(script__in=self.accessible_scripts())
+        script_id = self.request.query_params.get('script')
+        if script_id and script_id.isdigit():
+            vacancies = vacancies.filter(script_id=script_id)
+        is_active = self.request.query_params.get('is_active')
+        if is_active in ('true', 'false'):
+            vacancies = vacancies.filter(is_active=is_active == 'true')
+        return vacancies
+
+    def get_etag_source(self):
+        return data_etag_source(self.request.user)
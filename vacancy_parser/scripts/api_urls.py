@@ -0,0 +1,15 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from . import api
+
+router = DefaultRouter()
+router.register('scripts', api.ScriptViewSet, basename='script')
+router.register('runs', api.ScriptRunViewSet, basename='run')
+router.register('vacancy-runs', api.VacancyRunViewSet, basename='vacancy-run')
+router.register('vacancies', api.VacancyViewSet, basename='vacancy')
+
+app_name = 'api'
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
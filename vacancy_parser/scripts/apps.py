@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ScriptsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scripts'
+
+    def ready(self):
+        from . import runner, signals  # noqa: F401
+
+        runner.connect_recovery()
@@ -0,0 +1,155 @@
+"""
+Массовые операции записи с учетом возможностей СУБД
+
+- Новые вакансии вставляются через INSERT ... ON CONFLICT (script, external_id)
+  DO UPDATE: параллельная вставка той же вакансии не приводит к ошибке
+  уникальности, а первичные ключи возвращаются через RETURNING. Счетчики
+  и отслеживаемые поля уже существующей строки при конфликте не затираются:
+  такие вакансии возвращаются вызывающему коду для обычного обновления.
+- Связи запуска с вакансиями в PostgreSQL (psycopg 3) загружаются через COPY,
+  в остальных СУБД - через bulk_create.
+- insert_rows вставляет готовые кортежи значений без создания объектов
+  моделей (генерация больших синтетических наборов данных).
+"""
+
+from typing import Iterable, List, Sequence
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Vacancy, VacancyRun
+
+
+def is_postgresql() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def _supports_copy() -> bool:
+    if not is_postgresql():
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+
+def upsert_new_vacancies(vacancies: List[Vacancy], conflict_update_fields: List[str]) -> List[Vacancy]:
+    """Вставка новых вакансий
+    
+    Если вакансию с тем же (script, external_id) уже добавил параллельный
+    запуск, у существующей строки обновляются только conflict_update_fields
+    (нужно хотя бы одно поле, иначе первичный ключ не вернется). Остальные
+    поля, в том числе счетчики и отслеживаемые значения, вызывающий код
+    обновляет сам, как у найденной повторно вакансии.
+    
+    Returns:
+        list: Вакансии из vacancies, оказавшиеся уже существующими (с pk)
+    """
+    if not connection.features.supports_update_conflicts_with_target:
+        Vacancy.objects.bulk_create(vacancies)
+        _fill_missing_pks(vacancies)
+        return []
+
+    Vacancy.objects.bulk_create(
+        vacancies,
+        update_conflicts=True,
+        unique_fields=['script', 'external_id'],
+        update_fields=conflict_update_fields,
+    )
+    _fill_missing_pks(vacancies)
+
+    # Строка, вставленная нами, имеет наше first_seen_at; у существующей
+    # оно осталось прежним - так находим конфликты без чтения всех строк
+    by_first_seen = {}
+    for vacancy in vacancies:
+        by_first_seen.setdefault(vacancy.first_seen_at, {})[vacancy.pk] = vacancy
+    conflicts = []
+    for first_seen_at, by_pk in by_first_seen.items():
+        conflicted_pks = Vacancy.objects.filter(pk__in=list(by_pk)).exclude(
+            first_seen_at=first_seen_at
+        ).values_list('pk', flat=True)
+        conflicts.extend(by_pk[pk] for pk in conflicted_pks)
+    return conflicts
+
+
+def _fill_missing_pks(vacancies: List[Vacancy]):
+    missing = [vacancy for vacancy in vacancies if vacancy.pk is None]
+    if missing:
+        # Бэкенд не вернул первичные ключи - дочитываем их
+        created_ids = {}
+        for vacancy in missing:
+            created_ids.setdefault(vacancy.script_id, []).append(vacancy.external_id)
+        pks = {}
+        for script_id, external_ids in created_ids.items():
+            pks.update({
+                (script_id, external_id): pk
+                for external_id, pk in Vacancy.objects.filter(
+                    script_id=script_id, external_id__in=external_ids
+                ).values_list('external_id', 'id')
+            })
+        for vacancy in missing:
+            vacancy.pk = pks[(vacancy.script_id, vacancy.external_id)]
+
+
+def load_vacancy_runs(vacancy_runs: List[VacancyRun]):
+    """Сохранение связей запуска с вакансиями (COPY в PostgreSQL)"""
+    if not vacancy_runs:
+        return
+    if not _supports_copy():
+        VacancyRun.objects.bulk_create(vacancy_runs)
+        return
+
+    now = timezone.now()
+    insert_rows(
+        VacancyRun,
+        ['script_run', 'vacancy', 'is_new_in_run', 'found_at', 'found_by_query'],
+        (
+            (
+                vacancy_run.script_run_id,
+                vacancy_run.vacancy.pk,
+                vacancy_run.is_new_in_run,
+                vacancy_run.found_at or now,
+                vacancy_run.found_by_query,
+            )
+            for vacancy_run in vacancy_runs
+        )
+    )
+
+
+def insert_rows(model, fields: Sequence[str], rows: Iterable[tuple]):
+    """Вставка строк таблицы модели без создания объектов (COPY в PostgreSQL)
+    
+    Args:
+        model: Модель Django
+        fields: Имена полей модели (для внешних ключей - имя поля связи)
+        rows: Кортежи значений в порядке fields. Даты и время - datetime,
+              JSON - уже сериализованная строка.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    model_fields = [model._meta.get_field(name) for name in fields]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in model_fields)
+    
+    if _supports_copy():
+        with connection.cursor() as cursor:
+            with cursor.cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+        return
+    
+    datetime_positions = [
+        index for index, field in enumerate(model_fields)
+        if field.get_internal_type() == 'DateTimeField'
+    ]
+    placeholders = ', '.join(['%s'] * len(model_fields))
+    
+    def adapt(row):
+        if not datetime_positions:
+            return row
+        row = list(row)
+        for index in datetime_positions:
+            row[index] = connection.ops.adapt_datetimefield_value(row[index])
+        return row
+    
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({columns}) VALUES ({placeholders})',
+            (adapt(row) for row in rows)
+        )
@@ -0,0 +1,112 @@
+"""
+Декодирование страниц поиска API hh.ru
+
+Страница сразу превращается в ApiPage/ApiVacancy - только поля, которые
+использует парсер (фильтр и VacancyRecord); адрес, логотипы, расписание и
+прочие вложенные объекты не создаются.
+
+Бэкенд выбирается по установленным пакетам:
+- msgspec - декодирование JSON прямо в ApiPage, неиспользуемые поддеревья
+  пропускаются без создания объектов Python;
+- orjson - быстрый разбор в словари, затем преобразование в ApiPage;
+- json (стандартная библиотека) - то же, медленнее.
+
+Сравнение бэкендов:
+    python benchmarks/decode.py
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - msgspec необязателен
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+
+@dataclass(slots=True)
+class ApiNamed:
+    """Работодатель или регион"""
+    name: Optional[str] = None
+
+
+@dataclass(slots=True)
+class ApiSnippet:
+    requirement: Optional[str] = None
+    responsibility: Optional[str] = None
+
+
+@dataclass(slots=True)
+class ApiVacancy:
+    """Вакансия из выдачи поиска (используемые поля)"""
+    id: str = ''
+    name: Optional[str] = None
+    employer: Optional[ApiNamed] = None
+    area: Optional[ApiNamed] = None
+    salary: Optional[dict] = None  # from/to/currency/gross; "from" не может быть именем поля
+    snippet: Optional[ApiSnippet] = None
+    alternate_url: str = ''
+    published_at: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ApiVacancy':
+        employer = data.get('employer')
+        area = data.get('area')
+        snippet = data.get('snippet')
+        return cls(
+            id=str(data.get('id') or ''),
+            name=data.get('name'),
+            employer=ApiNamed(employer.get('name')) if employer else None,
+            area=ApiNamed(area.get('name')) if area else None,
+            salary=data.get('salary'),
+            snippet=ApiSnippet(snippet.get('requirement'), snippet.get('responsibility')) if snippet else None,
+            alternate_url=data.get('alternate_url') or '',
+            published_at=data.get('published_at'),
+        )
+
+
+@dataclass(slots=True)
+class ApiPage:
+    """Страница выдачи поиска"""
+    items: List[ApiVacancy] = field(default_factory=list)
+    found: int = 0
+    pages: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ApiPage':
+        return cls(
+            items=[ApiVacancy.from_dict(item) for item in data.get('items') or []],
+            found=data.get('found') or 0,
+            pages=data.get('pages') or 0,
+        )
+
+
+BACKENDS = ['json'] + (['orjson'] if orjson else []) + (['msgspec'] if msgspec else [])
+
+# Самый быстрый из установленных
+DEFAULT_BACKEND = BACKENDS[-1]
+
+_page_decoder = msgspec.json.Decoder(ApiPage) if msgspec else None
+
+
+def decode_page(content: bytes, backend: str = None) -> ApiPage:
+    """Декодирует тело ответа поиска вакансий
+
+    Если ответ не совпадает с ожидаемыми типами (msgspec), страница
+    разбирается через словари - так же, как без msgspec.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend == 'msgspec':
+        try:
+            return _page_decoder.decode(content)
+        except msgspec.ValidationError:
+            return ApiPage.from_dict(orjson.loads(content) if orjson else json.loads(content))
+    if backend == 'orjson':
+        return ApiPage.from_dict(orjson.loads(content))
+    return ApiPage.from_dict(json.loads(content))
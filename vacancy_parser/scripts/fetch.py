@@ -0,0 +1,438 @@
+"""
+Загрузка страниц API hh.ru
+
+- RateLimiter - общий для процесса ограничитель частоты запросов (HH_RATE_LIMIT
+  запросов в секунду): им пользуются все запуски, синхронные и асинхронные,
+  поэтому одновременные запуски не превышают общий лимит.
+- FetchLoop - общий для процесса цикл событий в фоновом потоке с одним
+  HTTP-клиентом (общий пул соединений). Загрузка страниц каждого запуска -
+  задача этого цикла, отдельных потоков и циклов на запуск нет.
+- iter_search_pages - поток страниц всех поисковых запросов по порядку
+  (запрос, номер страницы) для потока запуска. Загрузка опережает обработку
+  не больше чем на PAGE_BUFFER страниц, поэтому парсер сохраняет вакансии,
+  пока загружаются следующие страницы, а память не зависит от количества
+  результатов. Обработка и сохранение остаются в потоке запуска: ORM
+  синхронный, а соединения с базой привязаны к потокам.
+
+Режимы загрузки (HH_FETCH_ENGINE):
+- sync - страницы по одной с паузой HH_REQUEST_DELAY;
+- async - первая страница запроса, затем остальные параллельно, не больше
+  HH_FETCH_CONCURRENCY одновременных запросов на запуск.
+
+HTTP-клиент - httpx.AsyncClient (requirements.txt). Без httpx запросы
+выполняет requests в пуле потоков: каждый выполняющийся запрос занимает поток,
+поэтому одновременных запросов процесса не больше размера пула
+(SCRIPT_RUNNER_WORKERS * HH_FETCH_CONCURRENCY).
+
+Ответы декодируются сразу в ApiPage (scripts/decoding.py). С кэшем ответов
+(scripts/response_cache.py) свежие страницы берутся из кэша без запроса к API
+и без ожидания лимита, устаревшие проверяются по ETag. Декодирование и
+обращения к кэшу выполняются в пуле потоков цикла, чтобы не задерживать
+загрузку других запусков.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+import requests
+from django.conf import settings
+
+from .decoding import ApiPage, decode_page
+from .response_cache import ResponseCache, make_key
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - без httpx используется requests в потоках
+    httpx = None
+
+
+# Сколько результатов поиска отдает API по одному запросу
+API_RESULTS_LIMIT = 2000
+
+PER_PAGE = 100
+
+# Сколько загруженных страниц может ожидать обработки
+PAGE_BUFFER = 8
+
+
+class RateLimiter:
+    """Ограничение частоты запросов (равномерные интервалы с запасом на всплеск)
+
+    Потокобезопасен и не зависит от цикла событий: reserve() возвращает время
+    ожидания, которое вызывающий код выдерживает сам (time.sleep или asyncio.sleep).
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Резервирует следующий слот; возвращает, сколько секунд подождать"""
+        if self.rate <= 0:
+            return 0.0
+        interval = 1.0 / self.rate
+        with self._lock:
+            now = time.monotonic()
+            # Неиспользованные слоты копятся не больше чем на burst запросов
+            self._next_slot = max(self._next_slot, now - (self.burst - 1) * interval)
+            wait = max(self._next_slot - now, 0.0)
+            self._next_slot += interval
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Общий ограничитель запросов к API для процесса"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            rate = getattr(settings, 'HH_RATE_LIMIT', 5.0)
+            _rate_limiter = RateLimiter(rate, burst=max(int(rate), 1))
+        return _rate_limiter
+
+
+@dataclass
+class PageResult:
+    """Результат загрузки одной страницы"""
+    query: str
+    page: int
+    status_code: Optional[int] = None
+    data: Optional[ApiPage] = None
+    error: str = ''
+    started: float = 0.0   # time.perf_counter() начала запроса
+    seconds: float = 0.0   # длительность запроса без ожидания лимитов и декодирования
+    decode_seconds: float = 0.0
+    cache: str = ''        # hit, revalidated, miss; пусто - кэш отключен
+
+
+def _normalize_params(params: dict) -> dict:
+    # httpx передает True как "true", requests - как "True"; приводим к одному виду
+    return {key: str(value).lower() if isinstance(value, bool) else value for key, value in params.items()}
+
+
+class _HttpxClient:
+    """httpx.AsyncClient, общий для всех запусков"""
+
+    def __init__(self):
+        self._client = httpx.AsyncClient()
+
+    async def get(self, url, params, headers, timeout):
+        response = await self._client.get(url, params=params, headers=headers, timeout=timeout)
+        return response.status_code, response.content, response.headers.get('ETag', '')
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class _ThreadedRequestsClient:
+    """requests в пуле потоков - если httpx не установлен"""
+
+    def __init__(self, threads: int):
+        self._executor = ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix='hh-requests')
+        self._local = threading.local()
+        self._sessions = []
+
+    def _session(self):
+        # requests.Session не рассчитан на общие потоки - по сессии на поток пула
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            self._sessions.append(session)
+        return session
+
+    def _get(self, url, params, headers, timeout):
+        response = self._session().get(url, params=params, headers=headers, timeout=timeout)
+        return response.status_code, response.content, response.headers.get('ETag', '')
+
+    async def get(self, url, params, headers, timeout):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._get, url, params, headers, timeout)
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+        for session in self._sessions:
+            session.close()
+
+
+def create_client():
+    if httpx is not None:
+        return _HttpxClient()
+    threads = getattr(settings, 'SCRIPT_RUNNER_WORKERS', 4) * getattr(settings, 'HH_FETCH_CONCURRENCY', 4)
+    return _ThreadedRequestsClient(threads)
+
+
+class FetchLoop:
+    """Долгоживущий цикл событий загрузки страниц в фоновом потоке
+
+    Клиент создается в цикле при первой загрузке. Корутины передаются в цикл
+    через submit() из любого потока.
+    """
+
+    def __init__(self, client_factory: Callable = create_client):
+        self.loop = asyncio.new_event_loop()
+        self._client_factory = client_factory
+        self._client = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name='hh-fetch-loop', daemon=True)
+        self._thread.start()
+
+    @property
+    def client(self):
+        """HTTP-клиент цикла (только из корутин цикла)"""
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def submit(self, coroutine):
+        """Запускает корутину в цикле; возвращает concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def close(self):
+        """Закрывает клиент и останавливает цикл"""
+        async def close_client():
+            if self._client is not None:
+                await self._client.close()
+
+        self.submit(close_client()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+_fetch_loop = None
+_fetch_loop_lock = threading.Lock()
+
+
+def get_fetch_loop() -> FetchLoop:
+    """Общий цикл загрузки для процесса"""
+    global _fetch_loop
+    with _fetch_loop_lock:
+        if _fetch_loop is None:
+            _fetch_loop = FetchLoop()
+        return _fetch_loop
+
+
+def _decode(result, status_code, content):
+    result.status_code = status_code
+    if status_code == 200:
+        started = time.perf_counter()
+        result.data = decode_page(content)
+        result.decode_seconds = time.perf_counter() - started
+
+
+def _cache_lookup(cache, url, params, headers):
+    """(ключ, сохраненный ответ, заголовки запроса) - с If-None-Match, если есть ETag"""
+    if cache is None:
+        return None, None, headers
+    key = make_key(url, params)
+    cached = cache.get(key)
+    if cached is not None and cached.etag:
+        headers = {**headers, 'If-None-Match': cached.etag}
+    return key, cached, headers
+
+
+def _use_cached(result, cached) -> bool:
+    """Свежий ответ из кэша - без запроса к API; False, если сохраненное тело не читается"""
+    result.started = time.perf_counter()
+    try:
+        _decode(result, 200, cached.body)
+    except Exception:
+        result.status_code = result.data = None
+        return False
+    result.cache = 'hit'
+    return True
+
+
+def _complete(result, cache, key, cached, status_code, content, etag):
+    """Декодирует ответ API и обновляет кэш"""
+    if cache is None:
+        _decode(result, status_code, content)
+        return
+    if status_code == 304 and cached is not None:
+        result.cache = 'revalidated'
+        _decode(result, 200, cached.body)
+        cache.touch(key)
+        return
+    result.cache = 'miss'
+    _decode(result, status_code, content)
+    if status_code == 200:
+        cache.put(key, content, etag)
+
+
+def is_last_page(result: PageResult) -> bool:
+    """Нужно ли прекратить загрузку страниц запроса после этой страницы"""
+    return (
+        bool(result.error)
+        or result.status_code != 200
+        or not result.data
+        or len(result.data.items) < PER_PAGE
+    )
+
+
+async def _fetch_page(client, url, headers, params, result, limiter, semaphore, timeout, cache):
+    key, cached = None, None
+    if cache is not None:
+        key, cached, headers = await asyncio.to_thread(_cache_lookup, cache, url, params, headers)
+        if cached is not None and cached.is_fresh(cache.ttl) and await asyncio.to_thread(_use_cached, result, cached):
+            return result
+    async with semaphore:
+        await limiter.acquire_async()
+        result.started = time.perf_counter()
+        try:
+            status_code, content, etag = await client.get(url, _normalize_params(params), headers, timeout)
+            result.seconds = time.perf_counter() - result.started
+            await asyncio.to_thread(_complete, result, cache, key, cached, status_code, content, etag)
+        except Exception as e:
+            result.error = str(e) or e.__class__.__name__
+            result.seconds = result.seconds or time.perf_counter() - result.started
+    return result
+
+
+async def _produce_sequential(put, client, url, headers, queries, params_for, max_pages, limiter, timeout,
+                              request_delay, cache, **kwargs):
+    semaphore = asyncio.Semaphore(1)
+    for query in queries:
+        for page in range(max_pages):
+            result = await _fetch_page(
+                client, url, headers, params_for(query, page), PageResult(query, page),
+                limiter, semaphore, timeout, cache
+            )
+            await put(result)
+            if is_last_page(result):
+                break
+            # Пауза между запросами (ответ из кэша получен без запроса)
+            if result.cache != 'hit':
+                await asyncio.sleep(request_delay)
+
+
+async def _produce_concurrent(put, client, url, headers, queries, params_for, max_pages, limiter, timeout,
+                              concurrency, buffer_pages, cache, **kwargs):
+    """Параллельная загрузка с выдачей страниц по порядку
+
+    Страницы ставятся в загрузку в том же порядке, в котором выдаются, и не
+    больше window штук сверх выданных - так загрузка не уходит далеко вперед
+    обработки и не может заблокироваться на занятом окне.
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    window = asyncio.Semaphore(max(buffer_pages, concurrency, 1))
+    ordered = asyncio.Queue()
+    tasks = []
+
+    async def schedule(query, page):
+        await window.acquire()
+        task = asyncio.ensure_future(_fetch_page(
+            client, url, headers, params_for(query, page), PageResult(query, page),
+            limiter, semaphore, timeout, cache
+        ))
+        tasks.append(task)
+        ordered.put_nowait(task)
+        return task
+
+    async def dispatch():
+        try:
+            for query in queries:
+                first = await (await schedule(query, 0))
+                if is_last_page(first):
+                    continue
+                pages = first.data.pages or math.ceil(min(first.data.found, API_RESULTS_LIMIT) / PER_PAGE)
+                for page in range(1, min(pages, max_pages)):
+                    await schedule(query, page)
+        finally:
+            ordered.put_nowait(None)
+
+    dispatcher = asyncio.ensure_future(dispatch())
+    try:
+        while True:
+            task = await ordered.get()
+            if task is None:
+                break
+            await put(await task)
+            window.release()
+        if dispatcher.done():
+            dispatcher.result()  # Ошибка при постановке страниц в загрузку
+    finally:
+        for task in tasks + [dispatcher]:
+            task.cancel()
+        await asyncio.gather(*tasks, dispatcher, return_exceptions=True)
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+def iter_search_pages(
+    url: str,
+    headers: dict,
+    queries: List[str],
+    params_for: Callable[[str, int], dict],
+    max_pages: int,
+    engine: str = 'sync',
+    concurrency: int = 4,
+    timeout: float = 30,
+    request_delay: float = 0.0,
+    limiter: Optional[RateLimiter] = None,
+    buffer_pages: int = None,
+    cache: Optional[ResponseCache] = None,
+    fetch_loop: Optional[FetchLoop] = None,
+) -> Iterator[PageResult]:
+    """Страницы поисковых запросов по порядку (запрос, номер страницы)
+
+    Загрузка запроса прекращается после ошибки, ответа не 200 и неполной
+    страницы; при async-загрузке после такой страницы могут прийти уже
+    загруженные следующие - их нужно пропускать (см. is_last_page).
+
+    Загрузка выполняется задачей общего цикла (get_fetch_loop()); ожидающих
+    обработки страниц не больше buffer_pages. Если обработка прервана
+    (исключение, закрытие генератора), задача загрузки отменяется.
+    """
+    fetch_loop = fetch_loop or get_fetch_loop()
+    buffer_pages = buffer_pages or PAGE_BUFFER
+    pages = asyncio.Queue(maxsize=buffer_pages)
+    produce = _produce_concurrent if engine == 'async' else _produce_sequential
+    options = dict(
+        url=url, headers=headers, queries=queries, params_for=params_for, max_pages=max_pages,
+        limiter=limiter or get_rate_limiter(), timeout=timeout, request_delay=request_delay,
+        concurrency=concurrency, buffer_pages=buffer_pages, cache=cache,
+    )
+
+    async def fetch():
+        try:
+            await produce(pages.put, fetch_loop.client, **options)
+        except Exception as e:
+            await pages.put(_Failure(e))
+        await pages.put(_DONE)
+
+    task = fetch_loop.submit(fetch())
+    try:
+        while True:
+            item = fetch_loop.submit(pages.get()).result()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        task.cancel()
@@ -0,0 +1,204 @@
+"""
+Бенчмарк страниц и API на текущей базе (обычно - после generate_synthetic_data)
+
+Каждая страница запрашивается --repeat раз через тестовый клиент Django от
+имени одного пользователя; для каждой считаются p50/p95 времени ответа и
+количество SQL-запросов. Первый запрос выполняется на пустом кэше и
+показывается отдельно (cold_ms), с --no-cache кэш очищается перед каждым.
+
+Страницы администратора запрашиваются от имени суперпользователя
+synthetic_admin (создается при первом запуске). Удаление запусков
+(--include-delete) изменяет базу: на каждой итерации удаляется самый старый
+запуск выбранного скрипта.
+
+    SQLITE_PATH=/tmp/large.sqlite3 python manage.py benchmark_views --repeat 20 --json
+"""
+
+import importlib.util
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from scripts.access import get_accessible_scripts_for_user
+from scripts.management.commands.generate_synthetic_data import USERNAME_PREFIX
+
+
+ADMIN_USERNAME = f'{USERNAME_PREFIX}admin'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Измеряет время ответа и количество SQL-запросов страниц и API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Пользователь (по умолчанию - с наибольшим количеством скриптов)')
+        parser.add_argument('--repeat', type=int, default=10, help='Запросов к каждой странице')
+        parser.add_argument('--only', nargs='*', help='Только перечисленные страницы')
+        parser.add_argument('--no-cache', action='store_true', help='Очищать кэш перед каждым запросом')
+        parser.add_argument('--no-admin', action='store_true', help='Не измерять страницы администратора')
+        parser.add_argument('--include-delete', action='store_true',
+                            help='Измерять удаление запусков (удаляет --repeat запусков)')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        script = (
+            get_accessible_scripts_for_user(user, is_active=None)
+            .annotate(runs_count=Count('runs'))
+            .order_by('-runs_count')
+            .first()
+        )
+        if script is None:
+            raise CommandError(f'У пользователя {user.username} нет скриптов')
+        script_run = script.runs.filter(status='completed').order_by('-started_at').first()
+        if script_run is None:
+            raise CommandError(f'У скрипта {script.name} нет завершенных запусков')
+
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        endpoints = self.build_endpoints(script, script_run)
+
+        admin_client = None
+        if not options['no_admin']:
+            admin_client = Client(HTTP_HOST='localhost')
+            admin_client.force_login(self.get_admin())
+            endpoints += self.build_admin_endpoints(script_run)
+
+        if options['only']:
+            endpoints = [endpoint for endpoint in endpoints if endpoint[0] in options['only']]
+
+        results = []
+        for name, method, url, as_admin in endpoints:
+            results.append(self.measure(
+                admin_client if as_admin else client, name, method, url,
+                options['repeat'], options['no_cache']
+            ))
+
+        if options['include_delete']:
+            results.append(self.measure_delete(client, script, options['repeat']))
+
+        summary = {
+            'user': user.username,
+            'script_id': script.id,
+            'script_runs': script.runs_count,
+            'run_id': script_run.id,
+            'run_vacancies': script_run.total_found,
+            'repeat': options['repeat'],
+            'no_cache': options['no_cache'],
+            'results': results,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(summary, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(
+            f'Пользователь {user.username}, скрипт {script.id} ({script.runs_count} запусков), '
+            f'запуск {script_run.id} ({script_run.total_found} вакансий)'
+        )
+        columns = ['name', 'status', 'cold_ms', 'p50_ms', 'p95_ms', 'queries_min', 'queries_max']
+        self.stdout.write(' | '.join(f'{column:>22}' for column in columns))
+        for row in results:
+            self.stdout.write(' | '.join(f'{str(row[column]):>22}' for column in columns))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден')
+        user = (
+            User.objects.filter(username__startswith=USERNAME_PREFIX, is_superuser=False)
+            .annotate(scripts_count=Count('accessible_scripts'))
+            .order_by('-scripts_count')
+            .first()
+        )
+        if user is None:
+            raise CommandError('Синтетические пользователи не найдены - запустите generate_synthetic_data '
+                               'или укажите --user')
+        return user
+
+    def get_admin(self):
+        admin = User.objects.filter(username=ADMIN_USERNAME).first()
+        if admin is None:
+            admin = User.objects.create_superuser(ADMIN_USERNAME, f'{ADMIN_USERNAME}@example.com', ADMIN_USERNAME)
+        return admin
+
+    def build_endpoints(self, script, script_run):
+        """(название, метод, адрес, от имени администратора)"""
+        endpoints = [
+            ('home', 'get', reverse('home'), False),
+            ('script_list', 'get', reverse('scripts:list'), False),
+            ('script_detail', 'get', reverse('scripts:detail', args=[script.id]), False),
+            ('history', 'get', reverse('scripts:history'), False),
+            ('vacancies', 'get', reverse('scripts:vacancies', args=[script_run.id]), False),
+            ('vacancies_new', 'get', reverse('scripts:vacancies', args=[script_run.id]) + '?filter=new', False),
+            ('status', 'get', reverse('scripts:status', args=[script_run.id]), False),
+            ('search', 'get', reverse('scripts:search') + '?q=охрана труда', False),
+            ('search_api', 'get', reverse('scripts:search_api') + '?q=инженер', False),
+            ('api_scripts', 'get', reverse('api-v1:script-list'), False),
+            ('api_runs', 'get', reverse('api-v1:run-list') + f'?script={script.id}', False),
+            ('api_vacancy_runs', 'get', reverse('api-v1:vacancy-run-list') + f'?run={script_run.id}', False),
+            ('api_vacancies', 'get', reverse('api-v1:vacancy-list') + f'?script={script.id}', False),
+        ]
+        # Экспорт требует openpyxl
+        if importlib.util.find_spec('openpyxl'):
+            endpoints.append(('export_excel', 'get', reverse('scripts:export_excel', args=[script.id]), False))
+        return endpoints
+
+    def build_admin_endpoints(self, script_run):
+        return [
+            ('admin_scripts', 'get', reverse('admin:scripts_script_changelist'), True),
+            ('admin_runs', 'get', reverse('admin:scripts_scriptrun_changelist'), True),
+            ('admin_run_change', 'get', reverse('admin:scripts_scriptrun_change', args=[script_run.id]), True),
+            ('admin_vacancies', 'get', reverse('admin:scripts_vacancy_changelist'), True),
+            ('admin_vacancy_runs', 'get', reverse('admin:scripts_vacancyrun_changelist'), True),
+            ('admin_query_stats', 'get', reverse('admin:scripts_runquerystat_changelist'), True),
+        ]
+
+    def measure(self, client, name, method, url, repeat, no_cache, requests=None):
+        cache.clear()
+        timings = []
+        queries = []
+        status = None
+        for index in range(repeat):
+            if no_cache:
+                cache.clear()
+            target_url = requests[index] if requests else url
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(target_url)
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            status = response.status_code
+        return {
+            'name': name,
+            'url': url,
+            'status': status,
+            'cold_ms': round(timings[0], 1),
+            'p50_ms': round(statistics.median(timings), 1),
+            'p95_ms': round(percentile(timings, 0.95), 1),
+            'queries_min': min(queries),
+            'queries_max': max(queries),
+        }
+
+    def measure_delete(self, client, script, repeat):
+        run_ids = list(script.runs.order_by('started_at').values_list('id', flat=True)[:repeat])
+        if not run_ids:
+            raise CommandError('Нет запусков для удаления')
+        urls = [reverse('scripts:delete_run', args=[run_id]) for run_id in run_ids]
+        return self.measure(client, 'delete_run', 'post', urls[0], len(urls), False, requests=urls)
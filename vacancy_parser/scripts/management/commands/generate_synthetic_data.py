@@ -0,0 +1,333 @@
+"""
+Генерация большого синтетического набора данных для бенчмарков
+
+Данные воспроизводимы (--seed) и вставляются пачками без создания объектов
+моделей (scripts.bulk.insert_rows, COPY в PostgreSQL). Первичные ключи
+назначаются явно, начиная с текущего максимума, поэтому генерацию можно
+запускать поверх существующей базы.
+
+Для каждого скрипта создается пул вакансий; каждый запуск находит окно из
+--vacancies-per-run вакансий пула, сдвигающееся от запуска к запуску. Вакансия,
+впервые попавшая в окно, считается новой в запуске - так же, как в парсере.
+
+Пресет large соответствует production-масштабу (1k пользователей, 5k скриптов,
+500k запусков, 50M связей вакансий с запусками); генерировать его лучше в
+отдельную базу:
+
+    SQLITE_PATH=/tmp/large.sqlite3 python manage.py migrate
+    SQLITE_PATH=/tmp/large.sqlite3 python manage.py generate_synthetic_data --preset large
+"""
+
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from scripts import search
+from scripts.bulk import insert_rows
+from scripts.models import RunQueryStat, Script, ScriptRun, Vacancy, VacancyRun
+
+
+PRESETS = {
+    'small': {'users': 20, 'scripts': 50, 'runs': 2000, 'vacancies_per_run': 50},
+    'medium': {'users': 200, 'scripts': 1000, 'runs': 50000, 'vacancies_per_run': 100},
+    'large': {'users': 1000, 'scripts': 5000, 'runs': 500000, 'vacancies_per_run': 100},
+}
+
+USERNAME_PREFIX = 'synthetic_'
+PASSWORD = 'synthetic'
+
+QUERIES = [
+    'Специалист по охране труда',
+    'Инженер по охране труда',
+    'Охрана труда',
+    'Руководитель службы охраны труда',
+    'Инженер по ОТ и ПБ',
+]
+TITLES = [
+    'Специалист по охране труда',
+    'Инженер по охране труда',
+    'Ведущий инженер по охране труда',
+    'Руководитель отдела охраны труда',
+    'Специалист по охране труда и промышленной безопасности',
+]
+AREAS = ['Москва', 'Московская область', 'Санкт-Петербург', 'Екатеринбург', 'Казань']
+REGIONS = [choice for choice, _ in Script.REGION_CHOICES]
+
+
+class Command(BaseCommand):
+    help = 'Создает воспроизводимый синтетический набор данных для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=list(PRESETS), default='small', help='Размер набора данных')
+        parser.add_argument('--users', type=int, help='Количество пользователей')
+        parser.add_argument('--scripts', type=int, help='Количество скриптов')
+        parser.add_argument('--runs', type=int, help='Количество запусков (распределяются по скриптам)')
+        parser.add_argument('--vacancies-per-run', type=int, help='Вакансий, найденных в одном запуске')
+        parser.add_argument('--pool-factor', type=float, default=1.5,
+                            help='Размер пула вакансий скрипта относительно --vacancies-per-run')
+        parser.add_argument('--fanout', type=int, default=5,
+                            help='Среднее количество пользователей с доступом к скрипту (allowed_users)')
+        parser.add_argument('--days', type=int, default=180, help='За сколько дней распределены запуски')
+        parser.add_argument('--batch-size', type=int, default=20000, help='Строк в одной пачке вставки')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--clear', action='store_true',
+                            help='Удалить ранее сгенерированные данные (пользователей synthetic_*)')
+        parser.add_argument('--no-index', action='store_true',
+                            help='Не перестраивать полнотекстовый индекс вакансий')
+
+    def handle(self, *args, **options):
+        params = dict(PRESETS[options['preset']])
+        for key in params:
+            if options[key] is not None:
+                params[key] = options[key]
+        if min(params.values()) < 1:
+            raise CommandError('Количество пользователей, скриптов, запусков и вакансий должно быть положительным')
+
+        if options['clear']:
+            self.clear()
+
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.period = timedelta(days=options['days'])
+        self.pool_size = max(int(params['vacancies_per_run'] * options['pool_factor']), params['vacancies_per_run'])
+        self.next_ids = {
+            model: (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+            for model in (User, Script, ScriptRun, Vacancy, VacancyRun, RunQueryStat)
+        }
+        self.counts = dict.fromkeys(['vacancies', 'runs', 'vacancy_runs', 'query_stats'], 0)
+
+        started = time.perf_counter()
+        user_ids = self.create_users(params['users'])
+        script_ids = self.create_scripts(params['scripts'], user_ids, options['fanout'])
+        self.create_runs(script_ids, user_ids, params['runs'], params['vacancies_per_run'])
+        self.reset_sequences()
+
+        if not options['no_index']:
+            self.stdout.write('Перестраиваем полнотекстовый индекс...')
+            search.rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано за {time.perf_counter() - started:.1f} с: пользователей {len(user_ids)}, '
+            f'скриптов {len(script_ids)}, запусков {self.counts["runs"]}, вакансий {self.counts["vacancies"]}, '
+            f'связей вакансий с запусками {self.counts["vacancy_runs"]}, '
+            f'строк статистики запросов {self.counts["query_stats"]}'
+        ))
+        self.stdout.write(f'Пароль пользователей {USERNAME_PREFIX}*: {PASSWORD}')
+
+    def clear(self):
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        scripts = Script.objects.filter(created_by__in=users)
+        with transaction.atomic():
+            # Сначала крупные таблицы - одним DELETE без загрузки объектов
+            VacancyRun.objects.filter(script_run__script__in=scripts).delete()
+            RunQueryStat.objects.filter(script__in=scripts).delete()
+            deleted, _ = users.delete()
+        self.stdout.write(f'Удалены ранее сгенерированные данные ({deleted} объектов)')
+
+    def allocate_ids(self, model, count):
+        first = self.next_ids[model]
+        self.next_ids[model] += count
+        return range(first, first + count)
+
+    def insert(self, model, fields, rows):
+        """Вставка пачками в отдельных транзакциях"""
+        for start in range(0, len(rows), self.batch_size):
+            with transaction.atomic():
+                insert_rows(model, fields, rows[start:start + self.batch_size])
+
+    def create_users(self, count):
+        ids = self.allocate_ids(User, count)
+        password = make_password(PASSWORD)
+        joined = self.now - self.period
+        self.insert(User, [
+            'id', 'username', 'password', 'first_name', 'last_name', 'email',
+            'is_staff', 'is_superuser', 'is_active', 'date_joined',
+        ], [
+            (user_id, f'{USERNAME_PREFIX}{user_id}', password, 'Пользователь', str(user_id),
+             f'{USERNAME_PREFIX}{user_id}@example.com', False, False, True, joined)
+            for user_id in ids
+        ])
+        self.stdout.write(f'Пользователи: {count}')
+        return list(ids)
+
+    def create_scripts(self, count, user_ids, fanout):
+        ids = self.allocate_ids(Script, count)
+        created = self.now - self.period
+        scripts = []
+        allowed = []
+        for script_id in ids:
+            queries = self.random.sample(QUERIES, self.random.randint(1, 3))
+            scripts.append((
+                script_id, f'Синтетический скрипт {script_id}', 'Сгенерирован generate_synthetic_data',
+                'hh_parser', queries[0], json.dumps(queries), self.random.choice(REGIONS), 20, True,
+                self.random.choice(user_ids), created, created,
+            ))
+            fanout_count = min(self.random.randint(0, fanout * 2), len(user_ids))
+            allowed.extend((script_id, user_id) for user_id in self.random.sample(user_ids, fanout_count))
+
+        self.insert(Script, [
+            'id', 'name', 'description', 'script_type', 'search_query', 'search_queries', 'region',
+            'max_pages', 'is_active', 'created_by', 'created_at', 'updated_at',
+        ], scripts)
+        self.insert(Script.allowed_users.through, ['script', 'user'], allowed)
+        self.stdout.write(f'Скрипты: {count}, записей доступа: {len(allowed)}')
+        return list(ids)
+
+    def create_runs(self, script_ids, user_ids, total_runs, per_run):
+        """Запуски, вакансии и их связи; данные копятся по скриптам и сбрасываются пачками"""
+        runs_per_script, extra = divmod(total_runs, len(script_ids))
+        buffers = {'vacancies': [], 'runs': [], 'vacancy_runs': [], 'query_stats': []}
+
+        for index, script_id in enumerate(script_ids):
+            runs_count = runs_per_script + (1 if index < extra else 0)
+            if runs_count:
+                self.build_script_history(script_id, user_ids, runs_count, per_run, buffers)
+            if len(buffers['vacancy_runs']) >= self.batch_size or index == len(script_ids) - 1:
+                self.flush(buffers)
+                self.stdout.write(
+                    f'Скрипты: {index + 1}/{len(script_ids)}, запусков: {self.counts["runs"]}, '
+                    f'связей: {self.counts["vacancy_runs"]}'
+                )
+
+    def build_script_history(self, script_id, user_ids, runs_count, per_run, buffers):
+        rnd = self.random
+        pool_size = self.pool_size
+        vacancy_ids = self.allocate_ids(Vacancy, pool_size)
+        queries = rnd.sample(QUERIES, rnd.randint(1, 3))
+        step = self.period / runs_count
+        # Окно следующего запуска сдвигается на долю своего размера
+        shift = max(per_run // 3, 1)
+
+        first_seen = {}
+        last_seen = {}
+        times_found = [0] * pool_size
+        run_ids = self.allocate_ids(ScriptRun, runs_count)
+        for number, run_id in enumerate(run_ids):
+            started_at = self.now - self.period + step * number + timedelta(seconds=rnd.randrange(600))
+            completed_at = started_at + timedelta(seconds=rnd.randint(20, 300))
+            failed = rnd.random() < 0.02
+            offset = (number * shift) % pool_size
+            found = 0 if failed else min(per_run, pool_size)
+            new_count = 0
+            for position in range(found):
+                slot = (offset + position) % pool_size
+                is_new = slot not in first_seen
+                if is_new:
+                    first_seen[slot] = started_at
+                    new_count += 1
+                last_seen[slot] = started_at
+                times_found[slot] += 1
+                buffers['vacancy_runs'].append((
+                    self.next_ids[VacancyRun], run_id, vacancy_ids[slot], is_new, started_at,
+                    queries[slot % len(queries)],
+                ))
+                self.next_ids[VacancyRun] += 1
+
+            stats = {}
+            for query_index, query in enumerate(queries):
+                share = found // len(queries) + (1 if query_index < found % len(queries) else 0)
+                stats[query] = {
+                    'found_in_api': share + rnd.randint(0, share + 10),
+                    'collected_by_script': share,
+                    'filtered_out': rnd.randint(0, 50),
+                    'unique_vacancies': share,
+                    'duplicates': rnd.randint(0, 10),
+                    'new_vacancies': new_count // len(queries),
+                    'existing_vacancies': (found - new_count) // len(queries),
+                    'pages_fetched': share // 100 + 1,
+                    'fetch_ms': rnd.randint(300, 5000),
+                }
+                row = (
+                    self.next_ids[RunQueryStat], run_id, script_id, started_at,
+                    query, RunQueryStat.compute_query_hash(query),
+                )
+                buffers['query_stats'].append(
+                    row + tuple(stats[query][key] for key in RunQueryStat.STATS_FIELDS)
+                )
+                self.next_ids[RunQueryStat] += 1
+
+            buffers['runs'].append((
+                run_id, script_id, rnd.choice(user_ids), 'failed' if failed else 'completed',
+                started_at, completed_at, found, new_count, found - new_count, rnd.random() < 0.05,
+                'Синтетическая ошибка' if failed else '', '', json.dumps(stats), '{}',
+            ))
+
+        # Активны вакансии, найденные последним успешным запуском
+        latest_seen = max(last_seen.values(), default=None)
+        for slot, vacancy_id in enumerate(vacancy_ids):
+            if slot not in first_seen:
+                continue
+            values = self.vacancy_values(vacancy_id, slot, rnd)
+            tracked = {
+                field: Vacancy.serialize_tracked_value(field, values[field]) for field in Vacancy.TRACKED_FIELDS
+            }
+            buffers['vacancies'].append((
+                vacancy_id, script_id, str(vacancy_id), values['title'], values['company'], values['salary'],
+                values['salary_from'], values['salary_to'], values['currency'], None, values['url'],
+                values['published_at'], values['area_name'], queries[slot % len(queries)],
+                last_seen[slot] == latest_seen, first_seen[slot], last_seen[slot],
+                times_found[slot], 0, Vacancy.compute_content_hash(tracked), last_seen[slot],
+            ))
+
+    def vacancy_values(self, vacancy_id, slot, rnd):
+        salary_from = rnd.choice([None, rnd.randrange(50, 150) * 1000])
+        salary_to = salary_from + rnd.randrange(0, 80) * 1000 if salary_from else None
+        if salary_from and salary_to:
+            salary = f'{salary_from}-{salary_to} RUR'
+        elif salary_from:
+            salary = f'от {salary_from} RUR'
+        else:
+            salary = 'Не указана'
+        return {
+            'title': rnd.choice(TITLES),
+            'company': f'ООО "Компания {rnd.randrange(20000)}"',
+            'salary': salary,
+            'salary_from': salary_from,
+            'salary_to': salary_to,
+            'currency': 'RUR' if salary_from else '',
+            'url': f'https://hh.ru/vacancy/{vacancy_id}',
+            'published_at': self.now - self.period + timedelta(minutes=slot),
+            'area_name': rnd.choice(AREAS),
+        }
+
+    def flush(self, buffers):
+        self.insert(Vacancy, [
+            'id', 'script', 'external_id', 'title', 'company', 'salary', 'salary_from', 'salary_to',
+            'currency', 'gross', 'url', 'published_at', 'area_name', 'found_by_query', 'is_active',
+            'first_seen_at', 'last_seen_at', 'times_found', 'missed_runs', 'content_hash', 'updated_at',
+        ], buffers['vacancies'])
+        self.insert(ScriptRun, [
+            'id', 'script', 'started_by', 'status', 'started_at', 'completed_at', 'total_found',
+            'new_vacancies', 'existing_vacancies', 'is_truncated', 'error_message', 'log_data',
+            'queries_stats', 'timeline',
+        ], buffers['runs'])
+        self.insert(VacancyRun, [
+            'id', 'script_run', 'vacancy', 'is_new_in_run', 'found_at', 'found_by_query',
+        ], buffers['vacancy_runs'])
+        self.insert(RunQueryStat, [
+            'id', 'script_run', 'script', 'run_started_at', 'query', 'query_hash',
+        ] + list(RunQueryStat.STATS_FIELDS.values()), buffers['query_stats'])
+
+        for key, rows in buffers.items():
+            self.counts[key] += len(rows)
+            rows.clear()
+
+    def reset_sequences(self):
+        """Последовательности первичных ключей после явной вставки id (PostgreSQL)"""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Script, ScriptRun, Vacancy, VacancyRun, RunQueryStat]
+        )
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from scripts import search
+from scripts.models import Vacancy
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс вакансий'
+
+    def handle(self, *args, **options):
+        if not search.is_search_available():
+            self.stdout.write(
+                self.style.ERROR('Полнотекстовый индекс недоступен в текущей базе данных')
+            )
+            return
+
+        search.rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Индекс перестроен, вакансий: {Vacancy.objects.count()}')
+        )
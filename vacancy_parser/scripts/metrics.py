@@ -0,0 +1,273 @@
+"""
+Метрики парсера и веб-интерфейса в текстовом формате Prometheus
+
+Каждый процесс хранит значения в памяти и периодически (не чаще раза в
+METRICS_FLUSH_INTERVAL секунд и при завершении) записывает их в свой файл
+metrics_<pid>.json в каталоге METRICS_DIR. Эндпоинт /metrics читает файлы
+всех процессов и суммирует их: счетчики и гистограммы - по всем файлам,
+gauge - только по живым процессам. Поэтому несколько процессов сервера
+(и их потоки-исполнители запусков) отдают общую картину.
+
+Каталог METRICS_DIR стоит очищать при старте сервера, иначе счетчики
+продолжат значения прошлых запусков.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+
+def _metrics_dir():
+    directory = getattr(settings, 'METRICS_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'scripts_hub_metrics'
+    )
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Registry:
+    """Значения метрик текущего процесса и их запись в файл процесса"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._values = {}  # (имя, метки) -> значение или состояние гистограммы
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._pid = os.getpid()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def update(self, key, updater):
+        with self._lock:
+            self._values[key] = updater(self._values.get(key))
+            flush_interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+            if time.monotonic() - self._last_flush >= flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if os.getpid() != self._pid:
+            # Процесс создан через fork - значения родителя не переносим
+            self._pid = os.getpid()
+            self._values = {}
+        self._last_flush = time.monotonic()
+        if not self._values:
+            return
+        payload = {
+            'pid': self._pid,
+            'values': [[name, labels, value] for (name, labels), value in self._values.items()],
+        }
+        directory = _metrics_dir()
+        path = os.path.join(directory, f'metrics_{self._pid}.json')
+        temp_path = f'{path}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(payload, file)
+            os.replace(temp_path, path)
+        except OSError:
+            pass
+
+    def collect(self):
+        """Суммирует значения всех процессов
+
+        Returns:
+            dict: (имя, метки) -> значение
+        """
+        self.flush()
+        merged = {}
+        directory = _metrics_dir()
+        for filename in os.listdir(directory):
+            if not (filename.startswith('metrics_') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(directory, filename), encoding='utf-8') as file:
+                    payload = json.load(file)
+            except (OSError, ValueError):
+                continue
+            alive = _is_alive(payload.get('pid'))
+            for name, labels, value in payload.get('values', []):
+                metric = self.metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                merged[key] = metric.merge(merged.get(key), value)
+        return merged
+
+    def render(self):
+        """Текстовый формат Prometheus"""
+        merged = self.collect()
+        lines = []
+        for metric in sorted(self.metrics.values(), key=lambda metric: metric.name):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            samples = sorted(
+                (labels, value) for (name, labels), value in merged.items() if name == metric.name
+            )
+            for labels, value in samples:
+                lines.extend(metric.render(labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _is_alive(pid):
+    if not pid:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name}: ожидаются метки {self.labelnames}')
+        return (self.name, tuple((name, str(labels[name])) for name in self.labelnames))
+
+    def merge(self, current, value):
+        return (current or 0) + value
+
+    def render(self, labels, value):
+        return [f'{self.name}{_format_labels(labels)} {_format_value(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.update(self._key(labels), lambda value: (value or 0) + amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        self.registry.update(self._key(labels), lambda current: value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != float('inf'):
+            self.buckets += (float('inf'),)
+
+    def observe(self, value, **labels):
+        def updater(state):
+            # Состояние: [счетчики по корзинам (не накопительные), сумма]
+            state = state or [[0] * len(self.buckets), 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            return state
+        self.registry.update(self._key(labels), updater)
+
+    def merge(self, current, value):
+        if current is None:
+            return [list(value[0]), value[1]]
+        return [[a + b for a, b in zip(current[0], value[0])], current[1] + value[1]]
+
+    def render(self, labels, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            bucket_labels = labels + (('le', _format_value(float(bound))),)
+            lines.append(f'{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+atexit.register(REGISTRY.flush)
+
+
+# Парсер
+HH_REQUEST_SECONDS = Histogram(
+    'scripts_hh_request_seconds', 'Время запроса к API hh.ru', ['status']
+)
+HH_REQUESTS = Counter(
+    'scripts_hh_requests_total', 'Запросы к API hh.ru по коду ответа', ['status']
+)
+HH_CACHE_REQUESTS = Counter(
+    'scripts_hh_cache_requests_total', 'Обращения к кэшу ответов API hh.ru: hit, revalidated, miss', ['result']
+)
+PAGES_FETCHED = Counter(
+    'scripts_pages_fetched_total', 'Загруженные страницы результатов поиска', ['script']
+)
+VACANCIES_FILTERED = Counter(
+    'scripts_vacancies_filtered_total', 'Вакансии, отброшенные фильтром "Охрана труда"', ['script']
+)
+VACANCIES_SAVED = Counter(
+    'scripts_vacancies_saved_total', 'Сохраненные вакансии: новые и найденные повторно', ['script', 'kind']
+)
+DB_BATCH_SIZE = Histogram(
+    'scripts_db_write_batch_size', 'Размер пачки вакансий при сохранении',
+    buckets=(10, 50, 100, 250, 500, 1000)
+)
+RUN_DURATION_SECONDS = Histogram(
+    'scripts_run_duration_seconds', 'Длительность запусков скриптов', ['script', 'status'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800)
+)
+RUN_QUEUE_DEPTH = Gauge(
+    'scripts_run_queue_depth', 'Запуски, ожидающие свободного потока'
+)
+
+# Веб-интерфейс
+VIEW_SECONDS = Histogram(
+    'scripts_view_seconds', 'Время обработки запроса по имени URL', ['view', 'method', 'status']
+)
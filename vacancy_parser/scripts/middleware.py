@@ -0,0 +1,49 @@
+"""
+Middleware приложения scripts
+"""
+
+import time
+
+from . import metrics, profiling
+
+
+class MetricsMiddleware:
+    """Время обработки запросов по имени URL (метрика scripts_view_seconds)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else 'unresolved'
+        metrics.VIEW_SECONDS.observe(
+            time.perf_counter() - started,
+            view=view,
+            method=request.method,
+            status=response.status_code,
+        )
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирование запроса сотрудника по требованию (см. scripts/profiling.py)
+
+    Должен стоять после AuthenticationMiddleware. Пользователь проверяется
+    только при наличии признака профилирования.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.is_profiling_requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+
+        request_profile = profiling.RequestProfile()
+        response = request_profile.run(self.get_response, request)
+        capture = request_profile.save(request, response)
+        response['X-Profile-Id'] = str(capture.pk)
+        response['Server-Timing'] = f'app;dur={capture.duration_ms}, db;dur={capture.db_time_ms}'
+        return response
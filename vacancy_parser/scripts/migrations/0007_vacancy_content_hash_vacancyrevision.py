@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0006_script_region_script_search_queries_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacancy',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-1 отслеживаемых полей, позволяет не сравнивать поля без изменений', max_length=40, verbose_name='Хэш содержимого'),
+        ),
+        migrations.CreateModel(
+            name='VacancyRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('changes', models.JSONField(help_text='Изменившиеся поля в виде {"поле": [старое, новое]}', verbose_name='Изменения')),
+                ('content_hash', models.CharField(help_text='Хэш отслеживаемых полей после изменения', max_length=40, verbose_name='Хэш содержимого')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата обнаружения')),
+                ('script_run', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='vacancy_revisions', to='scripts.scriptrun', verbose_name='Запуск скрипта')),
+                ('vacancy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='scripts.vacancy', verbose_name='Вакансия')),
+            ],
+            options={
+                'verbose_name': 'Ревизия вакансии',
+                'verbose_name_plural': 'Ревизии вакансий',
+                'ordering': ['-script_run_id', '-id'],
+                'indexes': [models.Index(fields=['vacancy', 'script_run'], name='scripts_rev_vacancy_run_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0007_vacancy_content_hash_vacancyrevision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scriptrun',
+            name='is_truncated',
+            field=models.BooleanField(default=False, help_text='Были ошибки API или достигнут лимит страниц', verbose_name='Неполные результаты'),
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='missed_runs',
+            field=models.PositiveIntegerField(default=0, help_text='Сколько полных запусков подряд вакансия не находилась', verbose_name='Пропущено запусков подряд'),
+        ),
+    ]
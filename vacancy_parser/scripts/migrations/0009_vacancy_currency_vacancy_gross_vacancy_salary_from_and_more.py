@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0008_scriptrun_is_truncated_vacancy_missed_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacancy',
+            name='currency',
+            field=models.CharField(blank=True, max_length=10, verbose_name='Валюта'),
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='gross',
+            field=models.BooleanField(blank=True, help_text='Пусто, если API не сообщил', null=True, verbose_name='До вычета налогов'),
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='salary_from',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Зарплата от'),
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='salary_to',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Зарплата до'),
+        ),
+        migrations.AddIndex(
+            model_name='vacancy',
+            index=models.Index(fields=['area_name', 'salary_from'], name='scripts_vac_area_salary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacancy',
+            index=models.Index(fields=['script', 'salary_from'], name='scripts_vac_script_salary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacancy',
+            index=models.Index(fields=['salary_to'], name='scripts_vac_salary_to_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+import re
+
+from django.db import migrations
+
+
+BATCH_SIZE = 2000
+
+# Форматы строки зарплаты, которые записывал парсер
+SALARY_PATTERNS = [
+    (re.compile(r'^(\d+)-(\d+) (\S+)$'), ('salary_from', 'salary_to', 'currency')),
+    (re.compile(r'^от (\d+) (\S+)$'), ('salary_from', 'currency')),
+    (re.compile(r'^до (\d+) (\S+)$'), ('salary_to', 'currency')),
+]
+
+
+def parse_salary(salary):
+    """Разбирает строку зарплаты в структурированные поля"""
+    for pattern, fields in SALARY_PATTERNS:
+        match = pattern.match((salary or '').strip())
+        if match:
+            values = dict(zip(fields, match.groups()))
+            for field in ('salary_from', 'salary_to'):
+                if field in values:
+                    values[field] = int(values[field])
+            return values
+    return {}
+
+
+def backfill_salary(apps, schema_editor):
+    """Заполняет структурированные поля зарплаты пачками по первичному ключу"""
+    Vacancy = apps.get_model('scripts', 'Vacancy')
+    last_id = 0
+    while True:
+        batch = list(
+            Vacancy.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'salary')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        
+        changed = []
+        for vacancy in batch:
+            values = parse_salary(vacancy.salary)
+            if values:
+                for field, value in values.items():
+                    setattr(vacancy, field, value)
+                changed.append(vacancy)
+        if changed:
+            Vacancy.objects.bulk_update(changed, ['salary_from', 'salary_to', 'currency'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0009_vacancy_currency_vacancy_gross_vacancy_salary_from_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_salary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+SEARCH_TABLE = 'scripts_vacancy_search'
+
+
+def create_search_index(apps, schema_editor):
+    """Создает полнотекстовый индекс вакансий и заполняет его текущими данными"""
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {SEARCH_TABLE} ("
+            "vacancy_id bigint PRIMARY KEY, "
+            "script_id bigint NOT NULL, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {SEARCH_TABLE}_document_idx ON {SEARCH_TABLE} USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {SEARCH_TABLE}_script_idx ON {SEARCH_TABLE} (script_id)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (vacancy_id, script_id, document) "
+            "SELECT id, script_id, "
+            "setweight(to_tsvector('russian', title), 'A') || "
+            "setweight(to_tsvector('russian', company), 'B') || "
+            "to_tsvector('simple', area_name || ' ' || found_by_query || ' ' || external_id) "
+            "FROM scripts_vacancy"
+        )
+    elif connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                "title, company, area_name, found_by_query, external_id, "
+                "script_id UNINDEXED, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite собран без FTS5 - поиск будет работать через LIKE
+            return
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, script_id, title, company, area_name, found_by_query, external_id) "
+            "SELECT id, script_id, title, company, area_name, found_by_query, external_id "
+            "FROM scripts_vacancy"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0010_backfill_vacancy_salary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0011_vacancy_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scriptrun',
+            index=models.Index(fields=['started_at', 'id'], name='scripts_run_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scriptrun',
+            index=models.Index(fields=['script', 'started_at'], name='scripts_run_script_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacancyrun',
+            index=models.Index(fields=['script_run', 'found_at', 'id'], name='scripts_vr_run_found_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacancyrun',
+            index=models.Index(fields=['script_run', 'is_new_in_run', 'found_at', 'id'], name='scripts_vr_run_new_found_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+import ast
+import json
+
+from django.db import migrations
+
+
+BATCH_SIZE = 2000
+
+
+def parse_text(value, expected_type, default):
+    """Разбирает JSON или repr() словаря/списка Python (так раньше сохранял парсер)"""
+    if not value or not value.strip():
+        return default
+    for loader in (json.loads, ast.literal_eval):
+        try:
+            parsed = loader(value)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            continue
+        if isinstance(parsed, expected_type):
+            return parsed
+    return default
+
+
+def normalize_json_text(apps, schema_editor):
+    """Приводит search_queries и queries_stats к валидному JSON перед сменой типа колонок
+
+    JSON сериализуется так же, как его записывает JSONField (ensure_ascii), иначе
+    пути JSON-операторов SQLite не совпадут с ключами на кириллице.
+    """
+    Script = apps.get_model('scripts', 'Script')
+    ScriptRun = apps.get_model('scripts', 'ScriptRun')
+
+    changed = []
+    for script in Script.objects.only('id', 'search_queries'):
+        normalized = json.dumps(parse_text(script.search_queries, list, []))
+        if normalized != script.search_queries:
+            script.search_queries = normalized
+            changed.append(script)
+    Script.objects.bulk_update(changed, ['search_queries'], batch_size=BATCH_SIZE)
+
+    last_id = 0
+    while True:
+        batch = list(
+            ScriptRun.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'queries_stats')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        changed = []
+        for script_run in batch:
+            normalized = json.dumps(parse_text(script_run.queries_stats, dict, {}))
+            if normalized != script_run.queries_stats:
+                script_run.queries_stats = normalized
+                changed.append(script_run)
+        if changed:
+            ScriptRun.objects.bulk_update(changed, ['queries_stats'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0012_scriptrun_scripts_run_started_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_json_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:47
+
+import scripts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0013_normalize_json_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='script',
+            name='search_queries',
+            field=models.JSONField(default=scripts.models.default_search_queries, help_text='JSON массив поисковых запросов, например: ["запрос1", "запрос2"]', verbose_name='Поисковые запросы (JSON)'),
+        ),
+        migrations.AlterField(
+            model_name='scriptrun',
+            name='queries_stats',
+            field=models.JSONField(blank=True, default=dict, help_text='JSON с детальной статистикой по каждому поисковому запросу', verbose_name='Статистика по запросам'),
+        ),
+    ]
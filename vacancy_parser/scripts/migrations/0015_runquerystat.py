@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0014_alter_script_search_queries_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunQueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_started_at', models.DateTimeField(verbose_name='Время запуска')),
+                ('query', models.CharField(max_length=200, verbose_name='Поисковый запрос')),
+                ('found_in_api', models.PositiveIntegerField(default=0, verbose_name='Найдено в API')),
+                ('collected', models.PositiveIntegerField(default=0, verbose_name='Собрано')),
+                ('filtered_out', models.PositiveIntegerField(default=0, verbose_name='Отфильтровано')),
+                ('unique_vacancies', models.PositiveIntegerField(default=0, verbose_name='Уникальных')),
+                ('duplicates', models.PositiveIntegerField(default=0, verbose_name='Дубликатов')),
+                ('new_vacancies', models.PositiveIntegerField(default=0, verbose_name='Новых')),
+                ('existing_vacancies', models.PositiveIntegerField(default=0, verbose_name='Существующих')),
+                ('pages_fetched', models.PositiveIntegerField(default=0, verbose_name='Загружено страниц')),
+                ('fetch_ms', models.PositiveIntegerField(default=0, verbose_name='Время загрузки, мс')),
+                ('script', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='query_stat_rows', to='scripts.script', verbose_name='Скрипт')),
+                ('script_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='query_stat_rows', to='scripts.scriptrun', verbose_name='Запуск скрипта')),
+            ],
+            options={
+                'verbose_name': 'Статистика запроса',
+                'verbose_name_plural': 'Статистика запросов',
+                'ordering': ['-run_started_at', 'query'],
+                'indexes': [models.Index(fields=['script', 'query', 'run_started_at'], name='scripts_rqs_script_query_idx')],
+                'unique_together': {('script_run', 'query')},
+            },
+        ),
+    ]
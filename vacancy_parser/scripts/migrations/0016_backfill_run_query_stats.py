@@ -0,0 +1,71 @@
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+# Поле модели -> ключи в queries_stats (включая названия из старых версий парсера)
+STATS_KEYS = {
+    'found_in_api': ('found_in_api', 'total_found'),
+    'collected': ('collected_by_script', 'collected_vacancies'),
+    'filtered_out': ('filtered_out',),
+    'unique_vacancies': ('unique_vacancies',),
+    'duplicates': ('duplicates',),
+    'new_vacancies': ('new_vacancies',),
+    'existing_vacancies': ('existing_vacancies',),
+    'pages_fetched': ('pages_fetched',),
+    'fetch_ms': ('fetch_ms',),
+}
+
+
+def stat_value(stats, keys):
+    for key in keys:
+        try:
+            return max(int(stats.get(key) or 0), 0)
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def backfill_run_query_stats(apps, schema_editor):
+    """Заполняет RunQueryStat из queries_stats существующих запусков"""
+    ScriptRun = apps.get_model('scripts', 'ScriptRun')
+    RunQueryStat = apps.get_model('scripts', 'RunQueryStat')
+    last_id = 0
+    while True:
+        batch = list(
+            ScriptRun.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'script_id', 'started_at', 'queries_stats')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        rows = []
+        for script_run in batch:
+            if not isinstance(script_run.queries_stats, dict):
+                continue
+            for query, stats in script_run.queries_stats.items():
+                if not isinstance(stats, dict):
+                    continue
+                rows.append(RunQueryStat(
+                    script_run_id=script_run.id,
+                    script_id=script_run.script_id,
+                    run_started_at=script_run.started_at,
+                    # Поле пока ограничено 200 символами; полный текст и отброшенные
+                    # строки восстанавливает 0021_runquerystat_query_hash
+                    query=query[:200],
+                    **{field: stat_value(stats, keys) for field, keys in STATS_KEYS.items()}
+                ))
+        RunQueryStat.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0015_runquerystat'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_run_query_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0016_backfill_run_query_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scriptrun',
+            name='timeline',
+            field=models.JSONField(blank=True, default=dict, help_text='Длительность фаз запуска и количество SQL-запросов (см. scripts/timeline.py)', verbose_name='Хронология выполнения'),
+        ),
+    ]
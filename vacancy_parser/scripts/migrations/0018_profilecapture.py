@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0017_scriptrun_timeline'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileCapture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Адрес')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration_ms', models.FloatField(verbose_name='Время ответа, мс')),
+                ('db_queries', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('db_time_ms', models.FloatField(verbose_name='Время SQL, мс')),
+                ('duplicate_queries', models.PositiveIntegerField(help_text='Запросы, выполненные повторно с теми же параметрами', verbose_name='Повторных запросов')),
+                ('queries', models.JSONField(default=list, help_text='SQL, параметры, длительность и место вызова', verbose_name='SQL-запросы')),
+                ('duplicates', models.JSONField(default=list, verbose_name='Повторяющиеся запросы')),
+                ('profile_text', models.TextField(blank=True, verbose_name='Профиль (текст)')),
+                ('profile_data', models.BinaryField(blank=True, verbose_name='Профиль (pstats)')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0018_profilecapture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacancy',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        migrations.AddIndex(
+            model_name='vacancy',
+            index=models.Index(fields=['script', 'updated_at'], name='scripts_vac_script_updated_idx'),
+        ),
+    ]
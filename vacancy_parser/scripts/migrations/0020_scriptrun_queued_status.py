@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0019_vacancy_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scriptrun',
+            name='status',
+            field=models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('completed', 'Завершен'), ('failed', 'Ошибка')], default='running', max_length=20, verbose_name='Статус'),
+        ),
+    ]
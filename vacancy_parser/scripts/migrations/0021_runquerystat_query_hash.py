@@ -0,0 +1,129 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+# Поле модели -> ключи в queries_stats (как в 0016_backfill_run_query_stats)
+STATS_KEYS = {
+    'found_in_api': ('found_in_api', 'total_found'),
+    'collected': ('collected_by_script', 'collected_vacancies'),
+    'filtered_out': ('filtered_out',),
+    'unique_vacancies': ('unique_vacancies',),
+    'duplicates': ('duplicates',),
+    'new_vacancies': ('new_vacancies',),
+    'existing_vacancies': ('existing_vacancies',),
+    'pages_fetched': ('pages_fetched',),
+    'fetch_ms': ('fetch_ms',),
+}
+
+
+def stat_value(stats, keys):
+    for key in keys:
+        try:
+            return max(int(stats.get(key) or 0), 0)
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def query_hash(query):
+    return hashlib.sha1(query.encode('utf-8')).hexdigest()
+
+
+def rebuild_query_stats(apps, schema_editor):
+    """Перестраивает строки статистики из queries_stats запусков
+
+    До этой миграции запрос хранился обрезанным до 200 символов, а строки
+    запросов с общим началом отбрасывались как дубликаты (ignore_conflicts
+    в 0016). Для запусков с queries_stats строки создаются заново с полным
+    текстом запроса и хэшем от него; у остальных строк (статистики запуска
+    уже нет) хэш считается по сохраненному тексту.
+    """
+    ScriptRun = apps.get_model('scripts', 'ScriptRun')
+    RunQueryStat = apps.get_model('scripts', 'RunQueryStat')
+    last_id = 0
+    while True:
+        batch = list(
+            ScriptRun.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'script_id', 'started_at', 'queries_stats')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        rebuilt_run_ids = []
+        rows = []
+        for script_run in batch:
+            if not isinstance(script_run.queries_stats, dict):
+                continue
+            rebuilt_run_ids.append(script_run.id)
+            for query, stats in script_run.queries_stats.items():
+                if not isinstance(stats, dict):
+                    continue
+                rows.append(RunQueryStat(
+                    script_run_id=script_run.id,
+                    script_id=script_run.script_id,
+                    run_started_at=script_run.started_at,
+                    query=query,
+                    query_hash=query_hash(query),
+                    **{field: stat_value(stats, keys) for field, keys in STATS_KEYS.items()}
+                ))
+        RunQueryStat.objects.filter(script_run_id__in=rebuilt_run_ids).delete()
+        # Ключи словаря уникальны - конфликтов (script_run, query_hash) нет
+        RunQueryStat.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+    last_id = 0
+    while True:
+        batch = list(
+            RunQueryStat.objects.filter(id__gt=last_id, query_hash='')
+            .order_by('id')
+            .only('id', 'query')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        for row in batch:
+            row.query_hash = query_hash(row.query)
+        RunQueryStat.objects.bulk_update(batch, ['query_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0020_scriptrun_queued_status'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='runquerystat',
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name='runquerystat',
+            name='scripts_rqs_script_query_idx',
+        ),
+        migrations.AlterField(
+            model_name='runquerystat',
+            name='query',
+            field=models.TextField(verbose_name='Поисковый запрос'),
+        ),
+        migrations.AddField(
+            model_name='runquerystat',
+            name='query_hash',
+            field=models.CharField(default='', max_length=40, verbose_name='Хэш запроса'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(rebuild_query_stats, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='runquerystat',
+            unique_together={('script_run', 'query_hash')},
+        ),
+        migrations.AddIndex(
+            model_name='runquerystat',
+            index=models.Index(fields=['script', 'query_hash', 'run_started_at'], name='scripts_rqs_script_hash_idx'),
+        ),
+    ]
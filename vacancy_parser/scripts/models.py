@@ -1,7 +1,18 @@
 from django.db import models
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Cast, Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
+from datetime import timezone as dt_timezone
+import hashlib
 import json
+from .timeline import timeline_rows
+
+
+def default_search_queries():
+    """Поисковые запросы нового скрипта по умолчанию"""
+    return ['Инженер по охране труда', 'Специалист по охране труда']
 
 
 class Script(models.Model):
@@ -38,8 +49,8 @@ class Script(models.Model):
     )
     
     # Новые поля для расширенного поиска
-    search_queries = models.TextField(
-        default='["Инженер по охране труда", "Специалист по охране труда"]',
+    search_queries = models.JSONField(
+        default=default_search_queries,
         verbose_name='Поисковые запросы (JSON)',
         help_text='JSON массив поисковых запросов, например: ["запрос1", "запрос2"]'
     )
@@ -85,23 +96,21 @@ class Script(models.Model):
     
     def get_search_queries_list(self):
         """Возвращает список поисковых запросов"""
-        try:
-            queries = json.loads(self.search_queries)
-            if isinstance(queries, list) and queries:
-                return queries
-        except (json.JSONDecodeError, TypeError):
-            pass
+        # JSONField разбирается один раз при загрузке из БД
+        queries = self.search_queries
+        if isinstance(queries, list) and queries:
+            return queries
         
         # Fallback к старому формату
         if self.search_query:
             return [self.search_query]
         
-        return ['Инженер по охране труда', 'Специалист по охране труда']
+        return default_search_queries()
     
     def set_search_queries_list(self, queries_list):
         """Устанавливает список поисковых запросов"""
         if isinstance(queries_list, list):
-            self.search_queries = json.dumps(queries_list, ensure_ascii=False)
+            self.search_queries = queries_list
         else:
             raise ValueError("queries_list должен быть списком")
     
@@ -139,15 +148,16 @@ class Script(models.Model):
             return False
         
         # Создатель всегда имеет доступ
-        if self.created_by == user:
+        if self.created_by_id == user.id:
             return True
         
         # Суперпользователи имеют доступ ко всем скриптам
         if user.is_superuser:
             return True
         
-        # Проверяем, находится ли пользователь в списке разрешенных
-        return self.allowed_users.filter(id=user.id).exists()
+        # Проверяем, находится ли пользователь в списке разрешенных (кэш прав доступа)
+        from .access import get_accessible_script_ids
+        return self.pk in get_accessible_script_ids(user, is_active=None)
     
     def get_allowed_users_count(self):
         """Возвращает количество пользователей с доступом к скрипту"""
@@ -158,14 +168,37 @@ class Script(models.Model):
         return ', '.join([user.username for user in self.allowed_users.all()[:5]])
 
 
+class ScriptRunQuerySet(models.QuerySet):
+    """Запросы к запускам по статистике поисковых запросов (JSON-операторы СУБД)"""
+    
+    @staticmethod
+    def query_stat_expression(query, stat):
+        """Значение queries_stats[query][stat] как целое число на стороне БД"""
+        return Cast(KeyTextTransform(stat, KeyTransform(query, 'queries_stats')), models.IntegerField())
+    
+    def with_query_stat(self, query, stat, alias='query_stat'):
+        """Добавляет к запускам значение статистики stat по поисковому запросу query"""
+        return self.annotate(**{alias: self.query_stat_expression(query, stat)})
+    
+    def where_query_stat_gte(self, query, stat, min_value):
+        """Запуски, в которых по запросу query значение stat не меньше min_value"""
+        return self.alias(
+            _query_stat=self.query_stat_expression(query, stat)
+        ).filter(_query_stat__gte=min_value)
+
+
 class ScriptRun(models.Model):
     """Модель для хранения истории запусков скриптов"""
     STATUS_CHOICES = [
+        ('queued', 'В очереди'),
         ('running', 'Выполняется'),
         ('completed', 'Завершен'),
         ('failed', 'Ошибка'),
     ]
     
+    # Запуск не завершен: ждет свободного потока или выполняется
+    ACTIVE_STATUSES = ('queued', 'running')
+    
     script = models.ForeignKey(
         Script, 
         on_delete=models.CASCADE, 
@@ -183,6 +216,7 @@ class ScriptRun(models.Model):
         default='running',
         verbose_name='Статус'
     )
+    # Время постановки в очередь; когда запуск начинает выполняться, заменяется временем начала
     started_at = models.DateTimeField(auto_now_add=True, verbose_name='Время запуска')
     completed_at = models.DateTimeField(
         null=True, 
@@ -201,6 +235,11 @@ class ScriptRun(models.Model):
         default=0, 
         verbose_name='Существующих вакансий'
     )
+    is_truncated = models.BooleanField(
+        default=False,
+        verbose_name='Неполные результаты',
+        help_text='Были ошибки API или достигнут лимит страниц'
+    )
     error_message = models.TextField(
         blank=True, 
         verbose_name='Сообщение об ошибке'
@@ -211,39 +250,114 @@ class ScriptRun(models.Model):
     )
     
     # Новые поля для статистики по запросам
-    queries_stats = models.TextField(
+    queries_stats = models.JSONField(
+        default=dict,
         blank=True,
         verbose_name='Статистика по запросам',
         help_text='JSON с детальной статистикой по каждому поисковому запросу'
     )
+    timeline = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Хронология выполнения',
+        help_text='Длительность фаз запуска и количество SQL-запросов (см. scripts/timeline.py)'
+    )
+    
+    objects = ScriptRunQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Запуск скрипта'
         verbose_name_plural = 'Запуски скриптов'
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['started_at', 'id'], name='scripts_run_started_idx'),
+            models.Index(fields=['script', 'started_at'], name='scripts_run_script_started_idx'),
+        ]
     
     def __str__(self):
         return f'{self.script.name} - {self.started_at.strftime("%d.%m.%Y %H:%M")}'
     
     def get_queries_stats(self):
         """Возвращает статистику по запросам"""
-        try:
-            if self.queries_stats:
-                return json.loads(self.queries_stats)
-        except (json.JSONDecodeError, TypeError):
-            pass
+        if isinstance(self.queries_stats, dict):
+            return self.queries_stats
         return {}
     
+    def get_timeline_rows(self, max_depth=2):
+        """Интервалы хронологии для отображения полосами"""
+        return timeline_rows(self.timeline, max_depth=max_depth)
+    
+    def get_timeline_totals(self):
+        """Итоги по фазам, от самой долгой"""
+        totals = (self.timeline or {}).get('totals', {})
+        return sorted(
+            ({'name': name, **total} for name, total in totals.items()),
+            key=lambda total: total['duration_ms'],
+            reverse=True
+        )
+    
     def set_queries_stats(self, stats_dict):
         """Устанавливает статистику по запросам"""
         if isinstance(stats_dict, dict):
-            self.queries_stats = json.dumps(stats_dict, ensure_ascii=False)
+            self.queries_stats = stats_dict
         else:
             raise ValueError("stats_dict должен быть словарем")
 
 
+class VacancyQuerySet(models.QuerySet):
+    """Запросы к вакансиям по структурированным полям зарплаты"""
+    
+    def with_salary_value(self):
+        """Добавляет salary_value - нижнюю границу вилки, а если её нет, верхнюю"""
+        return self.annotate(salary_value=Coalesce('salary_from', 'salary_to'))
+    
+    def salary_at_least(self, amount, currency='RUR'):
+        """Вакансии, в которых можно получать не меньше amount"""
+        return self.filter(
+            Q(salary_from__gte=amount) | Q(salary_from__isnull=True, salary_to__gte=amount),
+            currency=currency
+        )
+    
+    def salary_stats(self, currency='RUR'):
+        """Статистика зарплат в одной валюте, посчитанная в БД
+        
+        Суммы в разных валютах несравнимы, поэтому учитываются только
+        вакансии с валютой currency.
+        
+        Returns:
+            dict: count, min, max, avg и median по salary_value
+        """
+        values = self.with_salary_value().filter(salary_value__isnull=False, currency=currency)
+        stats = values.aggregate(
+            count=Count('id'),
+            min=Min('salary_value'),
+            max=Max('salary_value'),
+            avg=Avg('salary_value')
+        )
+        stats['median'] = None
+        if stats['count']:
+            ordered = values.order_by('salary_value').values_list('salary_value', flat=True)
+            middle = stats['count'] // 2
+            if stats['count'] % 2:
+                stats['median'] = ordered[middle]
+            else:
+                lower, upper = ordered[middle - 1:middle + 1]
+                stats['median'] = (lower + upper) / 2
+        return stats
+    
+    def salary_stats_by_currency(self):
+        """Статистика зарплат по каждой валюте: {валюта: salary_stats(валюта)}"""
+        currencies = self.with_salary_value().filter(
+            salary_value__isnull=False
+        ).exclude(currency='').order_by('currency').values_list('currency', flat=True).distinct()
+        return {currency: self.salary_stats(currency) for currency in currencies}
+
+
 class Vacancy(models.Model):
     """Модель для хранения информации о вакансиях"""
+    # Поля, изменения которых сохраняются в истории (VacancyRevision)
+    TRACKED_FIELDS = ('title', 'company', 'salary', 'url', 'published_at', 'area_name')
+    
     # Связь со скриптом (владельцем)
     script = models.ForeignKey(
         Script,
@@ -260,6 +374,29 @@ class Vacancy(models.Model):
     title = models.CharField(max_length=500, verbose_name='Название')
     company = models.CharField(max_length=300, verbose_name='Компания')
     salary = models.CharField(max_length=200, verbose_name='Зарплата')
+    
+    # Структурированная зарплата для фильтрации и статистики в БД
+    salary_from = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Зарплата от'
+    )
+    salary_to = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Зарплата до'
+    )
+    currency = models.CharField(
+        max_length=10,
+        blank=True,
+        verbose_name='Валюта'
+    )
+    gross = models.BooleanField(
+        null=True,
+        blank=True,
+        verbose_name='До вычета налогов',
+        help_text='Пусто, если API не сообщил'
+    )
     url = models.URLField(verbose_name='Ссылка на вакансию')
     published_at = models.DateTimeField(
         null=True, 
@@ -299,12 +436,33 @@ class Vacancy(models.Model):
         default=1,
         verbose_name='Количество обнаружений'
     )
+    missed_runs = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Пропущено запусков подряд',
+        help_text='Сколько полных запусков подряд вакансия не находилась'
+    )
+    content_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        verbose_name='Хэш содержимого',
+        help_text='SHA-1 отслеживаемых полей, позволяет не сравнивать поля без изменений'
+    )
+    # Меняется при любой записи вакансии (парсер, снятие с публикации, админка) - для ETag API
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
     class Meta:
         verbose_name = 'Вакансия'
         verbose_name_plural = 'Вакансии'
         ordering = ['-last_seen_at']
         unique_together = ['script', 'external_id']
+        indexes = [
+            models.Index(fields=['script', 'updated_at'], name='scripts_vac_script_updated_idx'),
+            models.Index(fields=['area_name', 'salary_from'], name='scripts_vac_area_salary_idx'),
+            models.Index(fields=['script', 'salary_from'], name='scripts_vac_script_salary_idx'),
+            models.Index(fields=['salary_to'], name='scripts_vac_salary_to_idx'),
+        ]
+    
+    objects = VacancyQuerySet.as_manager()
     
     def mark_as_found(self, found_by_query=''):
         """Отмечает вакансию как найденную в текущем запуске"""
@@ -313,7 +471,74 @@ class Vacancy(models.Model):
         self.times_found += 1
         if found_by_query:
             self.found_by_query = found_by_query
-        self.save(update_fields=['is_active', 'last_seen_at', 'times_found', 'found_by_query'])
+        self.save(update_fields=['is_active', 'last_seen_at', 'times_found', 'found_by_query', 'updated_at'])
+    
+    @classmethod
+    def serialize_tracked_value(cls, field, value):
+        """Приводит значение отслеживаемого поля к JSON-совместимому виду"""
+        if field == 'published_at' and value is not None:
+            # Сравниваем моменты времени, а не их запись в разных часовых поясах
+            return value.astimezone(dt_timezone.utc).isoformat()
+        return value
+    
+    @staticmethod
+    def compute_content_hash(values):
+        """Вычисляет хэш отслеживаемых полей (значения в JSON-совместимом виде)"""
+        payload = json.dumps(values, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def get_tracked_values(self):
+        """Возвращает текущие значения отслеживаемых полей"""
+        return {
+            field: self.serialize_tracked_value(field, getattr(self, field))
+            for field in self.TRACKED_FIELDS
+        }
+    
+    def apply_tracked_values(self, values):
+        """Применяет актуальные значения отслеживаемых полей без сохранения
+        
+        Args:
+            values: Значения отслеживаемых полей в JSON-совместимом виде
+            
+        Returns:
+            dict: Изменившиеся поля в виде {поле: [старое, новое]}
+        """
+        content_hash = self.compute_content_hash(values)
+        if content_hash == self.content_hash:
+            return {}
+        
+        current = self.get_tracked_values()
+        changes = {
+            field: [current[field], values[field]]
+            for field in self.TRACKED_FIELDS
+            if current[field] != values[field]
+        }
+        for field in changes:
+            setattr(self, field, self._meta.get_field(field).to_python(values[field]))
+        self.content_hash = content_hash
+        return changes
+    
+    def get_state_as_of(self, script_run):
+        """Восстанавливает отслеживаемые поля вакансии на момент запуска
+        
+        Ревизии хранят прежние значения изменившихся полей, поэтому состояние
+        получается откатом текущих значений по ревизиям более поздних запусков.
+        
+        Returns:
+            dict | None: Значения полей или None, если вакансия ещё не была найдена
+        """
+        run_id = getattr(script_run, 'pk', script_run)
+        if not self.runs.filter(script_run_id__lte=run_id).exists():
+            return None
+        
+        state = self.get_tracked_values()
+        later_changes = self.revisions.filter(
+            script_run_id__gt=run_id
+        ).order_by('-script_run_id', '-id').values_list('changes', flat=True)
+        for changes in later_changes:
+            for field, (old_value, new_value) in changes.items():
+                state[field] = old_value
+        return state
         
     def __str__(self):
         return f"{self.title} - {self.company}"
@@ -354,6 +579,217 @@ class VacancyRun(models.Model):
         verbose_name = 'Вакансия в запуске'
         verbose_name_plural = 'Вакансии в запусках'
         unique_together = ['script_run', 'vacancy']
+        indexes = [
+            models.Index(fields=['script_run', 'found_at', 'id'], name='scripts_vr_run_found_idx'),
+            models.Index(
+                fields=['script_run', 'is_new_in_run', 'found_at', 'id'],
+                name='scripts_vr_run_new_found_idx'
+            ),
+        ]
     
     def __str__(self):
         return f'{self.vacancy.title} (Запуск {self.script_run.id})'
+
+
+class VacancyRevision(models.Model):
+    """Изменения отслеживаемых полей вакансии, обнаруженные в запуске"""
+    vacancy = models.ForeignKey(
+        Vacancy,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        verbose_name='Вакансия'
+    )
+    # Без ограничения внешнего ключа: удаление запуска не должно разрывать
+    # цепочку ревизий, по которой восстанавливается история вакансии
+    script_run = models.ForeignKey(
+        ScriptRun,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='vacancy_revisions',
+        verbose_name='Запуск скрипта'
+    )
+    changes = models.JSONField(
+        verbose_name='Изменения',
+        help_text='Изменившиеся поля в виде {"поле": [старое, новое]}'
+    )
+    content_hash = models.CharField(
+        max_length=40,
+        verbose_name='Хэш содержимого',
+        help_text='Хэш отслеживаемых полей после изменения'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата обнаружения')
+    
+    class Meta:
+        verbose_name = 'Ревизия вакансии'
+        verbose_name_plural = 'Ревизии вакансий'
+        ordering = ['-script_run_id', '-id']
+        indexes = [
+            models.Index(fields=['vacancy', 'script_run'], name='scripts_rev_vacancy_run_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.vacancy_id}: {", ".join(self.changes)} (Запуск {self.script_run_id})'
+
+
+class RunQueryStatQuerySet(models.QuerySet):
+    """Агрегаты статистики поисковых запросов"""
+    
+    def productivity(self, script, since=None):
+        """Суммарная статистика по каждому запросу скрипта (одним агрегирующим запросом)
+        
+        Args:
+            script: Скрипт
+            since: Учитывать только запуски, начатые не раньше этой даты
+        """
+        stats = self.filter(script=script)
+        if since is not None:
+            stats = stats.filter(run_started_at__gte=since)
+        return stats.values('query_hash', 'query').annotate(
+            runs=Count('id'),
+            found_in_api=Sum('found_in_api'),
+            collected=Sum('collected'),
+            new_vacancies=Sum('new_vacancies'),
+            existing_vacancies=Sum('existing_vacancies'),
+            pages_fetched=Sum('pages_fetched'),
+            fetch_ms=Sum('fetch_ms'),
+            last_run_at=Max('run_started_at'),
+        ).order_by('-new_vacancies')
+
+
+class RunQueryStat(models.Model):
+    """Статистика одного поискового запроса в запуске
+    
+    Нормализованная копия ScriptRun.queries_stats для агрегирующих запросов.
+    """
+    script_run = models.ForeignKey(
+        ScriptRun,
+        on_delete=models.CASCADE,
+        related_name='query_stat_rows',
+        verbose_name='Запуск скрипта'
+    )
+    # Скрипт и время запуска продублированы для индекса (script, query, run_started_at)
+    script = models.ForeignKey(
+        Script,
+        on_delete=models.CASCADE,
+        related_name='query_stat_rows',
+        verbose_name='Скрипт'
+    )
+    run_started_at = models.DateTimeField(verbose_name='Время запуска')
+    query = models.TextField(verbose_name='Поисковый запрос')
+    # Запрос может быть длинным - уникальность и индекс строятся по его хэшу
+    query_hash = models.CharField(max_length=40, verbose_name='Хэш запроса')
+    found_in_api = models.PositiveIntegerField(default=0, verbose_name='Найдено в API')
+    collected = models.PositiveIntegerField(default=0, verbose_name='Собрано')
+    filtered_out = models.PositiveIntegerField(default=0, verbose_name='Отфильтровано')
+    unique_vacancies = models.PositiveIntegerField(default=0, verbose_name='Уникальных')
+    duplicates = models.PositiveIntegerField(default=0, verbose_name='Дубликатов')
+    new_vacancies = models.PositiveIntegerField(default=0, verbose_name='Новых')
+    existing_vacancies = models.PositiveIntegerField(default=0, verbose_name='Существующих')
+    pages_fetched = models.PositiveIntegerField(default=0, verbose_name='Загружено страниц')
+    fetch_ms = models.PositiveIntegerField(default=0, verbose_name='Время загрузки, мс')
+    
+    objects = RunQueryStatQuerySet.as_manager()
+    
+    # Ключ в queries_stats -> поле модели
+    STATS_FIELDS = {
+        'found_in_api': 'found_in_api',
+        'collected_by_script': 'collected',
+        'filtered_out': 'filtered_out',
+        'unique_vacancies': 'unique_vacancies',
+        'duplicates': 'duplicates',
+        'new_vacancies': 'new_vacancies',
+        'existing_vacancies': 'existing_vacancies',
+        'pages_fetched': 'pages_fetched',
+        'fetch_ms': 'fetch_ms',
+    }
+    
+    class Meta:
+        verbose_name = 'Статистика запроса'
+        verbose_name_plural = 'Статистика запросов'
+        ordering = ['-run_started_at', 'query']
+        unique_together = ['script_run', 'query_hash']
+        indexes = [
+            models.Index(fields=['script', 'query_hash', 'run_started_at'], name='scripts_rqs_script_hash_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.query} (Запуск {self.script_run_id})'
+    
+    @staticmethod
+    def compute_query_hash(query):
+        return hashlib.sha1(query.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def from_queries_stats(cls, script_run):
+        """Строит (несохраненные) записи по ScriptRun.queries_stats"""
+        rows = []
+        for query, stats in script_run.get_queries_stats().items():
+            if not isinstance(stats, dict):
+                continue
+            values = {
+                field: max(int(stats.get(key) or 0), 0)
+                for key, field in cls.STATS_FIELDS.items()
+            }
+            rows.append(cls(
+                script_run=script_run,
+                script_id=script_run.script_id,
+                run_started_at=script_run.started_at,
+                query=query,
+                query_hash=cls.compute_query_hash(query),
+                **values
+            ))
+        return rows
+
+
+class ProfileCaptureQuerySet(models.QuerySet):
+    """Снимки профилирования запросов"""
+    
+    def trim(self, keep):
+        """Удаляет снимки старше последних keep"""
+        boundary = self.order_by('-created_at', '-id').values_list('id', flat=True)[keep:keep + 1]
+        boundary_id = next(iter(boundary), None)
+        if boundary_id is not None:
+            self.filter(id__lte=boundary_id).delete()
+
+
+class ProfileCapture(models.Model):
+    """Профиль одного запроса, снятый по требованию сотрудника (см. scripts/profiling.py)"""
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Время')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Пользователь'
+    )
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    path = models.CharField(max_length=500, verbose_name='Адрес')
+    status_code = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    duration_ms = models.FloatField(verbose_name='Время ответа, мс')
+    db_queries = models.PositiveIntegerField(verbose_name='SQL-запросов')
+    db_time_ms = models.FloatField(verbose_name='Время SQL, мс')
+    duplicate_queries = models.PositiveIntegerField(
+        verbose_name='Повторных запросов',
+        help_text='Запросы, выполненные повторно с теми же параметрами'
+    )
+    queries = models.JSONField(
+        default=list,
+        verbose_name='SQL-запросы',
+        help_text='SQL, параметры, длительность и место вызова'
+    )
+    duplicates = models.JSONField(
+        default=list,
+        verbose_name='Повторяющиеся запросы'
+    )
+    profile_text = models.TextField(blank=True, verbose_name='Профиль (текст)')
+    profile_data = models.BinaryField(blank=True, verbose_name='Профиль (pstats)')
+    
+    objects = ProfileCaptureQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-created_at', '-id']
+    
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} мс)'
@@ -0,0 +1,77 @@
+"""
+Кэш данных страниц скриптов
+
+Кэшируются данные контекста (не HTML - в страницах есть CSRF-токен) страниц
+скрипта, вакансий запуска и истории. Данные меняются только при запуске,
+завершении или удалении запуска, поэтому ключ содержит версию скрипта,
+которую меняют парсер (по завершении) и представления запуска/удаления.
+Версия прав доступа пользователя (access.py) также входит в ключ.
+
+Версия данных меняется при любом изменении запусков и вакансий (в том числе
+с каждой сохраненной пачкой выполняющегося запуска) - по ней вычисляются
+ETag больших списков API без агрегатов по всей таблице.
+"""
+
+import hashlib
+import uuid
+
+from django.core.cache import cache
+
+from .access import get_access_version, get_cache_versions
+
+
+PAGE_CACHE_TIMEOUT = 10 * 60
+
+RUNS_VERSION_KEY = 'script_pages:runs_version'
+
+DATA_VERSION_KEY = 'script_pages:data_version'
+
+
+def _script_version_key(script_id):
+    return f'script_pages:version:{script_id}'
+
+
+def bump_script_versions(script_ids):
+    """Сбрасывает кэш страниц скриптов и общей истории запусков"""
+    versions = {_script_version_key(script_id): uuid.uuid4().hex for script_id in script_ids}
+    versions[RUNS_VERSION_KEY] = uuid.uuid4().hex
+    versions[DATA_VERSION_KEY] = uuid.uuid4().hex
+    cache.set_many(versions, None)
+
+
+def bump_data_version():
+    """Отмечает изменение вакансий или запусков, не меняющее кэш страниц"""
+    cache.set(DATA_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_script_version(script_id) -> str:
+    return get_cache_versions([_script_version_key(script_id)])[0]
+
+
+def get_runs_version() -> str:
+    return get_cache_versions([RUNS_VERSION_KEY])[0]
+
+
+def get_data_version() -> str:
+    return get_cache_versions([DATA_VERSION_KEY])[0]
+
+
+def cached_page_data(user, parts, builder, cacheable=True):
+    """Возвращает данные страницы из кэша или вычисляет их через builder()
+
+    Args:
+        user: Пользователь (версия его прав входит в ключ)
+        parts: Составляющие ключа (имя страницы, версия, id, фильтр, курсор)
+        builder: Функция, вычисляющая данные
+        cacheable: False - вычислить без кэша (например, запуск еще выполняется)
+    """
+    if not cacheable:
+        return builder()
+
+    raw_key = ':'.join(str(part) for part in (user.pk, get_access_version(user), *parts))
+    key = 'script_pages:' + hashlib.sha1(raw_key.encode('utf-8')).hexdigest()
+    data = cache.get(key)
+    if data is None:
+        data = builder()
+        cache.set(key, data, PAGE_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,172 @@
+"""
+Keyset (cursor) пагинация
+
+Страница выбирается условием по ключу сортировки последней показанной записи,
+а не OFFSET, поэтому время загрузки не зависит от глубины страницы и не
+требует COUNT(*). Курсоры непрозрачны для клиента: base64 от JSON с
+направлением перехода и значениями ключа. Общее количество, если нужно,
+берется из денормализованных счетчиков или считается с ограничением
+(capped_count).
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+
+
+class KeysetPage:
+    """Страница результатов keyset-пагинации"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None,
+                 previous_cursor=None, approximate_total=None, total_capped=False):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approximate_total = approximate_total
+        # Записей больше approximate_total (подсчет остановлен на пределе)
+        self.total_capped = total_capped
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _serialize_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _deserialize_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(direction, values):
+    """Кодирует направление ('n' - вперед, 'p' - назад) и значения ключа в курсор"""
+    payload = json.dumps({'d': direction, 'k': [_serialize_value(value) for value in values]})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Декодирует курсор
+
+    Returns:
+        tuple: (direction, values) или (None, None) для пустого/поврежденного курсора
+    """
+    if not cursor:
+        return None, None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        direction = payload['d']
+        values = [_deserialize_value(value) for value in payload['k']]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None, None
+    if direction not in ('n', 'p'):
+        return None, None
+    return direction, values
+
+
+def _after(fields, values, lookup):
+    """Условие "ключ записи строго дальше values" для сортировки по нескольким полям"""
+    condition = Q()
+    for index, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': values[index]})
+        for previous_field, previous_value in zip(fields[:index], values[:index]):
+            step &= Q(**{previous_field: previous_value})
+        condition |= step
+    return condition
+
+
+def capped_count(queryset, cap):
+    """Количество записей, но не больше cap + 1
+
+    COUNT(*) по подзапросу с LIMIT: время не растет с размером таблицы.
+
+    Returns:
+        tuple: (количество не больше cap, есть ли записи сверх cap)
+    """
+    count = queryset.order_by().values('pk')[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+def capped_counts(querysets, cap):
+    """capped_count для нескольких queryset одной модели одним SQL-запросом
+
+    Args:
+        querysets: Словарь имя -> queryset
+
+    Returns:
+        dict: имя -> (количество не больше cap, есть ли записи сверх cap)
+    """
+    parts, params = [], []
+    for queryset in querysets.values():
+        sql, query_params = queryset.order_by().values('pk')[:cap + 1].query.sql_with_params()
+        parts.append(f'(SELECT COUNT(*) FROM ({sql}) capped)')
+        params.extend(query_params)
+    database = next(iter(querysets.values())).db
+    with connections[database].cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(parts), params)
+        counts = cursor.fetchone()
+    return {name: (min(count, cap), count > cap) for name, count in zip(querysets, counts)}
+
+
+def paginate_keyset(queryset, fields, cursor=None, per_page=50, approximate_total=None, total_capped=False):
+    """Возвращает страницу queryset, отсортированного по убыванию fields
+
+    Args:
+        queryset: Исходный queryset (без сортировки)
+        fields: Поля ключа сортировки, последнее должно быть уникальным (обычно id)
+        cursor: Курсор из next_cursor/previous_cursor предыдущей страницы
+        per_page: Количество записей на странице
+        approximate_total: Приблизительное общее количество записей, если известно
+        total_capped: approximate_total - предел подсчета, записей больше
+
+    Returns:
+        KeysetPage
+    """
+    fields = tuple(fields)
+    direction, values = decode_cursor(cursor)
+    if values is not None and len(values) != len(fields):
+        direction, values = None, None
+
+    descending = [f'-{field}' for field in fields]
+    if direction == 'p':
+        # Идем назад: берем записи "перед" курсором в обратном порядке
+        rows = list(queryset.filter(_after(fields, values, 'gt')).order_by(*fields)[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if direction == 'n':
+            queryset = queryset.filter(_after(fields, values, 'lt'))
+        rows = list(queryset.order_by(*descending)[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = direction == 'n'
+
+    def key(row):
+        return [getattr(row, field) for field in fields]
+
+    return KeysetPage(
+        rows,
+        has_next=has_next and bool(rows),
+        has_previous=has_previous and bool(rows),
+        next_cursor=encode_cursor('n', key(rows[-1])) if has_next and rows else None,
+        previous_cursor=encode_cursor('p', key(rows[0])) if has_previous and rows else None,
+        approximate_total=approximate_total,
+        total_capped=total_capped,
+    )
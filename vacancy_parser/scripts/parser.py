@@ -6,14 +6,50 @@
 С фильтром по содержанию "Охрана труда" в названии
 """
 
-import requests
 import time
 import json
 import re
 from datetime import datetime
-from typing import List, Dict, Set
+from itertools import groupby
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Set
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
 from django.utils import timezone
-from .models import ScriptRun, Vacancy, VacancyRun
+from . import bulk, metrics, search
+from .decoding import ApiPage
+from .fetch import PageResult, get_rate_limiter, iter_search_pages
+from .response_cache import get_response_cache
+from .page_cache import bump_data_version, bump_script_versions
+from .records import SALARY_FIELDS, VacancyRecord
+from .timeline import Timeline
+from .models import RunQueryStat, ScriptRun, Vacancy, VacancyRevision, VacancyRun
+
+
+# Размер пачки вакансий, сохраняемых за один проход
+PERSIST_BATCH_SIZE = 500
+
+# Как часто лог запуска записывается в базу, секунды
+LOG_FLUSH_INTERVAL = 1.0
+
+# Результат обращения к кэшу ответов API -> счетчик в статистике запроса
+CACHE_STATS_KEYS = {
+    'hit': 'cache_hits',
+    'revalidated': 'cache_revalidated',
+    'miss': 'cache_misses',
+}
+
+# Поля, обновляемые у вакансии, найденной повторно
+UPDATED_VACANCY_FIELDS = list(Vacancy.TRACKED_FIELDS) + list(SALARY_FIELDS) + [
+    'content_hash', 'is_active', 'missed_runs', 'last_seen_at', 'times_found', 'found_by_query', 'updated_at'
+]
+
+# Поля, обновляемые при вставке вакансии, которую параллельно добавил другой
+# запуск (см. bulk.upsert_new_vacancies). Остальные поля обновляются после
+# чтения строки, как у найденной повторно вакансии: иначе пропали бы прежние
+# значения для ревизии и накопленные счетчики
+CONFLICT_UPDATED_VACANCY_FIELDS = ['last_seen_at']
 
 
 class HHVacancyParserDjango:
@@ -22,23 +58,43 @@ class HHVacancyParserDjango:
     def __init__(self, script_run: ScriptRun):
         self.script_run = script_run
         self.script = script_run.script
-        self.base_url = "https://api.hh.ru/vacancies"
+        self.base_url = getattr(settings, 'HH_API_URL', "https://api.hh.ru/vacancies")
+        self.request_delay = getattr(settings, 'HH_REQUEST_DELAY', 0.5)
+        self.request_timeout = getattr(settings, 'HH_REQUEST_TIMEOUT', 30)
+        self.fetch_engine = getattr(settings, 'HH_FETCH_ENGINE', 'sync')
+        self.fetch_concurrency = getattr(settings, 'HH_FETCH_CONCURRENCY', 4)
+        self.rate_limiter = get_rate_limiter()  # Общий для всех запусков процесса
+        self.response_cache = get_response_cache()  # None - кэш ответов API отключен
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         self.log_messages = []
+        self._log_flushed_at = 0.0
         self.query_stats = {}  # Статистика по каждому запросу
+        self.is_truncated = False  # Были ли ошибки API или обрезка по лимиту страниц
+        self.timeline = Timeline()  # Хронология фаз запуска
+        self.saved_count = 0  # Сохранено вакансий в текущем запуске
         
     def log(self, message: str):
-        """Логирование сообщений"""
+        """Логирование сообщений
+        
+        Лог записывается в базу не чаще раза в LOG_FLUSH_INTERVAL секунд,
+        остаток - flush_log() в конце запуска.
+        """
         timestamp = datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {message}"
         self.log_messages.append(log_entry)
         print(log_entry)  # Также выводим в консоль для отладки
         
-        # Обновляем лог в базе данных
+        if time.monotonic() - self._log_flushed_at >= LOG_FLUSH_INTERVAL:
+            self.flush_log()
+    
+    def flush_log(self):
+        """Запись накопленного лога в базу данных"""
         self.script_run.log_data = "\n".join(self.log_messages)
-        self.script_run.save(update_fields=['log_data'])
+        with self.timeline.span('log_write', detail=False):
+            self.script_run.save(update_fields=['log_data'])
+        self._log_flushed_at = time.monotonic()
     
     def check_safety_keywords(self, title: str, description: str = '') -> bool:
         """Проверка наличия ключевых слов 'Охрана труда' в вакансии
@@ -67,17 +123,18 @@ class HHVacancyParserDjango:
         
         return False
     
-    def search_vacancies_by_query(self, search_text: str, area_ids: List[str], max_pages: int = 20) -> List[Dict]:
-        """Поиск вакансий по конкретному запросу
-        
-        Args:
-            search_text: Поисковый запрос
-            area_ids: Список ID регионов для поиска
-            max_pages: Максимальное количество страниц для загрузки
-        """
-        all_vacancies = []
-        total_found = 0
-        
+    def page_params(self, search_text: str, area_ids: List[str], page: int) -> Dict:
+        """Параметры запроса страницы поиска"""
+        return {
+            'text': search_text,
+            'area': area_ids,
+            'page': page,
+            'per_page': 100,
+            'only_with_salary': False,
+            'currency': 'RUR'
+        }
+    
+    def _start_query(self, search_text: str):
         self.log(f"Поиск по запросу: '{search_text}'")
         
         # Инициализация статистики для запроса
@@ -88,92 +145,184 @@ class HHVacancyParserDjango:
             'unique_vacancies': 0,
             'duplicates': 0,
             'new_vacancies': 0,
-            'existing_vacancies': 0
+            'existing_vacancies': 0,
+            'pages_fetched': 0,
+            'fetch_ms': 0,
+            'cache_hits': 0,
+            'cache_revalidated': 0,
+            'cache_misses': 0
         }
+    
+    def _record_page_fetch(self, search_text: str, result: PageResult):
+        stats = self.query_stats[search_text]
+        stats['pages_fetched'] += 1
+        metrics.PAGES_FETCHED.inc(script=self.script.id)
+        if result.cache:
+            stats[CACHE_STATS_KEYS[result.cache]] += 1
+            metrics.HH_CACHE_REQUESTS.inc(result=result.cache)
+        if result.cache == 'hit':
+            # Страница из кэша - запроса к API не было
+            return
+        # Подтвержденный ответ из кэша учитываем с кодом 304
+        status_code = 304 if result.cache == 'revalidated' else result.status_code
+        stats['fetch_ms'] += int(result.seconds * 1000)
+        metrics.HH_REQUEST_SECONDS.observe(result.seconds, status=status_code)
+        metrics.HH_REQUESTS.inc(status=status_code)
+    
+    def _handle_page(self, search_text: str, page: int, data: ApiPage) -> tuple:
+        """Фильтрация вакансий загруженной страницы
         
-        for page in range(max_pages):
-            params = {
-                'text': search_text,
-                'area': area_ids,
-                'page': page,
-                'per_page': 100,
-                'only_with_salary': False,
-                'currency': 'RUR'
-            }
-            
-            try:
-                self.log(f"Загружаем страницу {page + 1}/{max_pages}")
-                response = requests.get(self.base_url, headers=self.headers, params=params)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    vacancies = data.get('items', [])
-                    
-                    if page == 0:
-                        total_found = data.get('found', 0)
-                        self.query_stats[search_text]['found_in_api'] = total_found
-                        self.log(f"Всего найдено в API: {total_found}")
-                    
-                    if not vacancies:
-                        self.log(f"На странице {page + 1} нет вакансий, завершаем поиск")
-                        break
-                    
-                    # Фильтруем вакансии по ключевым словам "Охрана труда"
-                    filtered_vacancies = []
-                    for vacancy in vacancies:
-                        title = vacancy.get('name', '')
-                        # Можно также получить краткое описание, если доступно
-                        snippet = vacancy.get('snippet', {})
-                        requirement = snippet.get('requirement', '') or ''
-                        responsibility = snippet.get('responsibility', '') or ''
-                        description = requirement + ' ' + responsibility
-                        
-                        if self.check_safety_keywords(title, description):
-                            # Добавляем информацию о запросе, по которому найдена вакансия
-                            vacancy['found_by_query'] = search_text
-                            filtered_vacancies.append(vacancy)
-                        else:
-                            self.query_stats[search_text]['filtered_out'] += 1
-                    
-                    all_vacancies.extend(filtered_vacancies)
-                    
-                    self.log(f"Страница {page + 1}: {len(vacancies)} найдено, {len(filtered_vacancies)} соответствуют критериям охраны труда")
-                    
-                    if len(vacancies) < 100:
-                        self.log(f"Получили неполную страницу ({len(vacancies)} вакансий), завершаем поиск")
-                        break
+        Вакансии, прошедшие фильтр, сразу сокращаются до сохраняемых полей
+        (VacancyRecord) - исходный ответ API дальше не хранится.
+        
+        Returns:
+            tuple: (записи вакансий, нужно ли загружать следующую страницу)
+        """
+        vacancies = data.items
+        
+        if page == 0:
+            total_found = data.found
+            self.query_stats[search_text]['found_in_api'] = total_found
+            self.log(f"Всего найдено в API: {total_found}")
+        
+        if not vacancies:
+            self.log(f"На странице {page + 1} нет вакансий, завершаем поиск")
+            return [], False
+        
+        # Фильтруем вакансии по ключевым словам "Охрана труда"
+        with self.timeline.span('filter', query=search_text, page=page + 1):
+            records = []
+            for vacancy in vacancies:
+                title = vacancy.name or ''
+                # Можно также получить краткое описание, если доступно
+                snippet = vacancy.snippet
+                requirement = snippet and snippet.requirement or ''
+                responsibility = snippet and snippet.responsibility or ''
+                description = requirement + ' ' + responsibility
                 
+                if self.check_safety_keywords(title, description):
+                    # Запоминаем запрос, по которому найдена вакансия
+                    record = VacancyRecord.from_api(vacancy, found_by_query=search_text)
+                    if record:
+                        records.append(record)
                 else:
-                    self.log(f"Ошибка API на странице {page + 1}: {response.status_code}")
-                    break
-                
-                # Пауза между запросами
-                time.sleep(0.5)
-                
-            except Exception as e:
-                self.log(f"Ошибка при загрузке страницы {page + 1}: {str(e)}")
-                break
+                    self.query_stats[search_text]['filtered_out'] += 1
+        
+        metrics.VACANCIES_FILTERED.inc(len(vacancies) - len(records), script=self.script.id)
+        
+        self.log(f"Страница {page + 1}: {len(vacancies)} найдено, {len(records)} соответствуют критериям охраны труда")
         
-        collected_count = len(all_vacancies)
+        if len(vacancies) < 100:
+            self.log(f"Получили неполную страницу ({len(vacancies)} вакансий), завершаем поиск")
+            return records, False
+        return records, True
+    
+    def _check_page_limit(self, search_text: str, max_pages: int):
+        # Все страницы полные - в API могут остаться незагруженные вакансии
+        if max_pages * 100 < self.query_stats[search_text]['found_in_api']:
+            self.log(f"Достигнут лимит страниц ({max_pages}), результаты запроса неполные")
+            self.is_truncated = True
+    
+    def _finish_query(self, search_text: str, collected_count: int):
         self.query_stats[search_text]['collected_by_script'] = collected_count
         filtered_out = self.query_stats[search_text]['filtered_out']
         
         self.log(f"Запрос '{search_text}' завершен:")
-        self.log(f"  - Найдено в API: {total_found}")
+        self.log(f"  - Найдено в API: {self.query_stats[search_text]['found_in_api']}")
         self.log(f"  - Собрано скриптом: {collected_count + filtered_out}")
         self.log(f"  - Отфильтровано (не содержат 'Охрана труда'): {filtered_out}")
         self.log(f"  - Финальный результат: {collected_count}")
+    
+    def iter_pages(self, search_queries: List[str], area_ids: List[str], max_pages: int) -> Iterator[PageResult]:
+        """Загруженные страницы всех запросов по порядку (загрузка в общем цикле, см. fetch.py)"""
+        return iter_search_pages(
+            self.base_url,
+            self.headers,
+            search_queries,
+            lambda search_text, page: self.page_params(search_text, area_ids, page),
+            max_pages,
+            engine=self.fetch_engine,
+            concurrency=self.fetch_concurrency,
+            timeout=self.request_timeout,
+            request_delay=self.request_delay,
+            limiter=self.rate_limiter,
+            cache=self.response_cache
+        )
+    
+    def process_query_pages(self, search_text: str, pages: Iterable[PageResult], max_pages: int = 20) -> Iterator[VacancyRecord]:
+        """Отфильтрованные записи вакансий по страницам одного запроса
+        
+        Страницы после ошибки или неполной страницы пропускаются (при
+        параллельной загрузке они могут быть уже загружены).
+        """
+        self._start_query(search_text)
+        collected_count = 0
+        has_more = True
+        
+        for result in pages:
+            if not has_more:
+                continue
+            page_attrs = {'cache': result.cache} if result.cache else {}
+            self.timeline.record(
+                'page', result.started, result.seconds * 1000,
+                query=search_text, page=result.page + 1, status=result.status_code, **page_attrs
+            )
+            
+            if result.error:
+                self.log(f"Ошибка при загрузке страницы {result.page + 1}: {result.error}")
+                self.is_truncated = True
+                has_more = False
+                continue
+            
+            self._record_page_fetch(search_text, result)
+            if result.data is not None:
+                self.timeline.record('decode', result.started + result.seconds, result.decode_seconds * 1000,
+                                     detail=False)
+            if result.status_code != 200:
+                self.log(f"Ошибка API на странице {result.page + 1}: {result.status_code}")
+                self.is_truncated = True
+                has_more = False
+                continue
+            
+            records, has_more = self._handle_page(search_text, result.page, result.data)
+            collected_count += len(records)
+            yield from records
+        
+        if has_more:
+            self._check_page_limit(search_text, max_pages)
+        self._finish_query(search_text, collected_count)
+    
+    def search_vacancies_by_query(self, search_text: str, area_ids: List[str], max_pages: int = 20) -> List[VacancyRecord]:
+        """Поиск вакансий по конкретному запросу без сохранения (для отладки)
         
-        return all_vacancies
+        Args:
+            search_text: Поисковый запрос
+            area_ids: Список ID регионов для поиска
+            max_pages: Максимальное количество страниц для загрузки
+        
+        Returns:
+            list: Записи вакансий (VacancyRecord)
+        """
+        pages = self.iter_pages([search_text], area_ids, max_pages)
+        return list(self.process_query_pages(search_text, pages, max_pages))
     
-    def search_all_vacancies(self, max_pages: int = 20) -> List[Dict]:
-        """Поиск по всем запросам и объединение результатов"""
+    def search_and_persist(self, max_pages: int = 20) -> tuple:
+        """Поиск по всем запросам с сохранением по ходу загрузки
         
-        # Получаем список поисковых запросов
-        search_queries = self.script.get_search_queries_list()
+        Конвейер: загрузка страниц (общий цикл загрузки) -> фильтр -> дедупликация
+        между запросами -> сохранение пачками по PERSIST_BATCH_SIZE. В памяти
+        находятся только несколько страниц ответа API, текущая пачка и ID
+        уже встреченных вакансий.
+        
+        Returns:
+            tuple: (уникальных вакансий, новых, существующих)
+        """
+        
+        # Получаем список поисковых запросов (повторы не загружаем)
+        search_queries = list(dict.fromkeys(self.script.get_search_queries_list()))
         if not search_queries:
             self.log("Поисковые запросы не найдены")
-            return []
+            return 0, 0, 0
             
         # Получаем ID регионов для поиска
         area_ids = self.script.get_region_ids()
@@ -181,199 +330,300 @@ class HHVacancyParserDjango:
         self.log(f"Поисковые запросы: {search_queries}")
         self.log(f"Регионы поиска: {area_ids}")
         
-        all_vacancies = []
         processed_vacancy_ids: Set[str] = set()
+        batch = []
+        total_count = new_count = existing_count = 0
         
-        # Поиск по каждому запросу
-        for search_query in search_queries:
-            query_vacancies = self.search_vacancies_by_query(search_query, area_ids, max_pages)
-            
-            # Дедупликация - исключаем вакансии, которые уже были найдены по другим запросам
-            unique_vacancies = []
+        pages = self.iter_pages(search_queries, area_ids, max_pages)
+        for search_query, query_pages in groupby(pages, key=attrgetter('query')):
+            unique_count = 0
             duplicates_count = 0
             
-            for vacancy in query_vacancies:
-                vacancy_id = str(vacancy.get('id', ''))
-                if vacancy_id and vacancy_id not in processed_vacancy_ids:
-                    processed_vacancy_ids.add(vacancy_id)
-                    unique_vacancies.append(vacancy)
-                else:
-                    duplicates_count += 1
+            with self.timeline.span('query', query=search_query):
+                for record in self.process_query_pages(search_query, query_pages, max_pages):
+                    # Дедупликация - исключаем вакансии, которые уже были найдены по другим запросам
+                    if record.external_id in processed_vacancy_ids:
+                        duplicates_count += 1
+                        continue
+                    processed_vacancy_ids.add(record.external_id)
+                    unique_count += 1
+                    batch.append(record)
+                    
+                    if len(batch) >= PERSIST_BATCH_SIZE:
+                        batch_new, batch_existing = self.persist_batch(batch)
+                        new_count += batch_new
+                        existing_count += batch_existing
+                        batch = []
             
-            all_vacancies.extend(unique_vacancies)
-            self.log(f"Запрос '{search_query}': {len(unique_vacancies)} уникальных вакансий, {duplicates_count} дубликатов")
+            total_count += unique_count
+            self.log(f"Запрос '{search_query}': {unique_count} уникальных вакансий, {duplicates_count} дубликатов")
             
             # Обновляем статистику
-            if search_query in self.query_stats:
-                self.query_stats[search_query]['unique_vacancies'] = len(unique_vacancies)
-                self.query_stats[search_query]['duplicates'] = duplicates_count
+            self.query_stats[search_query]['unique_vacancies'] = unique_count
+            self.query_stats[search_query]['duplicates'] = duplicates_count
         
-        self.log(f"\nВсего собрано уникальных вакансий: {len(all_vacancies)}")
-        return all_vacancies
+        if batch:
+            batch_new, batch_existing = self.persist_batch(batch)
+            new_count += batch_new
+            existing_count += batch_existing
+        
+        self.log(f"\nВсего собрано уникальных вакансий: {total_count}")
+        if self.response_cache is not None:
+            cache_totals = {
+                key: sum(stats.get(key, 0) for stats in self.query_stats.values())
+                for key in CACHE_STATS_KEYS.values()
+            }
+            self.log(f"Кэш ответов API: {cache_totals['cache_hits']} из кэша, "
+                     f"{cache_totals['cache_revalidated']} подтверждено (304), "
+                     f"{cache_totals['cache_misses']} загружено")
+        return total_count, new_count, existing_count
     
-    def process_vacancy(self, vacancy_data: Dict, found_by_query: str = '') -> tuple:
-        """Обработка одной вакансии
+    def persist_batch(self, batch: List[VacancyRecord]) -> tuple:
+        """Сохранение пачки записей вакансий (VacancyRecord)
         
         Returns:
-            tuple: (vacancy_object, is_new_vacancy)
+            tuple: (new_count, existing_count)
         """
-        vacancy_id = str(vacancy_data.get('id', ''))
-        if not vacancy_id:
-            return None, False
-            
-        # Извлекаем данные из API ответа
-        title = vacancy_data.get('name', 'Без названия')
-        company = vacancy_data.get('employer', {}).get('name', 'Не указана')
-        url = vacancy_data.get('alternate_url', '')
-        
-        # Обработка зарплаты
-        salary_info = vacancy_data.get('salary')
-        if salary_info:
-            salary_from = salary_info.get('from')
-            salary_to = salary_info.get('to')
-            currency = salary_info.get('currency', 'RUR')
+        with self.timeline.span('persist_batch', size=len(batch)):
+            new_count, existing_count = self._persist_batch(batch)
+        self.saved_count += len(batch)
+        self.log(f"Сохранено вакансий: {self.saved_count}")
+        return new_count, existing_count
+    
+    def _persist_batch(self, batch: List[VacancyRecord]) -> tuple:
+        """Сохранение одной пачки вакансий: чтение существующих одним запросом,
+        bulk_create новых, bulk_update найденных повторно и запись ревизий"""
+        records = {record.external_id: record for record in batch}
+        if not records:
+            return 0, 0
+        
+        existing = self._load_existing(list(records))
+        
+        now = timezone.now()
+        new_vacancies = []
+        updated_vacancies = []
+        revisions = []
+        vacancy_runs = {}
+        reindexed = []  # Вакансии, текст которых нужно обновить в поисковом индексе
+        
+        for external_id, record in records.items():
+            vacancy = existing.get(external_id)
             
-            if salary_from and salary_to:
-                salary = f"{salary_from}-{salary_to} {currency}"
-            elif salary_from:
-                salary = f"от {salary_from} {currency}"
-            elif salary_to:
-                salary = f"до {salary_to} {currency}"
+            if vacancy is None:
+                vacancy = Vacancy(
+                    script=self.script,
+                    external_id=external_id,
+                    found_by_query=record.found_by_query,
+                    first_seen_at=now,
+                    last_seen_at=now,
+                    **record.salary_values()
+                )
+                vacancy.apply_tracked_values(record.tracked_values())
+                new_vacancies.append(vacancy)
+                reindexed.append(vacancy)
+                is_new = True
             else:
-                salary = "По договоренности"
-        else:
-            salary = "Не указана"
+                # Обновляем информацию о существующей вакансии
+                self._apply_sighting(vacancy, record, now, revisions, reindexed)
+                updated_vacancies.append(vacancy)
+                is_new = False
+            
+            vacancy_runs[external_id] = VacancyRun(
+                script_run=self.script_run,
+                vacancy=vacancy,
+                is_new_in_run=is_new,
+                found_by_query=record.found_by_query
+            )
         
-        # Обработка даты публикации
-        published_at = None
-        if vacancy_data.get('published_at'):
-            try:
-                published_at = datetime.fromisoformat(
-                    vacancy_data['published_at'].replace('Z', '+00:00')
-                )
-            except (ValueError, TypeError):
-                pass
+        with transaction.atomic():
+            if new_vacancies:
+                # INSERT ... ON CONFLICT: вакансию мог одновременно добавить другой процесс
+                conflicts = bulk.upsert_new_vacancies(new_vacancies, CONFLICT_UPDATED_VACANCY_FIELDS)
+                if conflicts:
+                    # Такие вакансии найдены повторно: перечитываем прежние значения
+                    # и обновляем их так же, как существующие
+                    conflicted_pks = {vacancy.pk for vacancy in conflicts}
+                    new_vacancies = [vacancy for vacancy in new_vacancies if vacancy.pk not in conflicted_pks]
+                    reindexed = [vacancy for vacancy in reindexed if vacancy.pk not in conflicted_pks]
+                    for vacancy in self._load_existing([vacancy.external_id for vacancy in conflicts]).values():
+                        self._apply_sighting(vacancy, records[vacancy.external_id], now, revisions, reindexed)
+                        updated_vacancies.append(vacancy)
+                        vacancy_runs[vacancy.external_id].vacancy = vacancy
+                        vacancy_runs[vacancy.external_id].is_new_in_run = False
+            if updated_vacancies:
+                Vacancy.objects.bulk_update(updated_vacancies, UPDATED_VACANCY_FIELDS)
+            if revisions:
+                VacancyRevision.objects.bulk_create(revisions)
+            
+            # Создаем связи с текущим запуском (COPY в PostgreSQL)
+            bulk.load_vacancy_runs(list(vacancy_runs.values()))
+            
+            search.index_vacancies(reindexed)
+        # Данные выполняющегося запуска изменились (ETag списков API)
+        bump_data_version()
+        
+        # Обновляем статистику по запросам
+        for vacancy_run in vacancy_runs.values():
+            if vacancy_run.found_by_query in self.query_stats:
+                stats_key = 'new_vacancies' if vacancy_run.is_new_in_run else 'existing_vacancies'
+                self.query_stats[vacancy_run.found_by_query][stats_key] += 1
+        
+        metrics.DB_BATCH_SIZE.observe(len(records))
+        metrics.VACANCIES_SAVED.inc(len(new_vacancies), script=self.script.id, kind='new')
+        metrics.VACANCIES_SAVED.inc(len(updated_vacancies), script=self.script.id, kind='existing')
+        return len(new_vacancies), len(updated_vacancies)
+    
+    def _load_existing(self, external_ids: List[str]) -> Dict[str, Vacancy]:
+        """Вакансии скрипта с указанными внешними id (одним запросом)"""
+        return {
+            vacancy.external_id: vacancy
+            for vacancy in Vacancy.objects.filter(script=self.script, external_id__in=external_ids)
+        }
+    
+    def _apply_sighting(self, vacancy: Vacancy, record: VacancyRecord, now, revisions: list, reindexed: list):
+        """Обновляет существующую вакансию по записи повторного обнаружения
+        
+        Изменения отслеживаемых полей добавляются в revisions, вакансии с
+        изменившимся текстом - в reindexed.
+        """
+        found_by_query = record.found_by_query
+        changes = vacancy.apply_tracked_values(record.tracked_values())
+        if changes:
+            revisions.append(VacancyRevision(
+                vacancy=vacancy,
+                script_run=self.script_run,
+                changes=changes,
+                content_hash=vacancy.content_hash
+            ))
+        for field, value in record.salary_values().items():
+            setattr(vacancy, field, value)
+        vacancy.is_active = True
+        vacancy.missed_runs = 0
+        vacancy.last_seen_at = now
+        vacancy.updated_at = now  # bulk_update не заполняет auto_now
+        vacancy.times_found += 1
+        if changes or found_by_query and found_by_query != vacancy.found_by_query:
+            reindexed.append(vacancy)
+        if found_by_query:
+            vacancy.found_by_query = found_by_query
+    
+    def deactivate_missing_vacancies(self) -> int:
+        """Учет вакансий скрипта, не найденных в текущем запуске
         
-        # Информация о регионе
-        area_name = vacancy_data.get('area', {}).get('name', '')
+        Одним UPDATE увеличивает счетчик пропущенных запусков и снимает флаг
+        активности с вакансий, пропущенных больше VACANCY_MISSED_RUNS_GRACE
+        запусков подряд. Для неполных запусков ничего не делает.
         
-        # Попробуем найти существующую вакансию
-        try:
-            vacancy = Vacancy.objects.get(
-                script=self.script,
-                external_id=vacancy_id
+        Returns:
+            int: Количество вакансий, не найденных в запуске
+        """
+        if self.is_truncated:
+            self.log("Результаты поиска неполные - активность вакансий не пересчитывается")
+            return 0
+        
+        grace_runs = getattr(settings, 'VACANCY_MISSED_RUNS_GRACE', 2)
+        seen_vacancy_ids = VacancyRun.objects.filter(
+            script_run=self.script_run
+        ).values('vacancy_id')
+        missing_count = Vacancy.objects.filter(
+            script=self.script,
+            is_active=True
+        ).exclude(
+            id__in=seen_vacancy_ids
+        ).update(
+            updated_at=timezone.now(),
+            missed_runs=F('missed_runs') + 1,
+            is_active=Case(
+                When(missed_runs__gte=grace_runs, then=Value(False)),
+                default=Value(True)
             )
-            # Обновляем информацию о существующей вакансии
-            vacancy.mark_as_found(found_by_query)
-            return vacancy, False
-        except Vacancy.DoesNotExist:
-            # Создаем новую вакансию
-            vacancy = Vacancy.objects.create(
-                script=self.script,
-                external_id=vacancy_id,
-                title=title,
-                company=company,
-                salary=salary,
-                url=url,
-                published_at=published_at,
-                area_name=area_name,
-                found_by_query=found_by_query,
-                first_seen_at=timezone.now(),
-                last_seen_at=timezone.now()
+        )
+        
+        if missing_count:
+            self.log(f"Не найдено в этом запуске ранее активных вакансий: {missing_count} "
+                     f"(снимаются с публикации после {grace_runs + 1} пропусков подряд)")
+        return missing_count
+    
+    def on_run_finished(self):
+        """Вызывается после сохранения итогового статуса запуска"""
+        # Данные страниц скрипта изменились - сбрасываем их кэш
+        bump_script_versions([self.script.id])
+        if self.script_run.completed_at:
+            metrics.RUN_DURATION_SECONDS.observe(
+                (self.script_run.completed_at - self.script_run.started_at).total_seconds(),
+                script=self.script.id,
+                status=self.script_run.status
             )
-            return vacancy, True
     
     def run(self):
         """Основной метод запуска парсинга"""
-        try:
-            self.log("Начинаем парсинг вакансий")
-            self.log(f"Скрипт: {self.script.name}")
-            self.log("ФИЛЬТР: Будут собираны только вакансии, содержащие 'Охрана труда'")
+        # Подсчет SQL-запросов для хронологии запуска
+        with self.timeline.activate():
+            try:
+                self.log("Начинаем парсинг вакансий")
+                self.log(f"Скрипт: {self.script.name}")
+                self.log("ФИЛЬТР: Будут собираны только вакансии, содержащие 'Охрана труда'")
             
-            # Получаем настройки
-            max_pages = self.script.max_pages
+                # Получаем настройки
+                max_pages = self.script.max_pages
             
-            # Поиск вакансий
-            vacancies_data = self.search_all_vacancies(max_pages)
+                # Поиск вакансий с сохранением по ходу загрузки
+                with self.timeline.span('search'):
+                    total_count, new_count, existing_count = self.search_and_persist(max_pages)
+                if not total_count:
+                    self.log("Вакансии не найдены")
             
-            if not vacancies_data:
-                self.log("Вакансии не найдены")
-                self.script_run.status = 'completed'
-                self.script_run.completed_at = timezone.now()
-                self.script_run.save(update_fields=['status', 'completed_at'])
-                return
-                
-            self.log(f"Начинаем обработку {len(vacancies_data)} отфильтрованных вакансий")
+                with self.timeline.span('deactivate'):
+                    self.deactivate_missing_vacancies()
             
-            new_count = 0
-            existing_count = 0
+                # Сохраняем статистику по запросам
+                self.script_run.queries_stats = self.query_stats
+                self.script_run.is_truncated = self.is_truncated
+                self.script_run.timeline = self.timeline.to_dict()
             
-            # Обрабатываем каждую вакансию
-            for i, vacancy_data in enumerate(vacancies_data, 1):
-                if i % 50 == 0:
-                    self.log(f"Обработано {i}/{len(vacancies_data)} вакансий")
-                
-                found_by_query = vacancy_data.get('found_by_query', '')
-                vacancy, is_new = self.process_vacancy(vacancy_data, found_by_query)
-                
-                if vacancy:
-                    # Создаем связь с текущим запуском
-                    VacancyRun.objects.create(
-                        script_run=self.script_run,
-                        vacancy=vacancy,
-                        is_new_in_run=is_new,
-                        found_by_query=found_by_query
-                    )
-                    
-                    if is_new:
-                        new_count += 1
-                        # Обновляем статистику по запросу
-                        if found_by_query in self.query_stats:
-                            self.query_stats[found_by_query]['new_vacancies'] += 1
-                    else:
-                        existing_count += 1
-                        # Обновляем статистику по запросу
-                        if found_by_query in self.query_stats:
-                            self.query_stats[found_by_query]['existing_vacancies'] += 1
-            
-            # Сохраняем статистику по запросам
-            self.script_run.queries_stats = self.query_stats
-            
-            # Обновляем общую статистику запуска
-            self.script_run.total_found = len(vacancies_data)
-            self.script_run.new_vacancies = new_count
-            self.script_run.existing_vacancies = existing_count
-            self.script_run.status = 'completed'
-            self.script_run.completed_at = timezone.now()
-            self.script_run.save()
+                # Обновляем общую статистику запуска
+                self.script_run.total_found = total_count
+                self.script_run.new_vacancies = new_count
+                self.script_run.existing_vacancies = existing_count
+                self.script_run.status = 'completed'
+                self.script_run.completed_at = timezone.now()
+                with transaction.atomic():
+                    self.script_run.save()
+                    # Нормализованная статистика по запросам для агрегирующих отчетов
+                    RunQueryStat.objects.bulk_create(RunQueryStat.from_queries_stats(self.script_run))
+                self.on_run_finished()
             
-            # Финальный отчет
-            self.log(f"\n=== ИТОГОВЫЙ ОТЧЕТ ===")
-            self.log(f"Всего обработано вакансий: {len(vacancies_data)}")
-            self.log(f"Новых вакансий: {new_count}")
-            self.log(f"Существующих вакансий: {existing_count}")
+                # Финальный отчет
+                self.log(f"\n=== ИТОГОВЫЙ ОТЧЕТ ===")
+                self.log(f"Всего обработано вакансий: {total_count}")
+                self.log(f"Новых вакансий: {new_count}")
+                self.log(f"Существующих вакансий: {existing_count}")
             
-            # Детальная статистика по запросам
-            total_filtered = sum(stats.get('filtered_out', 0) for stats in self.query_stats.values())
-            if total_filtered > 0:
-                self.log(f"Отфильтровано вакансий (не содержат 'Охрана труда'): {total_filtered}")
+                # Детальная статистика по запросам
+                total_filtered = sum(stats.get('filtered_out', 0) for stats in self.query_stats.values())
+                if total_filtered > 0:
+                    self.log(f"Отфильтровано вакансий (не содержат 'Охрана труда'): {total_filtered}")
             
-            self.log("\n=== СТАТИСТИКА ПО ЗАПРОСАМ ===")
-            for query, stats in self.query_stats.items():
-                self.log(f"'{query}':")
-                self.log(f"  - Найдено в API: {stats.get('found_in_api', 0)}")
-                self.log(f"  - Собрано: {stats.get('collected_by_script', 0)}")
-                self.log(f"  - Отфильтровано: {stats.get('filtered_out', 0)}")
-                self.log(f"  - Уникальных: {stats.get('unique_vacancies', 0)}")
-                self.log(f"  - Дубликатов: {stats.get('duplicates', 0)}")
-                self.log(f"  - Новых: {stats.get('new_vacancies', 0)}")
-                self.log(f"  - Существующих: {stats.get('existing_vacancies', 0)}")
+                self.log("\n=== СТАТИСТИКА ПО ЗАПРОСАМ ===")
+                for query, stats in self.query_stats.items():
+                    self.log(f"'{query}':")
+                    self.log(f"  - Найдено в API: {stats.get('found_in_api', 0)}")
+                    self.log(f"  - Собрано: {stats.get('collected_by_script', 0)}")
+                    self.log(f"  - Отфильтровано: {stats.get('filtered_out', 0)}")
+                    self.log(f"  - Уникальных: {stats.get('unique_vacancies', 0)}")
+                    self.log(f"  - Дубликатов: {stats.get('duplicates', 0)}")
+                    self.log(f"  - Новых: {stats.get('new_vacancies', 0)}")
+                    self.log(f"  - Существующих: {stats.get('existing_vacancies', 0)}")
             
-            self.log("Парсинг завершен успешно!")
+                self.log("Парсинг завершен успешно!")
+                self.flush_log()
             
-        except Exception as e:
-            self.log(f"Критическая ошибка при парсинге: {str(e)}")
-            self.script_run.status = 'error'
-            self.script_run.completed_at = timezone.now()
-            self.script_run.save(update_fields=['status', 'completed_at'])
-            raise
+            except Exception as e:
+                self.log(f"Критическая ошибка при парсинге: {str(e)}")
+                self.script_run.log_data = "\n".join(self.log_messages)
+                self.script_run.status = 'error'
+                self.script_run.completed_at = timezone.now()
+                self.script_run.timeline = self.timeline.to_dict()
+                self.script_run.save(update_fields=['log_data', 'status', 'completed_at', 'timeline'])
+                self.on_run_finished()
+                raise
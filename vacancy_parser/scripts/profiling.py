@@ -0,0 +1,161 @@
+"""
+Профилирование отдельного запроса по требованию
+
+Включается сотрудником (is_staff) заголовком X-Profile: 1 или параметром
+?_profile=1. Для такого запроса собираются профиль cProfile, все SQL-запросы
+с длительностью и местом вызова в коде проекта и повторяющиеся запросы:
+
+- exact - один и тот же SQL с теми же параметрами (можно переиспользовать результат);
+- similar - один и тот же SQL с разными параметрами (признак запросов в цикле, N+1).
+
+Результат сохраняется в ProfileCapture; профиль можно скачать из админки
+файлом .prof (pstats, snakeviz). Запросы без признака профилирования
+проходят без накладных расходов, кроме проверки заголовка и параметра.
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+
+# Сколько функций показывать в текстовом отчете профиля
+PROFILE_TOP_FUNCTIONS = 40
+
+# Сколько SQL-запросов сохранять подробно
+MAX_CAPTURED_QUERIES = 2000
+
+_PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+
+# Файлы, которые не считаются местом вызова запроса
+_SKIPPED_FILES = {
+    str(Path(__file__).resolve()),
+    str(Path(__file__).with_name('middleware.py').resolve()),
+    str(Path(settings.BASE_DIR).resolve() / 'manage.py'),
+}
+
+
+def is_profiling_requested(request) -> bool:
+    """Есть ли в запросе признак профилирования (без обращения к сессии)"""
+    return request.META.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1'
+
+
+def _call_site():
+    """Ближайший к запросу вызов из кода проекта (не Django и не библиотек)"""
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        filename = frame.filename
+        if filename.startswith(_PROJECT_DIR) and 'site-packages' not in filename \
+                and filename not in _SKIPPED_FILES:
+            return f'{Path(filename).relative_to(_PROJECT_DIR)}:{frame.lineno} in {frame.name}'
+    return ''
+
+
+class RequestProfile:
+    """Сбор профиля и SQL-запросов одного запроса"""
+
+    def __init__(self):
+        self.queries = []
+        self.dropped_queries = 0
+        self.profiler = None
+        self.duration_ms = 0.0
+
+    def _record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_CAPTURED_QUERIES:
+                self.queries.append({
+                    'sql': sql,
+                    'params': repr(params)[:500],
+                    'many': many,
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                    'location': _call_site(),
+                })
+            else:
+                self.dropped_queries += 1
+
+    def run(self, get_response, request):
+        """Выполняет запрос под профилировщиком"""
+        if PROFILE_PARAM in request.GET:
+            # Служебный параметр не должен попадать в обработку (например, в фильтры админки)
+            request.GET = request.GET.copy()
+            del request.GET[PROFILE_PARAM]
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            stack.enter_context(connection.execute_wrapper(self._record_query))
+            try:
+                profiler.enable()
+            except ValueError:
+                # Уже работает другой профилировщик (например, в соседнем потоке, Python 3.12+)
+                profiler = None
+            else:
+                stack.callback(profiler.disable)
+            response = get_response(request)
+        self.duration_ms = (time.perf_counter() - started) * 1000
+        self.profiler = profiler
+        return response
+
+    def duplicates(self):
+        """Повторяющиеся запросы, от самых частых"""
+        exact = Counter((query['sql'], query['params']) for query in self.queries)
+        similar = Counter(query['sql'] for query in self.queries)
+        distinct_params = Counter(sql for sql, _ in exact)
+        result = [
+            {'kind': 'exact', 'sql': sql, 'params': params, 'count': count}
+            for (sql, params), count in exact.items() if count > 1
+        ]
+        result += [
+            {'kind': 'similar', 'sql': sql, 'params': '', 'count': count}
+            for sql, count in similar.items() if distinct_params[sql] > 1
+        ]
+        return sorted(result, key=lambda item: item['count'], reverse=True)
+
+    def profile_text(self):
+        if self.profiler is None:
+            return 'Профиль cProfile недоступен: профилировщик уже был активен'
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        return output.getvalue()
+
+    def profile_data(self):
+        """Профиль в формате pstats (как pstats.Stats.dump_stats)"""
+        if self.profiler is None:
+            return b''
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def save(self, request, response):
+        """Сохраняет результат в ProfileCapture"""
+        from .models import ProfileCapture
+
+        duplicates = self.duplicates()
+        capture = ProfileCapture.objects.create(
+            user=request.user if request.user.is_authenticated else None,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            status_code=response.status_code,
+            duration_ms=round(self.duration_ms, 1),
+            db_queries=len(self.queries) + self.dropped_queries,
+            db_time_ms=round(sum(query['duration_ms'] for query in self.queries), 1),
+            duplicate_queries=sum(item['count'] - 1 for item in duplicates if item['kind'] == 'exact'),
+            queries=self.queries,
+            duplicates=duplicates,
+            profile_text=self.profile_text(),
+            profile_data=self.profile_data(),
+        )
+        ProfileCapture.objects.trim(getattr(settings, 'PROFILE_CAPTURES_LIMIT', 100))
+        return capture
@@ -0,0 +1,118 @@
+"""
+Компактное представление вакансии на время запуска парсера
+
+Из вакансии страницы (decoding.ApiVacancy) сразу после фильтрации
+извлекаются только сохраняемые поля (VacancyRecord со __slots__, без словаря
+атрибутов). Повторяющиеся строки - названия, работодатели, регионы, валюта,
+текст зарплаты - интернируются (sys.intern): вакансии одного работодателя
+или региона ссылаются на одну строку.
+
+Сравнение с исходными словарями API:
+    python benchmarks/records.py --records 100000
+"""
+
+import sys
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, Optional
+
+from .decoding import ApiVacancy
+from .models import Vacancy
+
+
+# Поля, обновляемые при каждом обнаружении вакансии
+SALARY_FIELDS = ('salary_from', 'salary_to', 'currency', 'gross')
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def format_salary(salary_from, salary_to, currency) -> str:
+    """Текст зарплаты для отображения"""
+    if salary_from and salary_to:
+        return f"{salary_from}-{salary_to} {currency}"
+    if salary_from:
+        return f"от {salary_from} {currency}"
+    if salary_to:
+        return f"до {salary_to} {currency}"
+    return "По договоренности"
+
+
+@dataclass(slots=True)
+class VacancyRecord:
+    """Сохраняемые поля вакансии (отслеживаемые - в JSON-совместимом виде)"""
+    external_id: str
+    title: str
+    company: str
+    salary: str
+    url: str
+    published_at: Optional[str]
+    area_name: str
+    salary_from: Optional[int]
+    salary_to: Optional[int]
+    currency: str
+    gross: Optional[bool]
+    found_by_query: str
+
+    @classmethod
+    def from_api(cls, vacancy: ApiVacancy, found_by_query: str = '') -> Optional['VacancyRecord']:
+        """Запись из вакансии ответа API или None, если у вакансии нет ID
+
+        Args:
+            vacancy: Вакансия декодированной страницы (scripts/decoding.py)
+            found_by_query: Запрос, по которому найдена вакансия
+        """
+        if not vacancy.id:
+            return None
+
+        # Обработка зарплаты
+        salary_info = vacancy.salary
+        salary_from = None
+        salary_to = None
+        currency = ''
+        gross = None
+        if salary_info:
+            salary_from = salary_info.get('from')
+            salary_to = salary_info.get('to')
+            currency = salary_info.get('currency') or 'RUR'
+            gross = salary_info.get('gross')
+            salary = format_salary(salary_from, salary_to, currency)
+        else:
+            salary = "Не указана"
+
+        # Обработка даты публикации
+        published_at = None
+        if vacancy.published_at:
+            try:
+                published_at = datetime.fromisoformat(
+                    vacancy.published_at.replace('Z', '+00:00')
+                )
+            except (ValueError, TypeError):
+                pass
+
+        return cls(
+            external_id=vacancy.id,
+            title=_intern('Без названия' if vacancy.name is None else vacancy.name),
+            company=_intern(vacancy.employer.name if vacancy.employer and vacancy.employer.name is not None
+                            else 'Не указана'),
+            salary=_intern(salary),
+            url=vacancy.alternate_url,
+            published_at=Vacancy.serialize_tracked_value('published_at', published_at),
+            area_name=_intern(vacancy.area.name or '' if vacancy.area else ''),
+            salary_from=int(salary_from) if salary_from else None,
+            salary_to=int(salary_to) if salary_to else None,
+            currency=_intern(currency),
+            gross=gross,
+            found_by_query=found_by_query,
+        )
+
+    def tracked_values(self) -> Dict:
+        """Значения Vacancy.TRACKED_FIELDS (для apply_tracked_values)"""
+        return {field: getattr(self, field) for field in Vacancy.TRACKED_FIELDS}
+
+    def salary_values(self) -> Dict:
+        return {field: getattr(self, field) for field in SALARY_FIELDS}
+
+    def to_dict(self) -> Dict:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
@@ -0,0 +1,176 @@
+"""
+Кэш ответов API поиска hh.ru
+
+Разные скрипты часто запрашивают одни и те же страницы (запрос, регионы,
+номер страницы) с разницей в несколько минут. Ответы хранятся в отдельном
+файле SQLite (HH_RESPONSE_CACHE_PATH), общем для всех процессов и потоков:
+
+- ключ - адрес и нормализованные параметры (порядок параметров и регионов
+  не важен);
+- ответ моложе HH_RESPONSE_CACHE_TTL секунд используется без запроса к API;
+- более старый ответ с ETag проверяется запросом с If-None-Match: при 304
+  используется сохраненное тело;
+- общий размер ограничен HH_RESPONSE_CACHE_MAX_MB, при превышении удаляются
+  давно не использованные ответы (LRU).
+
+Тела хранятся сжатыми (zlib). Ошибки базы кэша не прерывают загрузку -
+запрос просто выполняется без кэша. HH_RESPONSE_CACHE_TTL=0 отключает кэш.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    etag TEXT NOT NULL DEFAULT '',
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+# После вытеснения кэш занимает не больше этой доли лимита
+EVICT_TO = 0.9
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    fetched_at: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.fetched_at < ttl
+
+
+def make_key(url: str, params: dict) -> str:
+    """Ключ ответа: адрес и параметры без учета порядка"""
+    normalized = []
+    for name, value in params.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            normalized.append((name, str(item).lower() if isinstance(item, bool) else str(item)))
+    query = urlencode(sorted(normalized))
+    return hashlib.sha256(f'{url}?{query}'.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Кэш ответов в SQLite (отдельное соединение на поток)"""
+
+    def __init__(self, path: str, ttl: float, max_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                'SELECT body, etag, fetched_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            return CachedResponse(zlib.decompress(row[0]), row[1], row[2])
+        except (sqlite3.Error, zlib.error) as e:
+            logger.warning('Кэш ответов API недоступен: %s', e)
+            return None
+
+    def put(self, key: str, body: bytes, etag: str = ''):
+        compressed = zlib.compress(body, 1)
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO responses (key, etag, body, size, fetched_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, etag or '', compressed, len(compressed), now, now)
+            )
+            self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning('Не удалось сохранить ответ API в кэш: %s', e)
+
+    def touch(self, key: str):
+        """Ответ подтвержден API (304) - снова свежий"""
+        now = time.time()
+        try:
+            self._connection().execute(
+                'UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?', (now, now, key)
+            )
+        except sqlite3.Error as e:
+            logger.warning('Не удалось обновить ответ API в кэше: %s', e)
+
+    def _evict(self, connection):
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        excess = total - int(self.max_bytes * EVICT_TO)
+        if total <= self.max_bytes or excess <= 0:
+            return
+        # Давно не использованные ответы, пока не освободится excess байт
+        connection.execute(
+            'DELETE FROM responses WHERE key IN ('
+            '  SELECT key FROM ('
+            '    SELECT key, size, SUM(size) OVER (ORDER BY accessed_at ROWS UNBOUNDED PRECEDING) AS running'
+            '    FROM responses'
+            '  ) WHERE running - size < ?'
+            ')',
+            (excess,)
+        )
+
+    def stats(self) -> dict:
+        """Количество и общий размер (сжатых) ответов"""
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+        ).fetchone()
+        return {'entries': entries, 'size_bytes': size}
+
+    def clear(self):
+        self._connection().execute('DELETE FROM responses')
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Общий кэш ответов процесса или None, если кэш отключен"""
+    global _response_cache
+    ttl = getattr(settings, 'HH_RESPONSE_CACHE_TTL', 300)
+    if ttl <= 0:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            path = getattr(settings, 'HH_RESPONSE_CACHE_PATH', '') or os.path.join(
+                tempfile.gettempdir(), 'scripts_hub_hh_cache.sqlite3'
+            )
+            max_mb = getattr(settings, 'HH_RESPONSE_CACHE_MAX_MB', 256)
+            _response_cache = ResponseCache(str(path), ttl, max_mb * 2 ** 20)
+        return _response_cache
@@ -0,0 +1,191 @@
+"""
+Очередь выполнения запусков скриптов
+
+Запуски выполняются пулом фоновых потоков (SCRIPT_RUNNER_WORKERS): поток
+обрабатывает и сохраняет вакансии запуска, а страницы API загружаются
+задачами общего цикла загрузки (scripts/fetch.py).
+Очередь справедливая: запуски разных пользователей чередуются по кругу,
+поэтому пачка из десятков запусков одного пользователя не задерживает
+запуски остальных.
+
+Запуск создается со статусом queued и получает статус running и время
+начала, только когда его берет рабочий поток. Очередь живет в памяти
+процесса, поэтому незавершенные запуски предыдущего процесса можно
+восстановить после перезапуска (см. recover_orphaned_runs). Автоматически
+при первом запросе это делается только при SCRIPT_RUNNER_RECOVER_ON_START:
+процесс не знает, какие запуски выполняют другие процессы сервера.
+"""
+
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connection
+from django.utils import timezone
+
+from . import metrics
+from .page_cache import bump_script_versions
+
+logger = logging.getLogger(__name__)
+
+# Запуски, поставленные в очередь раньше, принадлежат предыдущему процессу
+PROCESS_STARTED_AT = timezone.now()
+
+ORPHANED_RUN_ERROR = 'Выполнение прервано перезапуском сервера'
+
+RECOVERY_DISPATCH_UID = 'scripts.runner.recover_on_first_request'
+
+
+class RunQueue:
+    """Справедливая очередь запусков с пулом рабочих потоков"""
+
+    def __init__(self, workers: int):
+        self.workers = max(workers, 1)
+        self._condition = threading.Condition()
+        self._queues = OrderedDict()  # id пользователя -> очередь id запусков
+        self._threads = []
+
+    def enqueue(self, script_runs):
+        """Ставит запуски в очередь в порядке их передачи"""
+        with self._condition:
+            for script_run in script_runs:
+                self._queues.setdefault(script_run.started_by_id, deque()).append(script_run.id)
+            metrics.RUN_QUEUE_DEPTH.set(self._depth_locked())
+            self._condition.notify_all()
+            self._start_workers()
+
+    def depth(self) -> int:
+        """Количество запусков, ожидающих свободного потока"""
+        with self._condition:
+            return self._depth_locked()
+
+    def _depth_locked(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _start_workers(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        for index in range(len(self._threads), self.workers):
+            thread = threading.Thread(target=self._work, name=f'script-runner-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_run_id(self) -> int:
+        with self._condition:
+            while not self._queues:
+                self._condition.wait()
+            # Берем запуск первого пользователя и переносим его очередь в конец
+            user_id, queue = self._queues.popitem(last=False)
+            run_id = queue.popleft()
+            if queue:
+                self._queues[user_id] = queue
+            metrics.RUN_QUEUE_DEPTH.set(self._depth_locked())
+            return run_id
+
+    def _work(self):
+        while True:
+            run_id = self._next_run_id()
+            try:
+                execute_run(run_id)
+            except Exception:
+                logger.exception('Ошибка выполнения запуска %s', run_id)
+            finally:
+                connection.close()
+
+
+def execute_run(run_id: int):
+    """Выполняет запуск скрипта в текущем потоке"""
+    from .models import ScriptRun
+    from .parser import HHVacancyParserDjango
+
+    # Забираем запуск атомарно: пока он ждал в очереди, его могли удалить
+    # или уже взять на выполнение
+    claimed = ScriptRun.objects.filter(id=run_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        logger.info('Запуск %s уже не ожидает выполнения, пропускаем', run_id)
+        return
+
+    script_run = ScriptRun.objects.select_related('script').get(id=run_id)
+    # Статус и время начала на страницах скрипта и истории изменились
+    bump_script_versions([script_run.script_id])
+    parser = HHVacancyParserDjango(script_run)
+    parser.run()
+
+
+_run_queue = None
+_run_queue_lock = threading.Lock()
+
+
+def get_run_queue() -> RunQueue:
+    global _run_queue
+    with _run_queue_lock:
+        if _run_queue is None:
+            _run_queue = RunQueue(getattr(settings, 'SCRIPT_RUNNER_WORKERS', 4))
+        return _run_queue
+
+
+def enqueue_runs(script_runs):
+    """Передает созданные запуски на выполнение"""
+    get_run_queue().enqueue(script_runs)
+
+
+def recover_orphaned_runs(before=None):
+    """
+    Разбирает незавершенные запуски, оставшиеся от предыдущего процесса
+    
+    Выполнявшиеся запуски прерваны вместе с процессом и помечаются ошибкой,
+    ожидавшие в очереди снова ставятся в очередь. Иначе они навсегда
+    остаются активными и блокируют новые запуски своих скриптов.
+    
+    Args:
+        before: Запуски, поставленные в очередь раньше этого времени,
+            считаются осиротевшими (по умолчанию - время старта процесса)
+        
+    Returns:
+        Кортеж (помечено ошибкой, поставлено в очередь заново)
+    """
+    from .models import ScriptRun
+
+    orphaned = ScriptRun.objects.filter(started_at__lt=before or PROCESS_STARTED_AT)
+    running = orphaned.filter(status='running')
+    failed_script_ids = set(running.values_list('script_id', flat=True))
+    failed = running.update(
+        status='failed',
+        completed_at=timezone.now(),
+        error_message=ORPHANED_RUN_ERROR,
+    )
+    requeued = list(orphaned.filter(status='queued').order_by('started_at', 'id'))
+    if failed or requeued:
+        # Статусы запусков на страницах скриптов и истории изменились
+        bump_script_versions(failed_script_ids)
+    if requeued:
+        enqueue_runs(requeued)
+    if failed or requeued:
+        logger.warning(
+            'Восстановлены запуски предыдущего процесса: %s прервано, %s поставлено в очередь',
+            failed, len(requeued),
+        )
+    return failed, len(requeued)
+
+
+def recover_on_first_request(**kwargs):
+    """Восстанавливает запуски при первом запросе к процессу (один раз)"""
+    request_started.disconnect(recover_on_first_request, dispatch_uid=RECOVERY_DISPATCH_UID)
+    try:
+        recover_orphaned_runs()
+    except Exception:
+        logger.exception('Не удалось восстановить запуски предыдущего процесса')
+
+
+def connect_recovery():
+    """Подключает восстановление запусков, если оно включено в настройках
+
+    По умолчанию выключено: при нескольких процессах сервера (gunicorn -w N)
+    каждый из них считал бы запуски остальных осиротевшими - прерывал бы
+    выполняющиеся и повторно ставил в очередь ожидающие.
+    """
+    if getattr(settings, 'SCRIPT_RUNNER_RECOVER_ON_START', False):
+        request_started.connect(recover_on_first_request, dispatch_uid=RECOVERY_DISPATCH_UID)
@@ -0,0 +1,261 @@
+"""
+Полнотекстовый поиск по вакансиям
+
+SQLite - виртуальная таблица FTS5 (rowid = id вакансии),
+PostgreSQL - таблица с tsvector и GIN-индексом.
+Индекс обновляется стадией сохранения парсера, таблица создается миграцией.
+Записи удаленных вакансий убираются при удалении запуска, скрипта (сигнал)
+и вакансий в админке; записи, оставшиеся после удаления другими путями,
+отсекаются соединением с таблицей вакансий в самом запросе поиска.
+Если полнотекстовый индекс недоступен, используется поиск через LIKE.
+"""
+
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Vacancy
+
+
+SEARCH_TABLE = 'scripts_vacancy_search'
+
+# Поля вакансии, попадающие в индекс
+INDEXED_FIELDS = ('title', 'company', 'area_name', 'found_by_query', 'external_id')
+
+# Документ PostgreSQL: название важнее компании, остальное - без морфологии
+POSTGRES_DOCUMENT_SQL = (
+    "setweight(to_tsvector('russian', %s), 'A') || "
+    "setweight(to_tsvector('russian', %s), 'B') || "
+    "to_tsvector('simple', %s)"
+)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_search_available() -> bool:
+    """Проверяет, создан ли полнотекстовый индекс в текущей БД
+
+    Результат не запоминается: таблица может появиться или исчезнуть
+    (миграции, другая БД), а проверка по каталогу - один легкий запрос.
+    """
+    if connection.vendor == 'postgresql':
+        sql, params = 'SELECT to_regclass(%s) IS NOT NULL', [SEARCH_TABLE]
+    elif connection.vendor == 'sqlite':
+        sql, params = "SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s)", [SEARCH_TABLE]
+    else:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return bool(cursor.fetchone()[0])
+
+
+def _tokenize(query: str) -> List[str]:
+    return _TOKEN_RE.findall(query or '')[:10]
+
+
+def build_match_query(query: str) -> str:
+    """Преобразует пользовательский запрос в безопасное выражение поиска
+
+    Каждое слово ищется по префиксу, все слова должны присутствовать.
+    """
+    tokens = _tokenize(query)
+    if connection.vendor == 'postgresql':
+        return ' & '.join(f'{token}:*' for token in tokens)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _document_values(vacancy: Vacancy) -> tuple:
+    return tuple(getattr(vacancy, field) or '' for field in INDEXED_FIELDS)
+
+
+def index_vacancies(vacancies: Iterable[Vacancy]):
+    """Добавляет или обновляет вакансии в полнотекстовом индексе"""
+    vacancies = [vacancy for vacancy in vacancies if vacancy.pk]
+    if not vacancies or not is_search_available():
+        return
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (vacancy_id, script_id, document) "
+                f"VALUES (%s, %s, {POSTGRES_DOCUMENT_SQL}) "
+                "ON CONFLICT (vacancy_id) DO UPDATE "
+                "SET script_id = EXCLUDED.script_id, document = EXCLUDED.document",
+                [
+                    (vacancy.pk, vacancy.script_id, vacancy.title, vacancy.company,
+                     ' '.join(_document_values(vacancy)[2:]))
+                    for vacancy in vacancies
+                ]
+            )
+        else:
+            ids = [vacancy.pk for vacancy in vacancies]
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(ids))})",
+                ids
+            )
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, script_id, {', '.join(INDEXED_FIELDS)}) "
+                f"VALUES (%s, %s, {', '.join(['%s'] * len(INDEXED_FIELDS))})",
+                [
+                    (vacancy.pk, vacancy.script_id) + _document_values(vacancy)
+                    for vacancy in vacancies
+                ]
+            )
+
+
+def remove_vacancies(vacancy_ids: Iterable[int]):
+    """Удаляет вакансии из полнотекстового индекса"""
+    vacancy_ids = list(vacancy_ids)
+    if not vacancy_ids or not is_search_available():
+        return
+
+    id_column = 'vacancy_id' if connection.vendor == 'postgresql' else 'rowid'
+    with connection.cursor() as cursor:
+        for start in range(0, len(vacancy_ids), 500):
+            chunk = vacancy_ids[start:start + 500]
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE {id_column} IN ({', '.join(['%s'] * len(chunk))})",
+                chunk
+            )
+
+
+def remove_script_vacancies(script_ids: Iterable[int]):
+    """Удаляет из полнотекстового индекса все вакансии скриптов"""
+    script_ids = list(script_ids)
+    if not script_ids or not is_search_available():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE script_id IN ({', '.join(['%s'] * len(script_ids))})",
+            script_ids
+        )
+
+
+def rebuild_index():
+    """Полностью перестраивает полнотекстовый индекс по таблице вакансий"""
+    if not is_search_available():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (vacancy_id, script_id, document) "
+                "SELECT id, script_id, "
+                + POSTGRES_DOCUMENT_SQL % (
+                    'title', 'company',
+                    "area_name || ' ' || found_by_query || ' ' || external_id"
+                )
+                + f" FROM {Vacancy._meta.db_table}"
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, script_id, {', '.join(INDEXED_FIELDS)}) "
+                f"SELECT id, script_id, {', '.join(INDEXED_FIELDS)} FROM {Vacancy._meta.db_table}"
+            )
+
+
+def matching_ids_sql(query: str) -> Optional[RawSQL]:
+    """Подзапрос с id вакансий, подходящих под запрос (для фильтрации queryset)"""
+    match_query = build_match_query(query)
+    if not match_query or not is_search_available():
+        return None
+
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            f"SELECT vacancy_id FROM {SEARCH_TABLE} "
+            "WHERE document @@ to_tsquery('russian', %s)",
+            [match_query]
+        )
+    return RawSQL(
+        f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+        [match_query]
+    )
+
+
+def _ranked_ids(match_query: str, script_ids, limit: int, offset: int) -> List[Tuple[int, float]]:
+    params = [match_query]
+    script_filter = ''
+    if script_ids is not None:
+        script_filter = f" AND {SEARCH_TABLE}.script_id IN ({', '.join(['%s'] * len(script_ids))})"
+        params.extend(script_ids)
+    params.extend([limit, offset])
+
+    # Соединение с таблицей вакансий отсекает записи удаленных вакансий до LIMIT,
+    # иначе страницы получались бы неполными
+    vacancy_table = Vacancy._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = (
+            f"SELECT vacancy_id, ts_rank_cd(document, q) AS rank "
+            f"FROM {SEARCH_TABLE} JOIN {vacancy_table} ON {vacancy_table}.id = vacancy_id, "
+            f"to_tsquery('russian', %s) q "
+            f"WHERE document @@ q{script_filter} "
+            "ORDER BY rank DESC, vacancy_id DESC LIMIT %s OFFSET %s"
+        )
+    else:
+        # bm25 в FTS5 отрицательный: чем меньше, тем релевантнее
+        sql = (
+            f"SELECT {SEARCH_TABLE}.rowid, -rank "
+            f"FROM {SEARCH_TABLE} JOIN {vacancy_table} ON {vacancy_table}.id = {SEARCH_TABLE}.rowid "
+            f"WHERE {SEARCH_TABLE} MATCH %s{script_filter} "
+            f"ORDER BY rank, {SEARCH_TABLE}.rowid DESC LIMIT %s OFFSET %s"
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def search_vacancies(query: str, script_ids=None, page: int = 1, per_page: int = 20) -> dict:
+    """Ранжированный постраничный поиск вакансий
+
+    Args:
+        query: Поисковая строка пользователя
+        script_ids: Скрипты, в которых искать (None - все)
+        page: Номер страницы, начиная с 1
+        per_page: Количество результатов на странице
+
+    Returns:
+        dict: results (вакансии с атрибутом rank), page, has_next
+    """
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+    result = {'results': [], 'page': page, 'has_next': False}
+
+    if not _tokenize(query) or script_ids is not None and not script_ids:
+        return result
+    script_ids = list(script_ids) if script_ids is not None else None
+
+    if is_search_available():
+        # Запрашиваем на одну запись больше, чтобы узнать о следующей странице без COUNT(*)
+        ranked = _ranked_ids(build_match_query(query), script_ids, per_page + 1, offset)
+        result['has_next'] = len(ranked) > per_page
+        ranked = ranked[:per_page]
+        vacancies = Vacancy.objects.select_related('script').in_bulk([row[0] for row in ranked])
+        for vacancy_id, rank in ranked:
+            # Вакансия могла быть удалена между запросами
+            if vacancy_id in vacancies:
+                vacancy = vacancies[vacancy_id]
+                vacancy.rank = rank
+                result['results'].append(vacancy)
+        return result
+
+    condition = Q()
+    for token in _tokenize(query):
+        condition &= (
+            Q(title__icontains=token) | Q(company__icontains=token) |
+            Q(area_name__icontains=token) | Q(found_by_query__icontains=token) |
+            Q(external_id=token)
+        )
+    queryset = Vacancy.objects.filter(condition).select_related('script')
+    if script_ids is not None:
+        queryset = queryset.filter(script_id__in=script_ids)
+    vacancies = list(queryset.order_by('-last_seen_at', '-id')[offset:offset + per_page + 1])
+    result['has_next'] = len(vacancies) > per_page
+    for vacancy in vacancies[:per_page]:
+        vacancy.rank = None
+        result['results'].append(vacancy)
+    return result
@@ -0,0 +1,86 @@
+from rest_framework import serializers
+from .models import Script, ScriptRun, Vacancy, VacancyRun
+
+
+class DynamicFieldsMixin:
+    """Оставляет в ответе только поля из параметра ?fields=a,b,c"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        requested = get_requested_fields(request)
+        if requested:
+            for field_name in set(self.fields) - requested:
+                self.fields.pop(field_name)
+
+
+def get_requested_fields(request):
+    """Множество полей из ?fields= или None, если параметр не передан"""
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+
+class ScriptSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    search_queries = serializers.SerializerMethodField()
+    region_name = serializers.SerializerMethodField()
+    created_by = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = Script
+        fields = [
+            'id', 'name', 'description', 'script_type', 'search_queries', 'region',
+            'region_name', 'max_pages', 'is_active', 'created_by', 'created_at', 'updated_at'
+        ]
+
+    def get_search_queries(self, obj):
+        return obj.get_search_queries_list()
+
+    def get_region_name(self, obj):
+        return obj.get_region_display_name()
+
+
+class ScriptRunSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    queries_stats = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ScriptRun
+        fields = [
+            'id', 'script', 'status', 'started_at', 'completed_at', 'total_found',
+            'new_vacancies', 'existing_vacancies', 'is_truncated', 'error_message', 'queries_stats'
+        ]
+
+    def get_queries_stats(self, obj):
+        return obj.get_queries_stats()
+
+
+class VacancySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = Vacancy
+        fields = [
+            'id', 'script', 'external_id', 'title', 'company', 'salary', 'salary_from',
+            'salary_to', 'currency', 'gross', 'url', 'published_at', 'area_name',
+            'found_by_query', 'is_active', 'first_seen_at', 'last_seen_at', 'times_found'
+        ]
+
+
+class NestedVacancySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Vacancy
+        fields = [
+            'id', 'external_id', 'title', 'company', 'salary', 'salary_from', 'salary_to',
+            'currency', 'url', 'published_at', 'area_name', 'is_active', 'times_found'
+        ]
+
+
+class VacancyRunSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    vacancy = NestedVacancySerializer(read_only=True)
+
+    class Meta:
+        model = VacancyRun
+        fields = ['id', 'script_run', 'vacancy', 'is_new_in_run', 'found_at', 'found_by_query']
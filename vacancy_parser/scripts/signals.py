@@ -0,0 +1,58 @@
+"""
+Сигналы приложения scripts
+
+Инвалидация кэша прав доступа (см. access.py) при изменении скриптов
+и состава пользователей с доступом; смена версии данных (page_cache.py)
+при правке запусков и вакансий вне парсера, например в админке; очистка полнотекстового индекса
+(search.py) от вакансий удаленного скрипта.
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import access, page_cache, search
+from .models import Script, ScriptRun, Vacancy
+
+
+@receiver(post_save, sender=Script)
+@receiver(post_delete, sender=Script)
+def invalidate_access_on_script_change(sender, instance, **kwargs):
+    """Новый, удаленный или измененный скрипт (владелец, активность) меняет доступ всех"""
+    access.bump_global_version()
+
+
+@receiver(post_save, sender=ScriptRun)
+@receiver(post_delete, sender=ScriptRun)
+@receiver(post_save, sender=Vacancy)
+@receiver(post_delete, sender=Vacancy)
+def invalidate_data_version_on_change(sender, instance, **kwargs):
+    """Массовые изменения (bulk_update, update) меняют версию явно"""
+    page_cache.bump_data_version()
+
+
+@receiver(post_delete, sender=Script)
+def remove_script_from_search_index(sender, instance, **kwargs):
+    """Вакансии удалены каскадно вместе со скриптом - убираем их из индекса одним запросом"""
+    search.remove_script_vacancies([instance.pk])
+
+
+@receiver(m2m_changed, sender=Script.allowed_users.through)
+def invalidate_access_on_allowed_users_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Изменение allowed_users меняет доступ только затронутых пользователей"""
+    if action == 'pre_clear':
+        # После очистки затронутых пользователей уже не найти - запоминаем их заранее.
+        # Версии меняем только после очистки: иначе параллельный запрос успеет
+        # закэшировать доступ по еще не удаленным строкам
+        if not reverse:
+            instance._cleared_allowed_user_ids = list(instance.allowed_users.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # user.accessible_scripts.add(...) - затронут сам пользователь
+        access.bump_user_versions([instance.pk])
+    elif action == 'post_clear':
+        access.bump_user_versions(instance.__dict__.pop('_cleared_allowed_user_ids', []))
+    elif pk_set:
+        access.bump_user_versions(pk_set)
@@ -1,3 +1,1006 @@
-from django.test import TestCase
+"""
+Тесты приложения scripts
 
-# Create your tests here.
+- Производительность страниц scripts/urls.py и главной страницы: для каждой
+  страницы задан бюджет SQL-запросов. Количество запросов измеряется на двух
+  размерах синтетических данных (generate_synthetic_data) и не должно
+  зависеть от объема данных - так ловятся запросы в циклах (N+1). На большом
+  наборе дополнительно проверяется время ответа. При превышении бюджета тест
+  выводит все выполненные SQL-запросы.
+- Поведение отдельных механизмов: ревизии вакансий, пагинация, API, кэши,
+  загрузка страниц API.
+
+    python manage.py test scripts
+"""
+
+import contextlib
+import importlib.util
+import io
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.utils import timezone
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from benchmarks.fake_hh import FakeHH, FakeHHServer
+
+from . import access, bulk, fetch, page_cache, runner, search
+from .decoding import ApiVacancy
+from .models import RunQueryStat, Script, ScriptRun, Vacancy, VacancyRevision
+from .pagination import capped_count, capped_counts, paginate_keyset
+from .parser import CONFLICT_UPDATED_VACANCY_FIELDS, HHVacancyParserDjango
+from .records import VacancyRecord
+from .response_cache import ResponseCache
+
+
+SMALL_DATASET = {'users': 2, 'scripts': 3, 'runs': 9, 'vacancies_per_run': 5}
+# Большой набор: 1500 запусков по 40 вакансий (60 000 связей запуск-вакансия).
+# PERF_DATASET_SCALE умножает количество запусков, например PERF_DATASET_SCALE=100
+# для проверки на объеме, близком к рабочему
+PERF_DATASET_SCALE = int(os.environ.get('PERF_DATASET_SCALE', '10'))
+LARGE_DATASET = {'users': 6, 'scripts': 15, 'runs': 150 * PERF_DATASET_SCALE, 'vacancies_per_run': 40}
+
+# Максимальное количество SQL-запросов страницы (при пустом кэше)
+QUERY_BUDGETS = {
+    'home': 9,
+    'list': 4,
+    'detail': 12,
+    'history': 5,
+    'vacancies': 5,
+    'vacancies_new': 5,
+    'status': 4,
+    'search': 7,
+    'search_api': 7,
+    'export_excel': 7,
+    # SAVEPOINT и RELEASE транзакции, в которой проверяются и создаются запуски
+    'run': 8,
+    'bulk_run': 7,
+    'delete_run': 13,
+}
+
+# Максимальное время ответа на большом наборе данных (медиана), мс
+DEFAULT_LATENCY_BUDGET_MS = 500
+LATENCY_BUDGETS_MS = {
+    'export_excel': 1500,
+}
+
+LATENCY_REPEAT = 3
+
+
+def generate_dataset(params, seed):
+    call_command(
+        'generate_synthetic_data',
+        seed=seed,
+        stdout=io.StringIO(),
+        **params
+    )
+
+
+class ViewPerformanceTests(TestCase):
+    """Бюджеты SQL-запросов и времени ответа страниц"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset(SMALL_DATASET, seed=1)
+        cls.user = User.objects.create_user(username='budget', password='budget')
+
+    def setUp(self):
+        cache.clear()
+        # Запуски не выполняются: проверяется только сам запрос
+        patcher = mock.patch('scripts.views.enqueue_runs')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+
+    def grant_access_to_all_scripts(self):
+        self.user.accessible_scripts.set(Script.objects.all())
+
+    def grow_dataset(self):
+        generate_dataset(LARGE_DATASET, seed=2)
+        self.grant_access_to_all_scripts()
+
+    def endpoints(self):
+        """(название, метод, адрес, данные) для скрипта с наибольшим количеством запусков"""
+        # Запуски, созданные предыдущими замерами, не должны блокировать новый запуск
+        ScriptRun.objects.filter(status__in=ScriptRun.ACTIVE_STATUSES).update(status='completed')
+        script = max(Script.objects.all(), key=lambda script: script.runs.count())
+        script_run = script.runs.filter(status='completed').order_by('-started_at').first()
+        oldest_run = script.runs.order_by('started_at').first()
+        self.assertIsNotNone(script_run)
+
+        endpoints = [
+            ('home', 'get', reverse('home'), None),
+            ('list', 'get', reverse('scripts:list'), None),
+            ('detail', 'get', reverse('scripts:detail', args=[script.id]), None),
+            ('history', 'get', reverse('scripts:history'), None),
+            ('vacancies', 'get', reverse('scripts:vacancies', args=[script_run.id]), None),
+            ('vacancies_new', 'get', reverse('scripts:vacancies', args=[script_run.id]) + '?filter=new', None),
+            ('status', 'get', reverse('scripts:status', args=[script_run.id]), None),
+            ('search', 'get', reverse('scripts:search') + '?q=труда', None),
+            ('search_api', 'get', reverse('scripts:search_api') + '?q=инженер', None),
+        ]
+        # Экспорт требует openpyxl
+        if importlib.util.find_spec('openpyxl'):
+            endpoints.append(('export_excel', 'get', reverse('scripts:export_excel', args=[script.id]), None))
+        endpoints += [
+            ('run', 'post', reverse('scripts:run', args=[script.id]), None),
+            ('bulk_run', 'post', reverse('scripts:bulk_run'), {'script_ids': [script.id]}),
+            ('delete_run', 'post', reverse('scripts:delete_run', args=[oldest_run.id]), None),
+        ]
+        return endpoints
+
+    def request(self, method, url, data=None):
+        """Запрос при пустом кэше: (ответ, время в мс, выполненные запросы)"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data or {})
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        self.assertLess(response.status_code, 400, f'{url}: HTTP {response.status_code}')
+        return response, elapsed_ms, captured.captured_queries
+
+    def measure_query_counts(self):
+        results = {}
+        for name, method, url, data in self.endpoints():
+            _, _, queries = self.request(method, url, data)
+            results[name] = queries
+        return results
+
+    @staticmethod
+    def format_queries(queries):
+        return '\n'.join(f'{index}. {query["sql"]}' for index, query in enumerate(queries, 1))
+
+    def assert_within_budget(self, name, queries, dataset):
+        budget = QUERY_BUDGETS[name]
+        if len(queries) > budget:
+            self.fail(
+                f'{name} ({dataset}): {len(queries)} SQL-запросов при бюджете {budget}\n'
+                f'{self.format_queries(queries)}'
+            )
+
+    def test_query_counts_within_budget_and_independent_of_data_size(self):
+        self.grant_access_to_all_scripts()
+        small = self.measure_query_counts()
+        self.grow_dataset()
+        large = self.measure_query_counts()
+
+        self.assertEqual(set(small), set(QUERY_BUDGETS) & set(small))
+        for name in small:
+            with self.subTest(view=name):
+                self.assert_within_budget(name, small[name], 'малый набор')
+                self.assert_within_budget(name, large[name], 'большой набор')
+                if len(large[name]) != len(small[name]):
+                    self.fail(
+                        f'{name}: количество SQL-запросов зависит от объема данных '
+                        f'({len(small[name])} -> {len(large[name])})\n'
+                        f'Малый набор:\n{self.format_queries(small[name])}\n'
+                        f'Большой набор:\n{self.format_queries(large[name])}'
+                    )
+
+    def test_latency_within_budget_on_large_dataset(self):
+        self.grow_dataset()
+        for name, method, url, data in self.endpoints():
+            if method != 'get':
+                continue
+            with self.subTest(view=name):
+                timings = []
+                for _ in range(LATENCY_REPEAT):
+                    _, elapsed_ms, queries = self.request(method, url, data)
+                    timings.append(elapsed_ms)
+                median_ms = statistics.median(timings)
+                budget_ms = LATENCY_BUDGETS_MS.get(name, DEFAULT_LATENCY_BUDGET_MS)
+                if median_ms > budget_ms:
+                    self.fail(
+                        f'{name}: {median_ms:.0f} мс при бюджете {budget_ms} мс\n'
+                        f'{self.format_queries(queries)}'
+                    )
+
+
+def create_script(user, **fields):
+    fields.setdefault('name', 'Охрана труда')
+    fields.setdefault('description', 'Тестовый скрипт')
+    return Script.objects.create(created_by=user, **fields)
+
+
+def make_record(external_id, title='Специалист по охране труда', company='Компания', salary=None,
+                query='Охрана труда'):
+    """Запись вакансии в том виде, в котором ее сохраняет парсер"""
+    return VacancyRecord.from_api(ApiVacancy.from_dict({
+        'id': external_id,
+        'name': title,
+        'employer': {'name': company},
+        'area': {'name': 'Москва'},
+        'salary': salary,
+        'alternate_url': f'https://hh.ru/vacancy/{external_id}',
+        'published_at': '2026-10-01T10:00:00+0300',
+    }), found_by_query=query)
+
+
+class AccessCacheTests(TestCase):
+    """Кэш доступных скриптов сбрасывается сигналами при изменении прав"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.script = create_script(cls.owner)
+
+    def setUp(self):
+        cache.clear()
+
+    def accessible_ids(self, user):
+        # Новый объект пользователя: без запомненного в рамках запроса доступа
+        return access.get_accessible_script_ids(User.objects.get(pk=user.pk))
+
+    def test_cached_access_reused_until_allowed_users_change(self):
+        self.assertEqual(self.accessible_ids(self.reader), set())
+        user = User.objects.get(pk=self.reader.pk)
+        with self.assertNumQueries(0):
+            access.get_accessible_script_ids(user)
+
+        self.script.allowed_users.add(self.reader)
+        self.assertEqual(self.accessible_ids(self.reader), {self.script.id})
+        self.script.allowed_users.remove(self.reader)
+        self.assertEqual(self.accessible_ids(self.reader), set())
+
+    def test_clear_invalidates_users_after_rows_are_removed(self):
+        self.script.allowed_users.add(self.reader, self.other)
+        self.assertEqual(self.accessible_ids(self.reader), {self.script.id})
+
+        bumped = []
+        bump = access.bump_user_versions
+
+        def bump_user_versions(user_ids):
+            # К моменту сброса версий строки доступа уже удалены
+            self.assertFalse(self.script.allowed_users.exists())
+            bumped.extend(user_ids)
+            bump(user_ids)
+
+        with mock.patch.object(access, 'bump_user_versions', side_effect=bump_user_versions):
+            self.script.allowed_users.clear()
+        self.assertEqual(sorted(bumped), sorted([self.reader.id, self.other.id]))
+
+        self.assertEqual(self.accessible_ids(self.reader), set())
+        self.assertEqual(self.accessible_ids(self.other), set())
+
+    def test_reverse_clear_and_script_changes_invalidate_access(self):
+        self.script.allowed_users.add(self.reader)
+        self.assertEqual(self.accessible_ids(self.reader), {self.script.id})
+        self.reader.accessible_scripts.clear()
+        self.assertEqual(self.accessible_ids(self.reader), set())
+
+        self.assertEqual(self.accessible_ids(self.owner), {self.script.id})
+        self.script.is_active = False
+        self.script.save()
+        self.assertEqual(self.accessible_ids(self.owner), set())
+
+
+@override_settings(HH_RESPONSE_CACHE_TTL=0)
+class ParserPersistenceTestCase(TestCase):
+    """Сохранение пачек вакансий парсером без загрузки страниц"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', password='owner')
+        cls.script = create_script(cls.user)
+
+    def start_run(self):
+        return ScriptRun.objects.create(script=self.script, started_by=self.user)
+
+    def persist(self, records):
+        """Сохраняет записи в новом запуске; возвращает (запуск, новых, существующих)"""
+        script_run = self.start_run()
+        parser = HHVacancyParserDjango(script_run)
+        with mock.patch.object(parser, 'log'):
+            new_count, existing_count = parser.persist_batch(records)
+        return script_run, new_count, existing_count
+
+
+class VacancyRevisionTests(ParserPersistenceTestCase):
+    """Ревизии отслеживаемых полей при повторном обнаружении вакансии"""
+
+    def test_unchanged_vacancy_records_no_revision(self):
+        self.persist([make_record('1')])
+        _, new_count, existing_count = self.persist([make_record('1')])
+
+        self.assertEqual((new_count, existing_count), (0, 1))
+        self.assertFalse(VacancyRevision.objects.exists())
+        vacancy = Vacancy.objects.get(external_id='1')
+        self.assertEqual(vacancy.times_found, 2)
+
+    def test_changed_fields_recorded_with_old_and_new_values(self):
+        self.persist([make_record('1')])
+        second_run, _, _ = self.persist([make_record('1', title='Инженер по охране труда', company='Другая')])
+
+        revision = VacancyRevision.objects.get()
+        vacancy = Vacancy.objects.get(external_id='1')
+        self.assertEqual(revision.script_run_id, second_run.id)
+        self.assertEqual(revision.changes, {
+            'title': ['Специалист по охране труда', 'Инженер по охране труда'],
+            'company': ['Компания', 'Другая'],
+        })
+        self.assertEqual(revision.content_hash, vacancy.content_hash)
+        self.assertEqual(vacancy.title, 'Инженер по охране труда')
+
+    def test_state_as_of_earlier_run_rolls_back_later_revisions(self):
+        first_run, _, _ = self.persist([make_record('1')])
+        second_run, _, _ = self.persist([make_record('1', title='Инженер по охране труда')])
+        self.persist([make_record('1', title='Ведущий инженер по охране труда', company='Другая')])
+
+        vacancy = Vacancy.objects.get(external_id='1')
+        self.assertEqual(vacancy.get_state_as_of(first_run)['title'], 'Специалист по охране труда')
+        self.assertEqual(vacancy.get_state_as_of(first_run)['company'], 'Компания')
+        self.assertEqual(vacancy.get_state_as_of(second_run)['title'], 'Инженер по охране труда')
+        self.assertEqual(vacancy.get_state_as_of(second_run)['company'], 'Компания')
+        self.assertEqual(vacancy.get_state_as_of(vacancy.runs.latest('id').script_run), vacancy.get_tracked_values())
+        self.assertIsNone(vacancy.get_state_as_of(first_run.id - 1))
+
+
+class VacancyUpsertTests(ParserPersistenceTestCase):
+    """Вставка вакансии, которую параллельно добавил другой запуск"""
+
+    def persist_after_stale_read(self, records):
+        """Сохраняет записи так, будто другой запуск добавил их сразу после чтения существующих"""
+        script_run = self.start_run()
+        parser = HHVacancyParserDjango(script_run)
+        load_existing = parser._load_existing
+        stale_reads = [{}]
+        with mock.patch.object(parser, 'log'), mock.patch.object(
+            parser, '_load_existing', side_effect=lambda ids: stale_reads.pop() if stale_reads else load_existing(ids)
+        ):
+            new_count, existing_count = parser.persist_batch(records)
+        return script_run, new_count, existing_count
+
+    def test_conflict_counted_as_repeated_sighting(self):
+        first_run, _, _ = self.persist([make_record('1', query='Первый запрос')])
+        first_seen_at = Vacancy.objects.get(external_id='1').first_seen_at
+        Vacancy.objects.filter(external_id='1').update(times_found=3, missed_runs=1)
+
+        script_run, new_count, existing_count = self.persist_after_stale_read([
+            make_record('1', title='Инженер по охране труда', query='Второй запрос'),
+            make_record('2', query='Второй запрос'),
+        ])
+
+        self.assertEqual((new_count, existing_count), (1, 1))
+        self.assertEqual(
+            dict(script_run.vacancy_runs.values_list('vacancy__external_id', 'is_new_in_run')),
+            {'1': False, '2': True}
+        )
+        stored = Vacancy.objects.get(external_id='1')
+        self.assertEqual(stored.title, 'Инженер по охране труда')
+        self.assertEqual((stored.times_found, stored.missed_runs), (4, 0))
+        self.assertEqual(stored.first_seen_at, first_seen_at)
+        # Прежние значения не затерты вставкой - ревизия записана как обычно
+        revision = VacancyRevision.objects.get(vacancy=stored)
+        self.assertEqual(revision.script_run, script_run)
+        self.assertEqual(revision.changes['title'], ['Специалист по охране труда', 'Инженер по охране труда'])
+        self.assertEqual(stored.get_state_as_of(first_run)['title'], 'Специалист по охране труда')
+
+    def test_new_vacancies_are_not_counted_as_conflicts(self):
+        vacancies = [
+            Vacancy(script=self.script, external_id=external_id, title='Инженер', first_seen_at=timezone.now())
+            for external_id in ('1', '2')
+        ]
+        self.assertEqual(bulk.upsert_new_vacancies(vacancies, CONFLICT_UPDATED_VACANCY_FIELDS), [])
+        self.assertEqual(
+            sorted(Vacancy.objects.values_list('external_id', 'times_found')), [('1', 1), ('2', 1)]
+        )
+
+
+class RunQueryStatTests(ParserPersistenceTestCase):
+    """Нормализованная статистика поисковых запросов"""
+
+    def test_long_queries_with_common_prefix_kept_apart(self):
+        prefix = 'охрана труда ' * 20
+        queries = [prefix + 'Москва', prefix + 'Московская область']
+        script_run = self.start_run()
+        script_run.queries_stats = {
+            query: {'collected_by_script': index + 1, 'new_vacancies': index + 1}
+            for index, query in enumerate(queries)
+        }
+
+        RunQueryStat.objects.bulk_create(RunQueryStat.from_queries_stats(script_run))
+
+        productivity = {row['query']: row['new_vacancies'] for row in RunQueryStat.objects.productivity(self.script)}
+        self.assertEqual(productivity, {queries[0]: 1, queries[1]: 2})
+
+
+class SalaryStatsTests(ParserPersistenceTestCase):
+    """Статистика зарплат не смешивает валюты"""
+
+    def test_stats_are_computed_per_currency(self):
+        self.persist([
+            make_record('1', salary={'from': 100000, 'to': None, 'currency': 'RUR'}),
+            make_record('2', salary={'from': None, 'to': 200000, 'currency': 'RUR'}),
+            make_record('3', salary={'from': 150000, 'to': 180000, 'currency': 'RUR'}),
+            make_record('4', salary={'from': 3000, 'to': None, 'currency': 'USD'}),
+            make_record('5'),
+        ])
+
+        rur = Vacancy.objects.salary_stats()
+        self.assertEqual((rur['count'], rur['min'], rur['max'], rur['median']), (3, 100000, 200000, 150000))
+        usd = Vacancy.objects.salary_stats('USD')
+        self.assertEqual((usd['count'], usd['min'], usd['max']), (1, 3000, 3000))
+        self.assertEqual(set(Vacancy.objects.salary_stats_by_currency()), {'RUR', 'USD'})
+
+
+class SearchIndexTests(ParserPersistenceTestCase):
+    """Полнотекстовый индекс и удаленные вакансии"""
+
+    def index_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.SEARCH_TABLE}')
+            return cursor.fetchone()[0]
+
+    def setUp(self):
+        if not search.is_search_available():
+            self.skipTest('Полнотекстовый индекс не создан')
+        self.persist([make_record(str(number), company=f'Компания {number}') for number in range(1, 6)])
+
+    def test_deleted_vacancies_do_not_shorten_pages(self):
+        # Удаление в обход представлений оставляет записи в индексе
+        Vacancy.objects.filter(external_id__in=['2', '4']).delete()
+        self.assertEqual(self.index_rows(), 5)
+
+        first = search.search_vacancies('охране труда', page=1, per_page=2)
+        second = search.search_vacancies('охране труда', page=2, per_page=2)
+        self.assertEqual(len(first['results']), 2)
+        self.assertTrue(first['has_next'])
+        self.assertEqual(len(second['results']), 1)
+        self.assertFalse(second['has_next'])
+        found = {vacancy.external_id for vacancy in first['results'] + second['results']}
+        self.assertEqual(found, {'1', '3', '5'})
+
+    def test_script_delete_removes_index_rows(self):
+        self.script.delete()
+        self.assertEqual(self.index_rows(), 0)
+
+    def test_availability_is_not_cached(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {search.SEARCH_TABLE} RENAME TO scripts_vacancy_search_old')
+        try:
+            self.assertFalse(search.is_search_available())
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE scripts_vacancy_search_old RENAME TO {search.SEARCH_TABLE}')
+        self.assertTrue(search.is_search_available())
+
+
+class PageCacheTests(ParserPersistenceTestCase):
+    """Кэш данных страниц скрипта: версии скрипта и прав, выполняющиеся запуски"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def add_to_run(self, script_run, records):
+        parser = HHVacancyParserDjango(script_run)
+        with mock.patch.object(parser, 'log'):
+            parser.persist_batch(records)
+        return parser
+
+    def page_external_ids(self, script_run):
+        response = self.client.get(reverse('scripts:vacancies', args=[script_run.id]))
+        return [vacancy_run.vacancy.external_id for vacancy_run in response.context['page_obj'].object_list]
+
+    def test_finished_run_page_cached_until_script_version_changes(self):
+        script_run, _, _ = self.persist([make_record('1')])
+        ScriptRun.objects.filter(id=script_run.id).update(status='completed')
+        script_run.refresh_from_db()
+        self.assertEqual(self.page_external_ids(script_run), ['1'])
+
+        # Данные изменились в обход представлений - страница отдается из кэша
+        parser = self.add_to_run(script_run, [make_record('2')])
+        self.assertEqual(self.page_external_ids(script_run), ['1'])
+
+        parser.on_run_finished()
+        self.assertEqual(self.page_external_ids(script_run), ['2', '1'])
+
+    def test_active_run_page_not_cached(self):
+        script_run, _, _ = self.persist([make_record('1')])
+        self.assertEqual(self.page_external_ids(script_run), ['1'])
+
+        self.add_to_run(script_run, [make_record('2')])
+        self.assertEqual(self.page_external_ids(script_run), ['2', '1'])
+
+    def test_cache_key_includes_access_version(self):
+        builder = mock.Mock(return_value={'page': 1})
+        parts = ('detail', self.script.id, page_cache.get_script_version(self.script.id))
+
+        page_cache.cached_page_data(self.user, parts, builder)
+        page_cache.cached_page_data(self.user, parts, builder)
+        self.assertEqual(builder.call_count, 1)
+
+        access.bump_user_versions([self.user.pk])
+        self.assertEqual(page_cache.cached_page_data(self.user, parts, builder), {'page': 1})
+        self.assertEqual(builder.call_count, 2)
+
+
+class KeysetPaginationTests(TestCase):
+    """Курсорная пагинация: порядок, переходы назад, одинаковые значения ключа"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', password='owner')
+        cls.script = create_script(cls.user)
+        started_at = timezone.now()
+        ScriptRun.objects.bulk_create([
+            # По три запуска с одним временем: порядок внутри - по id
+            ScriptRun(script=cls.script, started_by=cls.user, status='completed')
+            for _ in range(11)
+        ])
+        for index, script_run in enumerate(ScriptRun.objects.order_by('id')):
+            ScriptRun.objects.filter(id=script_run.id).update(
+                started_at=started_at - timedelta(minutes=index // 3)
+            )
+        cls.expected = list(ScriptRun.objects.order_by('-started_at', '-id').values_list('id', flat=True))
+
+    def paginate(self, cursor=None):
+        return paginate_keyset(ScriptRun.objects.all(), fields=('started_at', 'id'), cursor=cursor, per_page=4)
+
+    def test_forward_pages_cover_all_rows_once(self):
+        ids, pages = [], []
+        page = self.paginate()
+        while True:
+            pages.append(page)
+            ids.extend(run.id for run in page)
+            if not page.has_next:
+                break
+            page = self.paginate(page.next_cursor)
+
+        self.assertEqual(ids, self.expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[-1].has_previous)
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.paginate()
+        second = self.paginate(first.next_cursor)
+        third = self.paginate(second.next_cursor)
+
+        back = self.paginate(third.previous_cursor)
+        self.assertEqual([run.id for run in back], [run.id for run in second])
+        self.assertTrue(back.has_next)
+        self.assertTrue(back.has_previous)
+        self.assertEqual([run.id for run in self.paginate(back.previous_cursor)], [run.id for run in first])
+
+    def test_invalid_cursor_returns_first_page(self):
+        for cursor in ('not-a-cursor', 'eyJkIjogIngifQ'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual([run.id for run in self.paginate(cursor)], self.expected[:4])
+
+    def test_capped_count(self):
+        self.assertEqual(capped_count(ScriptRun.objects.all(), 20), (11, False))
+        self.assertEqual(capped_count(ScriptRun.objects.all(), 5), (5, True))
+
+    @override_settings(HISTORY_TOTAL_CAP=5)
+    def test_history_shows_capped_total(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('scripts:history'))
+        self.assertEqual(response.context['page_obj'].approximate_total, 5)
+        self.assertContains(response, 'более чем 5')
+
+    def test_capped_counts_in_one_query(self):
+        runs = ScriptRun.objects.all()
+        ScriptRun.objects.filter(id__in=self.expected[:2]).update(status='failed')
+        with self.assertNumQueries(1):
+            counts = capped_counts({'all': runs, 'failed': runs.filter(status='failed')}, 5)
+        self.assertEqual(counts, {'all': (5, True), 'failed': (2, False)})
+
+    @override_settings(HISTORY_TOTAL_CAP=100)
+    def test_history_summary_covers_all_runs(self):
+        ScriptRun.objects.filter(id__in=self.expected[-3:]).update(status='failed')
+        ScriptRun.objects.filter(id=self.expected[-4]).update(status='queued')
+        cache.clear()
+        self.client.force_login(self.user)
+
+        # Сводка одинакова на любой странице и не ограничена ее 20 запусками
+        totals = self.client.get(reverse('scripts:history')).context['status_totals']
+        self.assertEqual(
+            {name: total['count'] for name, total in totals.items()},
+            {'all': 11, 'completed': 7, 'active': 1, 'failed': 3}
+        )
+
+
+class RunVacanciesTotalTests(ParserPersistenceTestCase):
+    """Общее количество вакансий на странице запуска"""
+
+    def test_active_run_total_counted_until_counters_are_filled(self):
+        self.client.force_login(self.user)
+        script_run, _, _ = self.persist([make_record('1'), make_record('2')])
+        response = self.client.get(reverse('scripts:vacancies', args=[script_run.id]))
+        self.assertEqual(response.context['page_obj'].approximate_total, 2)
+
+        ScriptRun.objects.filter(id=script_run.id).update(status='completed', total_found=2)
+        cache.clear()
+        response = self.client.get(reverse('scripts:vacancies', args=[script_run.id]))
+        self.assertEqual(response.context['page_obj'].approximate_total, 2)
+
+
+class ApiConditionalRequestTests(ParserPersistenceTestCase):
+    """ETag списков API меняется вместе с данными, иначе - 304"""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def assert_not_modified(self, url, etag):
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+    def assert_modified(self, url, etag):
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_runs_etag_changes_with_status(self):
+        script_run = self.start_run()
+        url = reverse('api-v1:run-list')
+        etag = self.get(url)['ETag']
+        self.assert_not_modified(url, etag)
+
+        script_run.status = 'failed'
+        script_run.save()
+        self.assert_modified(url, etag)
+
+    def test_unfiltered_list_etag_needs_no_queries_over_data(self):
+        self.persist([make_record('1')])
+        url = reverse('api-v1:vacancy-list')
+        etag = self.get(url)['ETag']
+        # Сессия и пользователь; ETag - из версий в кэше, без агрегатов по таблицам
+        with self.assertNumQueries(2):
+            self.assert_not_modified(url, etag)
+
+        self.persist([make_record('2')])
+        self.assert_modified(url, etag)
+
+    def test_run_vacancies_etag_ignores_other_runs_of_script(self):
+        script_run, _, _ = self.persist([make_record('1'), make_record('2')])
+        url = reverse('api-v1:vacancy-run-list') + f'?run={script_run.id}'
+        etag = self.get(url)['ETag']
+
+        # Другой запуск того же скрипта находит новую вакансию - этот запуск не изменился
+        self.persist([make_record('3')])
+        self.assert_not_modified(url, etag)
+
+    def test_run_vacancies_etag_changes_while_run_is_in_progress(self):
+        script_run = self.start_run()
+        parser = HHVacancyParserDjango(script_run)
+        url = reverse('api-v1:vacancy-run-list') + f'?run={script_run.id}'
+        with mock.patch.object(parser, 'log'):
+            parser.persist_batch([make_record('1')])
+            etag = self.get(url)['ETag']
+            self.assert_not_modified(url, etag)
+
+            parser.persist_batch([make_record('2')])
+        etag = self.assert_modified(url, etag)
+        self.assertEqual(self.get(url).json()['results'][0]['vacancy']['external_id'], '2')
+        self.assert_not_modified(url, etag)
+
+    def test_vacancies_etag_changes_on_repeat_sighting_and_edit(self):
+        self.persist([make_record('1')])
+        url = reverse('api-v1:vacancy-list') + f'?script={self.script.id}'
+        etag = self.get(url)['ETag']
+        self.assert_not_modified(url, etag)
+
+        # Повторное обнаружение в другом запуске: счетчики вакансии изменились
+        self.persist([make_record('1')])
+        etag = self.assert_modified(url, etag)
+
+        # Правка в админке
+        vacancy = Vacancy.objects.get(external_id='1')
+        vacancy.title = 'Инженер по охране труда'
+        vacancy.save()
+        self.assert_modified(url, etag)
+
+
+class RunQueueTests(ParserPersistenceTestCase):
+    """Статусы запусков в очереди и восстановление после перезапуска"""
+
+    def queue_run(self, **fields):
+        return ScriptRun.objects.create(script=self.script, started_by=self.user, status='queued', **fields)
+
+    @mock.patch('scripts.views.enqueue_runs')
+    def test_run_waits_in_queue_and_blocks_repeated_start(self, enqueue_runs):
+        self.client.force_login(self.user)
+        url = reverse('scripts:run', args=[self.script.id])
+
+        run_id = self.client.post(url).json()['run_id']
+        self.assertEqual(ScriptRun.objects.get(id=run_id).status, 'queued')
+        enqueue_runs.assert_called_once()
+
+        response = self.client.post(url).json()
+        self.assertFalse(response['success'])
+        self.assertEqual(ScriptRun.objects.filter(script=self.script).count(), 1)
+
+    @mock.patch.object(HHVacancyParserDjango, 'run', autospec=True)
+    def test_worker_claims_queued_run_once(self, run):
+        script_run = self.queue_run()
+        queued_at = script_run.started_at
+
+        version = page_cache.get_script_version(self.script.id)
+
+        runner.execute_run(script_run.id)
+        script_run.refresh_from_db()
+        self.assertEqual(script_run.status, 'running')
+        # Страницы скрипта, закэшированные со статусом queued, устарели
+        self.assertNotEqual(page_cache.get_script_version(self.script.id), version)
+        self.assertGreater(script_run.started_at, queued_at)
+        run.assert_called_once()
+
+        # Повторная выборка того же запуска (или удаленного) ничего не выполняет
+        runner.execute_run(script_run.id)
+        script_run.delete()
+        runner.execute_run(script_run.id)
+        run.assert_called_once()
+
+    @mock.patch('scripts.runner.enqueue_runs')
+    def test_orphaned_runs_recovered_after_restart(self, enqueue_runs):
+        interrupted = self.start_run()
+        waiting = self.queue_run()
+        restarted_at = timezone.now()
+        current = self.queue_run()
+        version = page_cache.get_script_version(self.script.id)
+
+        self.assertEqual(runner.recover_orphaned_runs(before=restarted_at), (1, 1))
+        self.assertNotEqual(page_cache.get_script_version(self.script.id), version)
+
+        interrupted.refresh_from_db()
+        self.assertEqual(interrupted.status, 'failed')
+        self.assertEqual(interrupted.error_message, runner.ORPHANED_RUN_ERROR)
+        self.assertIsNotNone(interrupted.completed_at)
+        enqueue_runs.assert_called_once_with([waiting])
+        current.refresh_from_db()
+        self.assertEqual(current.status, 'queued')
+
+    def test_recovery_on_start_enabled_only_explicitly(self):
+        # Иначе каждый процесс сервера считал бы запуски остальных осиротевшими
+        runner.connect_recovery()
+        self.assertFalse(request_started.disconnect(dispatch_uid=runner.RECOVERY_DISPATCH_UID))
+
+        with self.settings(SCRIPT_RUNNER_RECOVER_ON_START=True):
+            runner.connect_recovery()
+        self.assertTrue(request_started.disconnect(dispatch_uid=runner.RECOVERY_DISPATCH_UID))
+
+
+class MetricsAccessTests(TestCase):
+    """/metrics закрыт по умолчанию: токен или сотрудник"""
+
+    def get(self, **headers):
+        return self.client.get(reverse('metrics'), **headers).status_code
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOW_ANONYMOUS=False)
+    def test_anonymous_and_regular_users_rejected_by_default(self):
+        self.assertEqual(self.get(), 401)
+        self.client.force_login(User.objects.create_user(username='user'))
+        self.assertEqual(self.get(), 401)
+
+        self.client.force_login(User.objects.create_user(username='staff', is_staff=True))
+        self.assertEqual(self.get(), 200)
+
+    @override_settings(METRICS_TOKEN='secret', METRICS_ALLOW_ANONYMOUS=False)
+    def test_token_required_without_session(self):
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer wrong'), 401)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer secret'), 200)
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOW_ANONYMOUS=True)
+    def test_anonymous_access_when_explicitly_enabled(self):
+        self.assertEqual(self.get(), 200)
+
+
+def serve_fake_hh(test, **options):
+    """Заглушка API hh.ru (benchmarks/fake_hh.py) на время теста"""
+    options.setdefault('found', 450)
+    server = FakeHHServer(FakeHH(**options)).start()
+    test.addCleanup(server.stop)
+    return server
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/vacancies'
+
+
+class FetchPipelineTests(SimpleTestCase):
+    """Загрузка страниц в общем цикле: порядок, ошибки, остановка"""
+
+    CLIENTS = {
+        'httpx': fetch.create_client,
+        'requests': lambda: fetch._ThreadedRequestsClient(4),
+    }
+
+    def start_loop(self, client_factory=fetch.create_client):
+        fetch_loop = fetch.FetchLoop(client_factory)
+        self.addCleanup(fetch_loop.close)
+        return fetch_loop
+
+    def pages(self, url, queries, fetch_loop, engine='async', params_for=None, **options):
+        return fetch.iter_search_pages(
+            url, {}, queries,
+            params_for or (lambda query, page: {'text': query, 'page': page, 'per_page': fetch.PER_PAGE}),
+            20, engine=engine, limiter=fetch.RateLimiter(0), fetch_loop=fetch_loop, **options
+        )
+
+    def test_pages_yielded_in_order(self):
+        server = serve_fake_hh(self, latency_ms=5, jitter_ms=5)
+        expected = [(query, page) for query in ('a', 'b') for page in range(5)]
+        for client, client_factory in self.CLIENTS.items():
+            if client == 'httpx' and fetch.httpx is None:
+                continue
+            fetch_loop = self.start_loop(client_factory)
+            for engine in ('sync', 'async'):
+                with self.subTest(client=client, engine=engine):
+                    results = list(self.pages(server.url, ['a', 'b'], fetch_loop, engine=engine))
+                    self.assertEqual([(result.query, result.page) for result in results], expected)
+                    self.assertEqual([len(result.data.items) for result in results], [100] * 4 + [50] + [100] * 4 + [50])
+
+    def test_failed_page_ends_query(self):
+        fetch_loop = self.start_loop()
+        server = serve_fake_hh(self, error_rate=1.0)
+        for engine in ('sync', 'async'):
+            with self.subTest(engine=engine):
+                results = list(self.pages(server.url, ['a', 'b'], fetch_loop, engine=engine))
+                self.assertEqual([(result.query, result.status_code) for result in results], [('a', 503), ('b', 503)])
+
+        results = list(self.pages(closed_port_url(), ['a'], fetch_loop))
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0].error)
+        self.assertTrue(fetch.is_last_page(results[0]))
+
+    def test_producer_error_raised_to_consumer(self):
+        server = serve_fake_hh(self)
+
+        def params_for(query, page):
+            raise ValueError('bad params')
+
+        with self.assertRaisesMessage(ValueError, 'bad params'):
+            list(self.pages(server.url, ['a'], self.start_loop(), params_for=params_for))
+
+    def test_closing_consumer_stops_fetching(self):
+        server = serve_fake_hh(self, found=2000, latency_ms=5)
+        pages = self.pages(server.url, ['a'], self.start_loop(), buffer_pages=2, concurrency=2)
+        next(pages)
+        pages.close()
+        time.sleep(0.1)
+        requests_made = server.fake.stats['requests']
+        time.sleep(0.1)
+        self.assertEqual(server.fake.stats['requests'], requests_made)
+        self.assertLess(requests_made, 10)
+
+    def test_concurrent_runs_share_loop_and_client(self):
+        server = serve_fake_hh(self, latency_ms=5)
+        client_factory = mock.Mock(side_effect=fetch.create_client)
+        fetch_loop = self.start_loop(client_factory)
+        counts = {}
+
+        def consume(query):
+            counts[query] = sum(1 for _ in self.pages(server.url, [query], fetch_loop))
+
+        workers = [threading.Thread(target=consume, args=(query,)) for query in ('a', 'b', 'c')]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(counts, {'a': 5, 'b': 5, 'c': 5})
+        # Один клиент (пул соединений) на все запуски
+        client_factory.assert_called_once()
+
+
+class ParserFetchTests(ParserPersistenceTestCase):
+    """Запуск парсера целиком на заглушке API"""
+
+    def run_parser(self, server, engine='async'):
+        script_run = self.start_run()
+        with override_settings(HH_API_URL=server.url, HH_REQUEST_DELAY=0, HH_FETCH_ENGINE=engine):
+            parser = HHVacancyParserDjango(script_run)
+        parser.rate_limiter = fetch.RateLimiter(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser.run()
+        script_run.refresh_from_db()
+        return script_run
+
+    def test_run_saves_vacancies_from_all_pages(self):
+        self.script.search_queries = ['Охрана труда', 'Инженер по охране труда']
+        self.script.save()
+        server = serve_fake_hh(self, latency_ms=2)
+
+        for engine in ('sync', 'async'):
+            with self.subTest(engine=engine):
+                script_run = self.run_parser(server, engine)
+                self.assertEqual(script_run.status, 'completed')
+                self.assertFalse(script_run.is_truncated)
+                self.assertEqual(
+                    [stats['pages_fetched'] for stats in script_run.queries_stats.values()], [5, 5]
+                )
+                self.assertGreater(script_run.total_found, 0)
+                self.assertEqual(script_run.vacancy_runs.count(), script_run.total_found)
+
+    def test_api_errors_mark_run_truncated(self):
+        script_run = self.run_parser(serve_fake_hh(self, error_rate=1.0))
+        self.assertEqual(script_run.status, 'completed')
+        self.assertTrue(script_run.is_truncated)
+        self.assertEqual(script_run.total_found, 0)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    """Кэш ответов API: срок жизни, проверка по ETag, вытеснение давно не использованных"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'hh_cache.sqlite3')
+        self.server = serve_fake_hh(self, found=250)
+        self.fetch_loop = fetch.FetchLoop()
+        self.addCleanup(self.fetch_loop.close)
+
+    def fetch(self, cache):
+        return list(fetch.iter_search_pages(
+            self.server.url, {}, ['a'],
+            lambda query, page: {'text': query, 'page': page, 'per_page': fetch.PER_PAGE},
+            20, limiter=fetch.RateLimiter(0), cache=cache, fetch_loop=self.fetch_loop
+        ))
+
+    def test_fresh_responses_served_without_requests(self):
+        cache = ResponseCache(self.path, ttl=60, max_bytes=2 ** 20)
+        first = self.fetch(cache)
+        self.assertEqual([result.cache for result in first], ['miss'] * 3)
+        self.assertEqual(self.server.fake.stats['requests'], 3)
+
+        second = self.fetch(cache)
+        self.assertEqual([result.cache for result in second], ['hit'] * 3)
+        self.assertEqual(self.server.fake.stats['requests'], 3)
+        self.assertEqual(
+            [len(result.data.items) for result in second], [len(result.data.items) for result in first]
+        )
+
+    def test_stale_responses_revalidated_by_etag(self):
+        self.fetch(ResponseCache(self.path, ttl=60, max_bytes=2 ** 20))
+
+        # Тот же файл кэша, но все ответы устарели
+        stale = ResponseCache(self.path, ttl=0, max_bytes=2 ** 20)
+        results = self.fetch(stale)
+        self.assertEqual([result.cache for result in results], ['revalidated'] * 3)
+        self.assertEqual(self.server.fake.stats['not_modified'], 3)
+        self.assertEqual([len(result.data.items) for result in results], [100, 100, 50])
+
+        # Подтвержденный ответ снова свежий
+        results = self.fetch(ResponseCache(self.path, ttl=60, max_bytes=2 ** 20))
+        self.assertEqual([result.cache for result in results], ['hit'] * 3)
+
+    def test_least_recently_used_responses_evicted(self):
+        cache = ResponseCache(self.path, ttl=60, max_bytes=2500)
+        body = {key: os.urandom(1000) for key in 'abc'}
+        clock = iter(range(1, 100))
+        with mock.patch('scripts.response_cache.time.time', side_effect=lambda: next(clock)):
+            cache.put('a', body['a'])
+            cache.put('b', body['b'])
+            self.assertEqual(cache.get('a').body, body['a'])  # a использован позже b
+            cache.put('c', body['c'])
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a').body, body['a'])
+        self.assertEqual(cache.get('c').body, body['c'])
+        self.assertLessEqual(cache.stats()['size_bytes'], 2500)
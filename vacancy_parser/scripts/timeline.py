@@ -0,0 +1,137 @@
+"""
+Хронология выполнения запуска
+
+Легковесные интервалы (spans): время начала относительно старта запуска,
+длительность и количество SQL-запросов внутри интервала. Запросы считаются
+через connection.execute_wrapper, пока хронология активна. Результат
+сохраняется в ScriptRun.timeline:
+
+    {
+        "total_ms": 1234.5,
+        "db_queries": 87,
+        "spans": [{"name": "page", "start_ms": 10.1, "duration_ms": 350.2,
+                   "db_queries": 1, "depth": 2, "attrs": {"page": 1}}, ...],
+        "totals": {"page": {"count": 20, "duration_ms": 7000.0, "db_queries": 20}, ...}
+    }
+
+Частые мелкие операции (например, запись строки лога) учитываются только
+в totals (detail=False), чтобы не раздувать список интервалов.
+"""
+
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+# Максимальное количество подробных интервалов; дальше - только итоги
+MAX_SPANS = 1000
+
+
+class Timeline:
+    """Сборщик интервалов выполнения одного запуска"""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._depth = 0
+        self.db_queries = 0
+        self.spans = []
+        self.totals = {}
+        self.dropped_spans = 0
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.db_queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def activate(self):
+        """Включает подсчет SQL-запросов текущего соединения"""
+        with connection.execute_wrapper(self._count_query):
+            yield self
+
+    def _elapsed_ms(self, moment=None):
+        return ((moment or time.perf_counter()) - self._started) * 1000
+
+    @contextmanager
+    def span(self, name, detail=True, **attrs):
+        """Интервал выполнения
+
+        Args:
+            name: Название фазы (search, query, page, filter, persist, ...)
+            detail: False - учитывать только в итогах по фазе
+            **attrs: Атрибуты интервала (запрос, номер страницы и т.п.);
+                     можно дополнять через возвращаемый словарь
+        """
+        started = time.perf_counter()
+        queries_before = self.db_queries
+        self._depth += 1
+        depth = self._depth
+        try:
+            yield attrs
+        finally:
+            self._depth -= 1
+            self._add(name, started, (time.perf_counter() - started) * 1000,
+                      self.db_queries - queries_before, depth, detail, attrs)
+
+    def record(self, name, started, duration_ms, detail=True, **attrs):
+        """Интервал, измеренный вне span (например, запрос из корутины)
+
+        Записывается вложенным в текущий открытый интервал.
+
+        Args:
+            started: time.perf_counter() начала интервала
+            duration_ms: Длительность, мс
+        """
+        self._add(name, started, duration_ms, 0, self._depth + 1, detail, attrs)
+
+    def _add(self, name, started, duration_ms, db_queries, depth, detail, attrs):
+        total = self.totals.setdefault(name, {'count': 0, 'duration_ms': 0.0, 'db_queries': 0})
+        total['count'] += 1
+        total['duration_ms'] += duration_ms
+        total['db_queries'] += db_queries
+
+        if detail:
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append({
+                    'name': name,
+                    'start_ms': round(self._elapsed_ms(started), 1),
+                    'duration_ms': round(duration_ms, 1),
+                    'db_queries': db_queries,
+                    'depth': depth,
+                    'attrs': attrs,
+                })
+            else:
+                self.dropped_spans += 1
+
+    def to_dict(self):
+        """Данные для сохранения в ScriptRun.timeline"""
+        data = {
+            'total_ms': round(self._elapsed_ms(), 1),
+            'db_queries': self.db_queries,
+            'spans': sorted(self.spans, key=lambda span: (span['start_ms'], span['depth'])),
+            'totals': {
+                name: {**total, 'duration_ms': round(total['duration_ms'], 1)}
+                for name, total in self.totals.items()
+            },
+        }
+        if self.dropped_spans:
+            data['dropped_spans'] = self.dropped_spans
+        return data
+
+
+def timeline_rows(timeline, max_depth=2):
+    """Интервалы хронологии для отображения полосами (смещение и ширина в процентах)"""
+    total_ms = (timeline or {}).get('total_ms') or 0
+    if not total_ms:
+        return []
+    rows = []
+    for span in timeline.get('spans', []):
+        if span['depth'] > max_depth:
+            continue
+        rows.append({
+            **span,
+            'label': ', '.join(f'{key}={value}' for key, value in span.get('attrs', {}).items()),
+            'left_pct': round(span['start_ms'] / total_ms * 100, 2),
+            'width_pct': max(round(span['duration_ms'] / total_ms * 100, 2), 0.3),
+        })
+    return rows
@@ -8,8 +8,11 @@ urlpatterns = [
     path('<int:script_id>/', views.script_detail_view, name='detail'),
     path('<int:script_id>/run/', views.run_script_view, name='run'),
     path('<int:script_id>/export/', views.export_vacancies_excel, name='export_excel'),
+    path('run/bulk/', views.bulk_run_scripts_view, name='bulk_run'),
     path('run/<int:run_id>/status/', views.script_status_view, name='status'),
     path('run/<int:run_id>/vacancies/', views.vacancies_view, name='vacancies'),
     path('run/<int:run_id>/delete/', views.delete_script_run_view, name='delete_run'),
     path('history/', views.script_history_view, name='history'),
+    path('search/', views.search_view, name='search'),
+    path('search/api/', views.search_api_view, name='search_api'),
 ]
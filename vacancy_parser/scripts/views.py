@@ -2,49 +2,71 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.views.decorators.http import require_http_methods, require_POST
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery, Sum
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+import hmac
 import zoneinfo
 from .models import Script, ScriptRun, Vacancy, VacancyRun
-from .parser import HHVacancyParserDjango
+from .access import get_access_version, get_accessible_scripts_for_user
+from .runner import enqueue_runs
+from . import metrics, search
+from .pagination import capped_count, capped_counts, paginate_keyset
+from .page_cache import bump_script_versions, cached_page_data, get_runs_version, get_script_version
 import json
-import threading
 import datetime
 
 
-def get_accessible_scripts_for_user(user, is_active=True):
-    """
-    Возвращает queryset скриптов, к которым у пользователя есть доступ
-    """
-    if not user.is_authenticated:
-        return Script.objects.none()
-    
-    if user.is_superuser:
-        # Суперпользователь видит все скрипты
-        if is_active is None:
-            return Script.objects.all()
-        return Script.objects.filter(is_active=is_active)
-    
-    # Обычный пользователь видит:
-    # 1. Созданные им скрипты
-    # 2. Скрипты, в которых он указан в allowed_users
-    query = Q(created_by=user) | Q(allowed_users=user)
-    
-    if is_active is None:
-        return Script.objects.filter(query).distinct()
-    
-    return Script.objects.filter(query, is_active=is_active).distinct()
+# Количество результатов поиска на странице
+SEARCH_PAGE_SIZE = 20
+
+# Максимальное количество скриптов в одном запросе массового запуска
+BULK_RUN_LIMIT = 200
+
+# Время жизни кэша меню скриптов (инвалидация - по версии прав доступа)
+MENU_CACHE_TIMEOUT = 60 * 60
+
+# Количество вакансий каждого типа, показываемых на странице скрипта
+DETAIL_VACANCIES_PREVIEW = 5
+
+# Размер пачки id при удалении вакансий
+DELETE_BATCH_SIZE = 500
+
+# Пока запуск выполняется, его счетчики вакансий еще не заполнены - считаем
+# связи запуска не дальше этого числа
+ACTIVE_RUN_TOTAL_CAP = 1000
+
+# Группы статусов в сводке истории запусков
+HISTORY_STATUS_GROUPS = {
+    'completed': ('completed',),
+    'active': ScriptRun.ACTIVE_STATUSES,
+    'failed': ('failed', 'error'),
+}
+
+
+def _get_user_scripts_menu(user):
+    """Первые 10 активных скриптов пользователя для меню (кэшируется до изменения прав/скриптов)"""
+    key = f'scripts_menu:{user.pk}:{get_access_version(user)}'
+    menu = cache.get(key)
+    if menu is None:
+        menu = list(get_accessible_scripts_for_user(user, is_active=True).order_by('name')[:10])
+        cache.set(key, menu, MENU_CACHE_TIMEOUT)
+    return menu
 
 
 def get_user_scripts_context(request):
-    """Контекст-процессор для передачи скриптов пользователя в шаблоны"""
+    """Контекст-процессор для передачи скриптов пользователя в шаблоны
+
+    Меню вычисляется лениво: запрос выполняется, только если шаблон обращается к user_scripts_menu.
+    """
     if request.user.is_authenticated:
-        user_scripts = get_accessible_scripts_for_user(request.user, is_active=True).order_by('name')[:10]
-        return {'user_scripts_menu': user_scripts}
+        return {'user_scripts_menu': SimpleLazyObject(lambda: _get_user_scripts_menu(request.user))}
     return {}
 
 
@@ -62,7 +84,7 @@ def home_view(request):
     user_scripts = get_accessible_scripts_for_user(request.user, is_active=True)
     recent_runs = ScriptRun.objects.filter(
         script__in=user_scripts
-    ).order_by('-started_at')[:5]
+    ).select_related('script').order_by('-started_at')[:5]
     
     # Получаем запуски за сегодня
     # Используем локальную дату для определения сегодняшнего дня
@@ -85,11 +107,14 @@ def home_view(request):
     ).count()
     
     # Получаем статистику новых вакансий из последних запусков каждого скрипта
-    new_vacancies_total = 0
-    for script in user_scripts:
-        last_run = script.runs.filter(status='completed').order_by('-started_at').first()
-        if last_run:
-            new_vacancies_total += last_run.new_vacancies or 0
+    # (одним запросом: последний завершенный запуск - подзапросом по скрипту)
+    last_completed_run = ScriptRun.objects.filter(
+        script=OuterRef('pk'),
+        status='completed'
+    ).order_by('-started_at').values('new_vacancies')[:1]
+    new_vacancies_total = user_scripts.annotate(
+        last_new_vacancies=Subquery(last_completed_run)
+    ).aggregate(total=Sum('last_new_vacancies'))['total'] or 0
     
     # Получаем общее количество уникальных вакансий за всю историю
     total_vacancies = Vacancy.objects.filter(
@@ -128,26 +153,35 @@ def script_detail_view(request, script_id):
     # Получаем последний запуск
     last_run = script.runs.order_by('-started_at').first()
     
-    # Получаем вакансии из последнего запуска
-    new_vacancy_runs = []
-    old_vacancy_runs = []
-    
-    if last_run:
-        new_vacancy_runs = last_run.vacancy_runs.filter(is_new_in_run=True).select_related('vacancy').order_by('-found_at')
-        old_vacancy_runs = last_run.vacancy_runs.filter(is_new_in_run=False).select_related('vacancy').order_by('-found_at')
-    
-    # Получаем общую статистику по всем вакансиям скрипта
-    all_vacancies = script.vacancies.all()
-    active_vacancies = all_vacancies.filter(is_active=True)
-    
-    context = {
-        'script': script,
-        'last_run': last_run,
-        'new_vacancy_runs': new_vacancy_runs,
-        'old_vacancy_runs': old_vacancy_runs,
-        'total_vacancies': all_vacancies.count(),
-        'active_vacancies_count': active_vacancies.count(),
-    }
+    def build_data():
+        # Получаем вакансии из последнего запуска (на странице показываются первые 5)
+        data = {
+            'new_vacancy_runs': [],
+            'old_vacancy_runs': [],
+            'new_vacancy_runs_count': 0,
+            'old_vacancy_runs_count': 0,
+        }
+        if last_run:
+            for prefix, is_new in (('new', True), ('old', False)):
+                vacancy_runs = last_run.vacancy_runs.filter(is_new_in_run=is_new)
+                data[f'{prefix}_vacancy_runs'] = list(
+                    vacancy_runs.select_related('vacancy').order_by('-found_at')[:DETAIL_VACANCIES_PREVIEW]
+                )
+                data[f'{prefix}_vacancy_runs_count'] = vacancy_runs.count()
+        
+        # Получаем общую статистику по всем вакансиям скрипта
+        data['total_vacancies'] = script.vacancies.count()
+        data['active_vacancies_count'] = script.vacancies.filter(is_active=True).count()
+        return data
+    
+    # Пока запуск выполняется, данные меняются - не кэшируем
+    context = cached_page_data(
+        request.user,
+        ('detail', script.id, get_script_version(script.id), last_run.id if last_run else None),
+        build_data,
+        cacheable=last_run is None or last_run.status not in ScriptRun.ACTIVE_STATUSES
+    )
+    context.update({'script': script, 'last_run': last_run})
     return render(request, 'scripts/detail.html', context)
 
 
@@ -155,40 +189,39 @@ def script_detail_view(request, script_id):
 def run_script_view(request, script_id):
     """Запуск скрипта"""
     if request.method == 'POST':
-        # Получаем скрипт с проверкой доступа
-        accessible_scripts = get_accessible_scripts_for_user(request.user, is_active=True)
-        script = get_object_or_404(accessible_scripts, id=script_id)
-        
-        # Дополнительная проверка доступа через метод модели
-        if not script.has_access(request.user):
-            return JsonResponse({
-                'success': False, 
-                'error': 'У вас нет доступа к этому скрипту'
-            })
-        
-        # Проверяем, нет ли активных запусков
-        active_run = script.runs.filter(status='running').first()
-        if active_run:
-            return JsonResponse({
-                'success': False, 
-                'error': 'Скрипт уже выполняется'
-            })
-        
-        # Создаем новый запуск
-        script_run = ScriptRun.objects.create(
-            script=script,
-            started_by=request.user,
-            status='running'
-        )
-        
-        # Запускаем парсер в отдельном потоке
-        def run_parser():
-            parser = HHVacancyParserDjango(script_run)
-            parser.run()
+        # Проверка активных запусков и создание нового - в одной транзакции
+        # под блокировкой строки скрипта: одновременные запросы запуска того же
+        # скрипта выполняются по очереди, и второй увидит запуск первого
+        with transaction.atomic():
+            # Получаем скрипт с проверкой доступа
+            accessible_scripts = get_accessible_scripts_for_user(request.user, is_active=True)
+            script = get_object_or_404(accessible_scripts.select_for_update(), id=script_id)
+            
+            # Дополнительная проверка доступа через метод модели
+            if not script.has_access(request.user):
+                return JsonResponse({
+                    'success': False, 
+                    'error': 'У вас нет доступа к этому скрипту'
+                })
+            
+            # Проверяем, нет ли активных (ожидающих или выполняющихся) запусков
+            active_run = script.runs.filter(status__in=ScriptRun.ACTIVE_STATUSES).first()
+            if active_run:
+                return JsonResponse({
+                    'success': False, 
+                    'error': 'Скрипт уже выполняется'
+                })
+            
+            # Создаем новый запуск; статус running он получит, когда его возьмет поток очереди
+            script_run = ScriptRun.objects.create(
+                script=script,
+                started_by=request.user,
+                status='queued'
+            )
         
-        thread = threading.Thread(target=run_parser)
-        thread.daemon = True
-        thread.start()
+        # Передаем запуск в очередь выполнения
+        bump_script_versions([script.id])
+        enqueue_runs([script_run])
         
         return JsonResponse({
             'success': True, 
@@ -199,6 +232,82 @@ def run_script_view(request, script_id):
     return JsonResponse({'success': False, 'error': 'Неправильный метод запроса'})
 
 
+@require_POST
+@login_required
+def bulk_run_scripts_view(request):
+    """Массовый запуск скриптов
+    
+    Принимает JSON {"script_ids": [1, 2, 3]} или форму с полями script_ids.
+    Доступ и активные запуски проверяются одним запросом на все скрипты,
+    запуски создаются через bulk_create в той же транзакции и после ее
+    завершения ставятся в очередь выполнения.
+    """
+    if request.content_type == 'application/json':
+        try:
+            raw_ids = json.loads(request.body or b'{}').get('script_ids', [])
+        except (json.JSONDecodeError, AttributeError):
+            return JsonResponse({'success': False, 'error': 'Некорректный JSON'}, status=400)
+    else:
+        raw_ids = request.POST.getlist('script_ids')
+    
+    try:
+        script_ids = list(dict.fromkeys(int(script_id) for script_id in raw_ids))
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'script_ids должен быть списком чисел'}, status=400)
+    if not script_ids:
+        return JsonResponse({'success': False, 'error': 'Не переданы скрипты для запуска'}, status=400)
+    if len(script_ids) > BULK_RUN_LIMIT:
+        return JsonResponse({
+            'success': False,
+            'error': f'Можно запустить не больше {BULK_RUN_LIMIT} скриптов за раз'
+        }, status=400)
+    
+    # Проверка и создание запусков - в одной транзакции под блокировкой строк
+    # скриптов (в SQLite - под блокировкой записи транзакции IMMEDIATE), иначе
+    # одновременные запросы с общими скриптами создадут по активному запуску
+    with transaction.atomic():
+        accessible_ids = set(
+            get_accessible_scripts_for_user(request.user, is_active=True)
+            .filter(id__in=script_ids)
+            .order_by('id')
+            .select_for_update()
+            .values_list('id', flat=True)
+        )
+        running_ids = set(
+            ScriptRun.objects.filter(script_id__in=accessible_ids, status__in=ScriptRun.ACTIVE_STATUSES)
+            .values_list('script_id', flat=True)
+        )
+        
+        skipped = []
+        to_start = []
+        for script_id in script_ids:
+            if script_id not in accessible_ids:
+                skipped.append({'script_id': script_id, 'error': 'Скрипт не найден или нет доступа'})
+            elif script_id in running_ids:
+                skipped.append({'script_id': script_id, 'error': 'Скрипт уже выполняется'})
+            else:
+                to_start.append(script_id)
+        
+        script_runs = ScriptRun.objects.bulk_create([
+            ScriptRun(script_id=script_id, started_by=request.user, status='queued')
+            for script_id in to_start
+        ])
+    
+    if script_runs:
+        bump_script_versions(to_start)
+    enqueue_runs(script_runs)
+    
+    return JsonResponse({
+        'success': bool(script_runs),
+        'runs': [
+            {'script_id': script_run.script_id, 'run_id': script_run.id}
+            for script_run in script_runs
+        ],
+        'skipped': skipped,
+        'message': f'Запущено скриптов: {len(script_runs)}'
+    })
+
+
 @login_required
 def script_status_view(request, run_id):
     """Получение статуса выполнения скрипта"""
@@ -229,13 +338,37 @@ def script_history_view(request):
     accessible_scripts = get_accessible_scripts_for_user(request.user, is_active=None)
     runs = ScriptRun.objects.filter(
         script__in=accessible_scripts
-    ).order_by('-started_at')
+    ).select_related('script')
+    
+    cursor = request.GET.get('cursor')
+    total_cap = getattr(settings, 'HISTORY_TOTAL_CAP', 1000)
+    
+    def build_page():
+        # Общее количество и сводка по статусам - одним запросом, с ограничением
+        totals = {}
+        if total_cap > 0:
+            querysets = {'all': runs}
+            querysets.update({
+                group: runs.filter(status__in=statuses) for group, statuses in HISTORY_STATUS_GROUPS.items()
+            })
+            totals = {
+                name: {'count': count, 'capped': capped}
+                for name, (count, capped) in capped_counts(querysets, total_cap).items()
+            }
+        total = totals.get('all', {})
+        page_obj = paginate_keyset(
+            runs,
+            fields=('started_at', 'id'),
+            cursor=cursor,
+            per_page=20,
+            approximate_total=total.get('count'),
+            total_capped=total.get('capped', False)
+        )
+        return {'page_obj': page_obj, 'status_totals': totals}
     
-    paginator = Paginator(runs, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    context = cached_page_data(request.user, ('history', get_runs_version(), cursor), build_page)
     
-    return render(request, 'scripts/history.html', {'page_obj': page_obj})
+    return render(request, 'scripts/history.html', context)
 
 
 @login_required
@@ -244,7 +377,7 @@ def vacancies_view(request, run_id):
     # Получаем доступные скрипты и фильтруем запуск
     accessible_scripts = get_accessible_scripts_for_user(request.user, is_active=None)
     script_run = get_object_or_404(
-        ScriptRun, 
+        ScriptRun.objects.select_related('script'),
         id=run_id, 
         script__in=accessible_scripts
     )
@@ -256,27 +389,128 @@ def vacancies_view(request, run_id):
     
     vacancy_filter = request.GET.get('filter', 'all')
     
+    # Общее количество берем из счетчиков запуска, а не COUNT(*)
     if vacancy_filter == 'new':
         vacancy_runs = script_run.vacancy_runs.filter(is_new_in_run=True)
+        approximate_total = script_run.new_vacancies
     elif vacancy_filter == 'existing':
         vacancy_runs = script_run.vacancy_runs.filter(is_new_in_run=False)
+        approximate_total = script_run.existing_vacancies
     else:
         vacancy_runs = script_run.vacancy_runs.all()
-    
-    vacancy_runs = vacancy_runs.select_related('vacancy').order_by('-found_at')
-    
-    paginator = Paginator(vacancy_runs, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        approximate_total = script_run.total_found
+    
+    total_capped = False
+    if script_run.status in ScriptRun.ACTIVE_STATUSES:
+        # Счетчики запуска заполняются по его завершении
+        approximate_total, total_capped = capped_count(vacancy_runs, ACTIVE_RUN_TOTAL_CAP)
+    
+    cursor = request.GET.get('cursor')
+    page_obj = cached_page_data(
+        request.user,
+        ('vacancies', script_run.script_id, get_script_version(script_run.script_id),
+         script_run.id, vacancy_filter, cursor),
+        lambda: paginate_keyset(
+            vacancy_runs.select_related('vacancy'),
+            fields=('found_at', 'id'),
+            cursor=cursor,
+            per_page=50,
+            approximate_total=approximate_total,
+            total_capped=total_capped
+        ),
+        # Вакансии выполняющегося запуска еще добавляются
+        cacheable=script_run.status not in ScriptRun.ACTIVE_STATUSES
+    )
     
     context = {
         'script_run': script_run,
         'page_obj': page_obj,
         'current_filter': vacancy_filter,
+        'timeline_rows': script_run.get_timeline_rows(),
+        'timeline_totals': script_run.get_timeline_totals(),
     }
     return render(request, 'scripts/vacancies.html', context)
 
 
+def _search_vacancies_for_user(request):
+    """Общая часть поиска вакансий по всем доступным пользователю скриптам"""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    
+    script_ids = None
+    if not request.user.is_superuser:
+        script_ids = list(
+            get_accessible_scripts_for_user(request.user, is_active=None).values_list('id', flat=True)
+        )
+    return query, search.search_vacancies(query, script_ids=script_ids, page=page, per_page=SEARCH_PAGE_SIZE)
+
+
+@login_required
+def search_view(request):
+    """Полнотекстовый поиск вакансий"""
+    query, result = _search_vacancies_for_user(request)
+    context = {
+        'query': query,
+        'vacancies': result['results'],
+        'page': result['page'],
+        'has_next': result['has_next'],
+        'has_previous': result['page'] > 1,
+    }
+    return render(request, 'scripts/search.html', context)
+
+
+def _metrics_access_allowed(request) -> bool:
+    if getattr(settings, 'METRICS_ALLOW_ANONYMOUS', False) or request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    return bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    )
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus
+    
+    Доступны с заголовком Authorization: Bearer <METRICS_TOKEN> или сотрудникам
+    (is_staff). Без авторизации - только при METRICS_ALLOW_ANONYMOUS.
+    """
+    if not _metrics_access_allowed(request):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+def search_api_view(request):
+    """Полнотекстовый поиск вакансий (JSON)"""
+    query, result = _search_vacancies_for_user(request)
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'page': result['page'],
+        'has_next': result['has_next'],
+        'results': [
+            {
+                'id': vacancy.id,
+                'external_id': vacancy.external_id,
+                'title': vacancy.title,
+                'company': vacancy.company,
+                'salary': vacancy.salary,
+                'area_name': vacancy.area_name,
+                'url': vacancy.url,
+                'is_active': vacancy.is_active,
+                'script_id': vacancy.script_id,
+                'script_name': vacancy.script.name,
+                'rank': vacancy.rank,
+            }
+            for vacancy in result['results']
+        ]
+    })
+
+
 @login_required
 def export_vacancies_excel(request, script_id):
     """Экспорт вакансий в Excel с двумя листами"""
@@ -491,35 +725,35 @@ def delete_script_run_view(request, run_id):
             }, status=403)
         
         # Подсчитываем данные для статистики ПЕРЕД удалением
-        vacancy_runs_count = VacancyRun.objects.filter(script_run=script_run).count()
-        vacancy_ids = VacancyRun.objects.filter(script_run=script_run).values_list('vacancy_id', flat=True)
-        unique_vacancy_ids = set(vacancy_ids)
+        run_vacancy_links = VacancyRun.objects.filter(script_run=script_run)
+        vacancy_runs_count = run_vacancy_links.count()
         
-        # Проверяем, какие вакансии больше не связаны с другими запусками
-        vacancies_to_delete = []
-        for vacancy_id in unique_vacancy_ids:
-            # Проверяем, есть ли у вакансии другие запуски кроме текущего
-            other_runs_count = VacancyRun.objects.filter(
-                vacancy_id=vacancy_id
-            ).exclude(script_run=script_run).count()
-            
-            if other_runs_count == 0:
-                # Вакансия больше нигде не используется, можно удалить
-                vacancies_to_delete.append(vacancy_id)
+        # Вакансии, которые больше не связаны с другими запусками, - одним запросом
+        other_runs = VacancyRun.objects.filter(
+            vacancy_id=OuterRef('vacancy_id')
+        ).exclude(script_run=script_run)
+        vacancies_to_delete = list(
+            run_vacancy_links.filter(~Exists(other_runs)).values_list('vacancy_id', flat=True)
+        )
         
         script_name = script_run.script.name
         run_date = script_run.started_at
+        script_id = script_run.script_id
         
         # Удаляем данные в правильном порядке
-        # 1. Удаляем VacancyRun (связи между вакансиями и запусками)
-        VacancyRun.objects.filter(script_run=script_run).delete()
-        
-        # 2. Удаляем вакансии, которые больше не используются
-        if vacancies_to_delete:
-            Vacancy.objects.filter(id__in=vacancies_to_delete).delete()
-        
-        # 3. Удаляем сам запуск
-        script_run.delete()
+        with transaction.atomic():
+            # 1. Удаляем VacancyRun (связи между вакансиями и запусками)
+            run_vacancy_links.delete()
+            
+            # 2. Удаляем вакансии, которые больше не используются (пачками - лимит параметров SQLite)
+            for start in range(0, len(vacancies_to_delete), DELETE_BATCH_SIZE):
+                batch_ids = vacancies_to_delete[start:start + DELETE_BATCH_SIZE]
+                Vacancy.objects.filter(id__in=batch_ids).delete()
+                search.remove_vacancies(batch_ids)
+            
+            # 3. Удаляем сам запуск
+            script_run.delete()
+        bump_script_versions([script_id])
         
         return JsonResponse({
             'success': True,
@@ -527,7 +761,7 @@ def delete_script_run_view(request, run_id):
             'stats': {
                 'deleted_vacancy_runs': vacancy_runs_count,
                 'deleted_vacancies': len(vacancies_to_delete),
-                'total_unique_vacancies': len(unique_vacancy_ids)
+                'total_unique_vacancies': vacancy_runs_count
             }
         })
         
@@ -15,7 +15,6 @@ django.setup()
 
 from django.contrib.auth.models import User
 from scripts.models import Script, ScriptRun
-import json
 
 
 def create_test_script():
@@ -42,10 +41,10 @@ def create_test_script():
         name='Тест множественных запросов - Охрана труда Москва+МО',
         defaults={
             'description': 'Тестовый скрипт для проверки поиска по двум запросам в регионе Москва и МО',
-            'search_queries': json.dumps([
+            'search_queries': [
                 'Инженер по охране труда',
                 'Специалист по охране труда'
-            ], ensure_ascii=False),
+            ],
             'region': 'moscow_mo',
             'max_pages': 5,  # Ограничим для теста
             'created_by': user,
@@ -55,10 +54,10 @@ def create_test_script():
     
     if not created:
         # Обновляем существующий скрипт
-        script.search_queries = json.dumps([
+        script.search_queries = [
             'Инженер по охране труда',
             'Специалист по охране труда'
-        ], ensure_ascii=False)
+        ]
         script.region = 'moscow_mo'
         script.max_pages = 5
         script.save()
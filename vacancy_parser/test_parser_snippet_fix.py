@@ -70,13 +70,13 @@ def test_parser_with_limited_pages():
         if vacancies:
             print(f"\n🔍 АНАЛИЗ НАЙДЕННЫХ ВАКАНСИЙ:")
             for i, vacancy in enumerate(vacancies[:3], 1):
-                title = vacancy.get('name', 'Без названия')
-                area = vacancy.get('area', {}).get('name', 'Не указан')
-                company = vacancy.get('employer', {}).get('name', 'Не указана')
+                title = vacancy.title
+                area = vacancy.area_name or 'Не указан'
+                company = vacancy.company
                 print(f"{i}. {title}")
                 print(f"   Компания: {company}")
                 print(f"   Регион: {area}")
-                print(f"   Запрос: {vacancy.get('found_by_query', 'Не указан')}")
+                print(f"   Запрос: {vacancy.found_by_query or 'Не указан'}")
         
         # Проверяем статистику
         if hasattr(parser, 'query_stats') and first_query in parser.query_stats:
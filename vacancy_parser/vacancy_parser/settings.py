@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,11 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'scripts.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'scripts.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,10 +78,76 @@ WSGI_APPLICATION = 'vacancy_parser.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# База выбирается переменной окружения DB_ENGINE: sqlite (по умолчанию) или postgresql.
+# Для PostgreSQL нужен пакет psycopg (см. requirements.txt).
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'scriptshub'),
+            'USER': os.environ.get('POSTGRES_USER', 'scriptshub'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Постоянные соединения вместо нового подключения на каждый запрос
+            'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DB_POOL', '0') == '1':
+        # Пул соединений psycopg (psycopg[pool]); несовместим с CONN_MAX_AGE
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            },
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            # SQLITE_PATH - другой файл базы (например, временная база бенчмарков)
+            'NAME': os.environ.get('SQLITE_PATH') or BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Настройка SQLite для одновременной работы парсера (запись) и веб-интерфейса (чтение).
+# WAL позволяет читать во время записи, busy_timeout - ждать блокировку вместо
+# ошибки "database is locked". Отключается переменной окружения SQLITE_TUNING=0.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,         # мс
+    'synchronous': 'NORMAL',      # в режиме WAL безопасно, fsync только при checkpoint
+    'mmap_size': 134217728,       # 128 МБ
+    'cache_size': -32000,         # ~32 МБ (отрицательное значение - в КБ)
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_TUNING and DB_ENGINE != 'postgresql':
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        # Транзакции записи сразу берут блокировку: нет взаимоблокировок при повышении уровня
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Кэш прав доступа и страниц. Для нескольких процессов сервера нужен общий
+# бэкенд (файловый, Redis, Memcached), иначе инвалидация видна только своему процессу.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'scripts-hub',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
@@ -135,6 +204,10 @@ LOGOUT_REDIRECT_URL = '/accounts/login/'
 # Logout settings
 LOGOUT_URL = '/accounts/logout/'
 
+# История запусков: общее количество и сводка по статусам считаются не дальше
+# этого числа запусков (COUNT по подзапросу с LIMIT); 0 - не показывать
+HISTORY_TOTAL_CAP = int(os.environ.get('HISTORY_TOTAL_CAP', '1000'))
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -149,6 +222,61 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Parser settings
+# Сколько полных запусков подряд вакансия может не находиться,
+# прежде чем она будет помечена как неактивная
+VACANCY_MISSED_RUNS_GRACE = 2
+
+# Количество потоков, одновременно выполняющих запуски скриптов
+SCRIPT_RUNNER_WORKERS = 4
+
+# Восстанавливать при первом запросе запуски, прерванные перезапуском сервера.
+# Очередь живет в памяти процесса, а процесс не знает о запусках других
+# процессов, поэтому включайте только при единственном процессе сервера
+SCRIPT_RUNNER_RECOVER_ON_START = os.environ.get('SCRIPT_RUNNER_RECOVER_ON_START', '0') == '1'
+
+# Адрес API поиска вакансий (для бенчмарков - локальная заглушка, см. benchmarks/fake_hh.py)
+HH_API_URL = os.environ.get('HH_API_URL', 'https://api.hh.ru/vacancies')
+
+# Пауза между запросами страниц к API, секунды
+HH_REQUEST_DELAY = float(os.environ.get('HH_REQUEST_DELAY', '0.5'))
+
+# Общий лимит запросов к API на процесс (все запуски вместе), запросов в секунду; 0 - без лимита
+HH_RATE_LIMIT = float(os.environ.get('HH_RATE_LIMIT', '5'))
+
+# Таймаут запроса к API, секунды
+HH_REQUEST_TIMEOUT = float(os.environ.get('HH_REQUEST_TIMEOUT', '30'))
+
+# Загрузка страниц: sync - последовательно с паузой HH_REQUEST_DELAY,
+# async - параллельно (scripts/fetch.py), частота ограничивается только HH_RATE_LIMIT
+HH_FETCH_ENGINE = os.environ.get('HH_FETCH_ENGINE', 'sync')
+
+# Одновременных запросов страниц на один запуск при HH_FETCH_ENGINE=async
+HH_FETCH_CONCURRENCY = int(os.environ.get('HH_FETCH_CONCURRENCY', '4'))
+
+# Кэш ответов API (файл SQLite, общий для процессов; см. scripts/response_cache.py).
+# По умолчанию - файл во временной папке системы; HH_RESPONSE_CACHE_TTL=0 отключает кэш
+HH_RESPONSE_CACHE_PATH = os.environ.get('HH_RESPONSE_CACHE_PATH', '')
+HH_RESPONSE_CACHE_TTL = int(os.environ.get('HH_RESPONSE_CACHE_TTL', '300'))
+HH_RESPONSE_CACHE_MAX_MB = int(os.environ.get('HH_RESPONSE_CACHE_MAX_MB', '256'))
+
+
+# Metrics
+# Каталог файлов метрик процессов (общий для всех процессов сервера, см. scripts/metrics.py).
+# По умолчанию - каталог во временной папке системы.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+# Токен доступа к /metrics (Authorization: Bearer <token>); без токена метрики видят только сотрудники
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Отдавать /metrics без авторизации (например, если доступ закрыт на уровне сети)
+METRICS_ALLOW_ANONYMOUS = os.environ.get('METRICS_ALLOW_ANONYMOUS', '0') == '1'
+
+# Profiling
+# Профиль запроса снимается для сотрудников по заголовку X-Profile: 1 или ?_profile=1
+# (см. scripts/profiling.py). Хранятся последние PROFILE_CAPTURES_LIMIT снимков.
+PROFILE_CAPTURES_LIMIT = 100
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
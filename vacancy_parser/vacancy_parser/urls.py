@@ -17,12 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from scripts.views import home_view, logout_view
+from scripts.views import home_view, logout_view, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', home_view, name='home'),
     path('scripts/', include('scripts.urls')),
+    path('api/v1/', include('scripts.api_urls', namespace='api-v1')),
+    path('metrics', metrics_view, name='metrics'),
     
     # Авторизация
     path('accounts/login/', auth_views.LoginView.as_view(), name='login'),